@@ -20,6 +20,10 @@ app.conf.beat_schedule = {
         'task': 'setup.tasks.limpar_backups_antigos',
         'schedule': crontab(hour=3, minute=0),  # todos os dias às 3h da manhã
     },
+    'atualizar-resumos-diarios': {
+        'task': 'setup.tasks.atualizar_resumos_diarios',
+        'schedule': crontab(minute=15),  # de hora em hora, recalcula hoje e ontem
+    },
 }
 
 # Task de debug (útil para testar se o celery está rodando corretamente)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0008_alter_execucaobackup_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='workers_copia',
+            field=models.PositiveSmallIntegerField(default=4, help_text='Quantidade de arquivos copiados ao mesmo tempo. Use 1 para copiar um arquivo por vez.', verbose_name='Cópias em paralelo'),
+        ),
+    ]
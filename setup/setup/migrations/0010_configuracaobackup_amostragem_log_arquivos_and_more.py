@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0009_configuracaobackup_workers_copia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='amostragem_log_arquivos',
+            field=models.PositiveIntegerField(default=100, help_text='No modo amostragem, registra 1 a cada N arquivos.', verbose_name='Amostragem do log por arquivo'),
+        ),
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='nivel_log_arquivos',
+            field=models.CharField(choices=[('todos', 'Registrar todos os arquivos'), ('amostragem', 'Registrar uma amostra'), ('resumo', 'Registrar apenas o resumo'), ('desligado', 'Não registrar')], default='todos', help_text='Define como as linhas de cópia/ignorado de cada arquivo são gravadas nos logs da execução.', max_length=20, verbose_name='Log por arquivo'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0010_configuracaobackup_amostragem_log_arquivos_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='backup_incremental',
+            field=models.BooleanField(default=True, help_text='Copia apenas os arquivos novos ou alterados desde o último backup.', verbose_name='Backup incremental'),
+        ),
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='hash_manifesto',
+            field=models.BooleanField(default=False, help_text='Guarda o hash de cada arquivo e confere o conteúdo mesmo quando tamanho e data não mudaram. Mais lento.', verbose_name='Comparar hash dos arquivos'),
+        ),
+    ]
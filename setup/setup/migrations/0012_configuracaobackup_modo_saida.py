@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0011_configuracaobackup_backup_incremental_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='modo_saida',
+            field=models.CharField(choices=[('espelho', 'Pasta única (espelho)'), ('snapshot', 'Snapshots com hardlinks')], default='espelho', help_text='No modo snapshot cada execução gera uma pasta completa e os arquivos sem alteração são hardlinks para o snapshot anterior.', max_length=20, verbose_name='Modo de saída'),
+        ),
+    ]
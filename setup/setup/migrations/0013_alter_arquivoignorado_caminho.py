@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0012_configuracaobackup_modo_saida'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='arquivoignorado',
+            name='caminho',
+            field=models.CharField(help_text='Padrão no estilo .gitignore: "node_modules" ignora em qualquer nível, "/media/cache" apenas a partir da raiz, "*.log" por extensão, "tmp/" apenas pastas e "**" qualquer quantidade de pastas.', max_length=255, verbose_name='Caminho a ser ignorado'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0013_alter_arquivoignorado_caminho'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='banco_porta',
+            field=models.PositiveIntegerField(blank=True, default=5432, null=True, verbose_name='Banco porta'),
+        ),
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='compressao_dump',
+            field=models.CharField(choices=[('gzip', 'gzip'), ('zstd', 'zstd')], default='gzip', help_text='Usado apenas no modo stream. Usa pigz/zstd multi-thread quando instalados.', max_length=10, verbose_name='Compressão do dump'),
+        ),
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='jobs_dump',
+            field=models.PositiveSmallIntegerField(default=4, help_text='Usado apenas no formato diretório.', verbose_name='Jobs paralelos do dump'),
+        ),
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='modo_dump',
+            field=models.CharField(choices=[('custom', 'Arquivo único (formato custom)'), ('diretorio', 'Formato diretório com jobs paralelos'), ('stream', 'Stream comprimido direto para o destino')], default='custom', max_length=20, verbose_name='Modo do dump'),
+        ),
+    ]
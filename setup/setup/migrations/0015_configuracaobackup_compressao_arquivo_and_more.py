@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0014_configuracaobackup_banco_porta_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='compressao_arquivo',
+            field=models.CharField(choices=[('gzip', 'gzip'), ('zstd', 'zstd')], default='gzip', help_text='Usado apenas no modo arquivo.', max_length=10, verbose_name='Compressão do arquivo'),
+        ),
+        migrations.AlterField(
+            model_name='configuracaobackup',
+            name='modo_saida',
+            field=models.CharField(choices=[('espelho', 'Pasta única (espelho)'), ('snapshot', 'Snapshots com hardlinks'), ('arquivo', 'Arquivo .tar comprimido')], default='espelho', help_text='No modo snapshot cada execução gera uma pasta completa e os arquivos sem alteração são hardlinks para o snapshot anterior. No modo arquivo cada execução gera um único .tar comprimido.', max_length=20, verbose_name='Modo de saída'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0015_configuracaobackup_compressao_arquivo_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotBackup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('pasta', 'Pasta'), ('arquivo', 'Arquivo .tar')], default='pasta', max_length=20, verbose_name='Tipo')),
+                ('caminho', models.CharField(max_length=500, verbose_name='Caminho')),
+                ('data_criacao', models.DateTimeField(verbose_name='Data de criação')),
+                ('tamanho_bytes', models.BigIntegerField(default=0, verbose_name='Tamanho (bytes)')),
+                ('total_arquivos', models.PositiveIntegerField(default=0, verbose_name='Total de arquivos')),
+                ('configuracao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='setup.configuracaobackup', verbose_name='Configuração do backup')),
+                ('execucao', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='snapshots', to='setup.execucaobackup', verbose_name='Execução do backup')),
+            ],
+            options={
+                'verbose_name': 'Snapshot do backup',
+                'verbose_name_plural': 'Snapshots dos backups',
+                'ordering': ['-data_criacao'],
+                'indexes': [models.Index(fields=['configuracao', 'data_criacao'], name='setup_snaps_configu_5333da_idx'), models.Index(fields=['data_criacao'], name='setup_snaps_data_cr_466d30_idx')],
+            },
+        ),
+    ]
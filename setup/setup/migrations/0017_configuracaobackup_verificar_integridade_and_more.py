@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0016_snapshotbackup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='verificar_integridade',
+            field=models.CharField(choices=[('desligado', 'Não verificar'), ('copiados', 'Apenas arquivos copiados na execução'), ('todos', 'Todos os arquivos do backup')], default='desligado', help_text='Compara o hash (sha256) da origem e do destino após a cópia. Não se aplica ao modo arquivo.', max_length=20, verbose_name='Verificar integridade'),
+        ),
+        migrations.CreateModel(
+            name='VerificacaoArquivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('caminho', models.CharField(max_length=500, verbose_name='Caminho')),
+                ('hash_origem', models.CharField(blank=True, max_length=64, null=True, verbose_name='Hash da origem')),
+                ('hash_destino', models.CharField(blank=True, max_length=64, null=True, verbose_name='Hash do destino')),
+                ('valido', models.BooleanField(default=True, verbose_name='Válido')),
+                ('erro', models.TextField(blank=True, null=True, verbose_name='Erro')),
+                ('execucao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='verificacoes', to='setup.execucaobackup', verbose_name='Execução do backup')),
+            ],
+            options={
+                'verbose_name': 'Verificação de arquivo',
+                'verbose_name_plural': 'Verificações de arquivos',
+            },
+        ),
+    ]
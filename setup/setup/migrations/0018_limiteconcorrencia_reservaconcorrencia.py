@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0017_configuracaobackup_verificar_integridade_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LimiteConcorrencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('destino', 'Destino do backup'), ('host', 'Host de origem')], max_length=20, verbose_name='Tipo')),
+                ('chave', models.CharField(help_text='Caminho de destino do backup ou IP SSH da origem.', max_length=255, verbose_name='Destino / host')),
+                ('max_simultaneos', models.PositiveSmallIntegerField(default=1, help_text='Quantidade máxima de backups executando ao mesmo tempo.', verbose_name='Backups simultâneos')),
+                ('ativo', models.BooleanField(default=True, help_text='Quando desativado não há limite.', verbose_name='Ativo')),
+            ],
+            options={
+                'verbose_name': 'Limite de concorrência',
+                'verbose_name_plural': 'Limites de concorrência',
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'chave'), name='limite_concorrencia_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReservaConcorrencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tarefa_id', models.CharField(blank=True, max_length=255, null=True, verbose_name='ID da tarefa')),
+                ('data_inicio', models.DateTimeField(verbose_name='Data de início')),
+                ('expira_em', models.DateTimeField(verbose_name='Expira em')),
+                ('configuracao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas_concorrencia', to='setup.configuracaobackup', verbose_name='Configuração do backup')),
+                ('limite', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='setup.limiteconcorrencia', verbose_name='Limite')),
+            ],
+            options={
+                'verbose_name': 'Reserva de concorrência',
+                'verbose_name_plural': 'Reservas de concorrência',
+                'indexes': [models.Index(fields=['limite', 'expira_em'], name='setup_reser_limite__842dda_idx')],
+            },
+        ),
+    ]
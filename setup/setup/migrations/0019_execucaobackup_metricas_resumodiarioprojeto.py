@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0018_limiteconcorrencia_reservaconcorrencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoDiarioProjeto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('total_execucoes', models.PositiveIntegerField(default=0, verbose_name='Execuções')),
+                ('total_sucesso', models.PositiveIntegerField(default=0, verbose_name='Sucessos')),
+                ('total_falha', models.PositiveIntegerField(default=0, verbose_name='Falhas')),
+                ('duracao_p50', models.FloatField(blank=True, null=True, verbose_name='Duração p50 (s)')),
+                ('duracao_p95', models.FloatField(blank=True, null=True, verbose_name='Duração p95 (s)')),
+                ('mb_por_segundo', models.FloatField(blank=True, help_text='Bytes copiados divididos pelo tempo total das execuções do dia.', null=True, verbose_name='MB/s')),
+                ('bytes_copiados', models.BigIntegerField(default=0, verbose_name='Bytes copiados')),
+                ('tamanho_backup', models.BigIntegerField(default=0, help_text='Tamanho da última execução com sucesso do dia.', verbose_name='Tamanho do backup (bytes)')),
+                ('crescimento_bytes', models.BigIntegerField(blank=True, help_text='Diferença do tamanho do backup em relação ao resumo anterior.', null=True, verbose_name='Crescimento (bytes)')),
+            ],
+            options={
+                'verbose_name': 'Resumo diário do projeto',
+                'verbose_name_plural': 'Resumos diários dos projetos',
+                'ordering': ['-data'],
+            },
+        ),
+        migrations.AddField(
+            model_name='execucaobackup',
+            name='arquivos_analisados',
+            field=models.PositiveIntegerField(default=0, verbose_name='Arquivos analisados'),
+        ),
+        migrations.AddField(
+            model_name='execucaobackup',
+            name='arquivos_copiados',
+            field=models.PositiveIntegerField(default=0, verbose_name='Arquivos copiados'),
+        ),
+        migrations.AddField(
+            model_name='execucaobackup',
+            name='bytes_copiados',
+            field=models.BigIntegerField(default=0, verbose_name='Bytes copiados'),
+        ),
+        migrations.AddField(
+            model_name='execucaobackup',
+            name='bytes_sem_alteracao',
+            field=models.BigIntegerField(default=0, help_text='Tamanho dos arquivos mantidos do backup anterior (não copiados).', verbose_name='Bytes sem alteração'),
+        ),
+        migrations.AddField(
+            model_name='execucaobackup',
+            name='tempos_etapas',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Tempo por etapa (s)'),
+        ),
+        migrations.AddIndex(
+            model_name='execucaobackup',
+            index=models.Index(fields=['data_inicio'], name='setup_execu_data_in_75cbff_idx'),
+        ),
+        migrations.AddField(
+            model_name='resumodiarioprojeto',
+            name='projeto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_diarios', to='setup.projeto', verbose_name='Projeto'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumodiarioprojeto',
+            constraint=models.UniqueConstraint(fields=('projeto', 'data'), name='resumo_diario_projeto_unico'),
+        ),
+    ]
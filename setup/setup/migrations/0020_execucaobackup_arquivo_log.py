@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0019_execucaobackup_metricas_resumodiarioprojeto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='execucaobackup',
+            name='arquivo_log',
+            field=models.CharField(blank=True, help_text='Log detalhado por arquivo (NDJSON comprimido), quando o log por arquivo está no modo arquivo.', max_length=500, null=True, verbose_name='Arquivo de log'),
+        ),
+        migrations.AlterField(
+            model_name='configuracaobackup',
+            name='nivel_log_arquivos',
+            field=models.CharField(choices=[('todos', 'Registrar todos os arquivos'), ('amostragem', 'Registrar uma amostra'), ('resumo', 'Registrar apenas o resumo'), ('desligado', 'Não registrar'), ('arquivo', 'Registrar em arquivo comprimido')], default='todos', help_text='Define como as linhas de cópia/ignorado de cada arquivo são gravadas nos logs da execução. No modo arquivo elas vão para um arquivo comprimido da execução e o banco guarda apenas os resumos e erros.', max_length=20, verbose_name='Log por arquivo'),
+        ),
+    ]
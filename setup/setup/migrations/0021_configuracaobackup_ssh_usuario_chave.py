@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0020_execucaobackup_arquivo_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='ssh_chave',
+            field=models.CharField(blank=True, help_text='Caminho da chave privada no servidor do backup. Vazio usa a configuração padrão do ssh.', max_length=255, null=True, verbose_name='Chave SSH'),
+        ),
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='ssh_usuario',
+            field=models.CharField(blank=True, help_text='Quando o IP SSH é informado, o caminho de mídia do projeto é lido desse host (rsync via SSH).', max_length=100, null=True, verbose_name='Usuário SSH'),
+        ),
+    ]
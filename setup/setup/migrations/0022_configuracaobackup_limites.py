@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0021_configuracaobackup_ssh_usuario_chave'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='io_ociosa',
+            field=models.BooleanField(default=False, help_text='Executa o backup na classe de E/S idle (ionice -c3): o disco só atende o backup quando não há outra leitura/escrita pendente.', verbose_name='Prioridade de disco ociosa'),
+        ),
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='limite_arquivos',
+            field=models.PositiveIntegerField(blank=True, help_text='Quantidade máxima de arquivos processados por segundo. Vazio = sem limite.', null=True, verbose_name='Limite de arquivos por segundo'),
+        ),
+        migrations.AddField(
+            model_name='configuracaobackup',
+            name='limite_banda',
+            field=models.PositiveIntegerField(blank=True, help_text='Taxa máxima de leitura/cópia do backup, somando todas as cópias em paralelo. Também é repassado ao rsync (--bwlimit). Vazio = sem limite.', null=True, verbose_name='Limite de banda (KB/s)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0022_configuracaobackup_limites'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='execucaobackup',
+            name='metodos_copia',
+            field=models.JSONField(blank=True, default=dict, help_text='reflink, copy_file_range, sendfile ou buffer, conforme o suporte dos filesystems de origem e destino.', verbose_name='Arquivos por mecanismo de cópia'),
+        ),
+    ]
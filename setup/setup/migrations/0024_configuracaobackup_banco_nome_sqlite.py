@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0023_execucaobackup_metodos_copia'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='configuracaobackup',
+            name='banco_nome',
+            field=models.CharField(blank=True, help_text='Nos projetos SQLite3, caminho do arquivo do banco.', max_length=100, null=True, verbose_name='Banco nome'),
+        ),
+    ]
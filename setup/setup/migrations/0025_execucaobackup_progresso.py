@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0024_configuracaobackup_banco_nome_sqlite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='execucaobackup',
+            name='progresso',
+            field=models.JSONField(blank=True, default=dict, help_text='Etapa atual e arquivos/bytes concluídos x estimativa, atualizados periodicamente durante a execução.', verbose_name='Progresso'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0025_execucaobackup_progresso'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snapshotbackup',
+            name='concluido',
+            field=models.BooleanField(default=True, help_text='Desmarcado enquanto a execução ainda está gravando o snapshot ou se ela parou no meio. Snapshots não concluídos não são usados como base do próximo backup, mas entram na retenção.', verbose_name='Concluído'),
+        ),
+    ]
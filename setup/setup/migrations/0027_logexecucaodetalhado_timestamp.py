@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('setup', '0026_snapshotbackup_concluido'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='logexecucaodetalhado',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Data e hora'),
+        ),
+    ]
@@ -1,4 +1,6 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _ # usado para internacionalização das strings informar com _("")
 
 # Create your models here.
@@ -46,18 +48,50 @@ class ConfiguracaoBackup(models.Model):
         (1, _('Com dump de banco de dados')),
         (2, _('Apenas via rsync')),
     ]
+    MODO_SAIDA_CHOICES = [
+        ('espelho', _('Pasta única (espelho)')),
+        ('snapshot', _('Snapshots com hardlinks')),
+        ('arquivo', _('Arquivo .tar comprimido')),
+    ]
+    MODO_DUMP_CHOICES = [
+        ('custom', _('Arquivo único (formato custom)')),
+        ('diretorio', _('Formato diretório com jobs paralelos')),
+        ('stream', _('Stream comprimido direto para o destino')),
+    ]
+    COMPRESSAO_CHOICES = [
+        ('gzip', 'gzip'),
+        ('zstd', 'zstd'),
+    ]
+    VERIFICAR_INTEGRIDADE_CHOICES = [
+        ('desligado', _('Não verificar')),
+        ('copiados', _('Apenas arquivos copiados na execução')),
+        ('todos', _('Todos os arquivos do backup')),
+    ]
+    NIVEL_LOG_ARQUIVOS_CHOICES = [
+        ('todos', _('Registrar todos os arquivos')),
+        ('amostragem', _('Registrar uma amostra')),
+        ('resumo', _('Registrar apenas o resumo')),
+        ('desligado', _('Não registrar')),
+        ('arquivo', _('Registrar em arquivo comprimido')),
+    ]
 
     projeto = models.ForeignKey(Projeto, verbose_name=_("Projeto"), blank=False, null=False, on_delete=models.CASCADE, related_name='configuracoes')
     tipo_backup = models.PositiveSmallIntegerField(verbose_name=_("Tipo de backup"), blank=False, null=False, choices=TIPO_BACKUP_CHOICES)
 
     caminho_bases_dados = models.CharField(verbose_name=_("Caminho da base de dados"), max_length=255, blank=True, null=True, help_text=_("Usado apenas ao selecionar o tipo rsync"))
     banco_host = models.CharField(verbose_name=_("Banco host"), max_length=100, blank=True, null=True)
-    banco_nome = models.CharField(verbose_name=_("Banco nome"), max_length=100, blank=True, null=True)
+    banco_nome = models.CharField(verbose_name=_("Banco nome"), max_length=100, blank=True, null=True, help_text=_("Nos projetos SQLite3, caminho do arquivo do banco."))
     banco_usuario = models.CharField(verbose_name=_("Banco usuário"), max_length=100, blank=True, null=True)
     banco_senha = models.CharField(verbose_name=_("Banco senha"), max_length=100, blank=True, null=True)
+    banco_porta = models.PositiveIntegerField(verbose_name=_("Banco porta"), blank=True, null=True, default=5432)
+    modo_dump = models.CharField(verbose_name=_("Modo do dump"), max_length=20, choices=MODO_DUMP_CHOICES, default='custom')
+    jobs_dump = models.PositiveSmallIntegerField(verbose_name=_("Jobs paralelos do dump"), default=4, help_text=_("Usado apenas no formato diretório."))
+    compressao_dump = models.CharField(verbose_name=_("Compressão do dump"), max_length=10, choices=COMPRESSAO_CHOICES, default='gzip', help_text=_("Usado apenas no modo stream. Usa pigz/zstd multi-thread quando instalados."))
 
     ssh_ip = models.GenericIPAddressField(verbose_name=_("IP SSH"), blank=True, null=True)
     ssh_porta = models.PositiveIntegerField(verbose_name=_("Porta SSH"), blank=True, null=True, default=22)
+    ssh_usuario = models.CharField(verbose_name=_("Usuário SSH"), max_length=100, blank=True, null=True, help_text=_("Quando o IP SSH é informado, o caminho de mídia do projeto é lido desse host (rsync via SSH)."))
+    ssh_chave = models.CharField(verbose_name=_("Chave SSH"), max_length=255, blank=True, null=True, help_text=_("Caminho da chave privada no servidor do backup. Vazio usa a configuração padrão do ssh."))
     destino_backup = models.CharField(verbose_name=_("Caminho destino do backup"), max_length=255, blank=True, null=True)
 
     manter_permissoes = models.BooleanField(verbose_name=_("Manter permissões"), default=True)
@@ -65,6 +99,17 @@ class ConfiguracaoBackup(models.Model):
 
     horario_execucao = models.CharField(verbose_name=_("Horário de execução"), max_length=100, blank=True, null=True, help_text=_("Horário(s) no formato crontab ou texto"))
     dias_reter_backup = models.PositiveIntegerField(verbose_name=_("Dias retenção de backup"), default=7)
+    modo_saida = models.CharField(verbose_name=_("Modo de saída"), max_length=20, choices=MODO_SAIDA_CHOICES, default='espelho', help_text=_("No modo snapshot cada execução gera uma pasta completa e os arquivos sem alteração são hardlinks para o snapshot anterior. No modo arquivo cada execução gera um único .tar comprimido."))
+    compressao_arquivo = models.CharField(verbose_name=_("Compressão do arquivo"), max_length=10, choices=COMPRESSAO_CHOICES, default='gzip', help_text=_("Usado apenas no modo arquivo."))
+    workers_copia = models.PositiveSmallIntegerField(verbose_name=_("Cópias em paralelo"), default=4, help_text=_("Quantidade de arquivos copiados ao mesmo tempo. Use 1 para copiar um arquivo por vez."))
+    backup_incremental = models.BooleanField(verbose_name=_("Backup incremental"), default=True, help_text=_("Copia apenas os arquivos novos ou alterados desde o último backup."))
+    hash_manifesto = models.BooleanField(verbose_name=_("Comparar hash dos arquivos"), default=False, help_text=_("Guarda o hash de cada arquivo e confere o conteúdo mesmo quando tamanho e data não mudaram. Mais lento."))
+    verificar_integridade = models.CharField(verbose_name=_("Verificar integridade"), max_length=20, choices=VERIFICAR_INTEGRIDADE_CHOICES, default='desligado', help_text=_("Compara o hash (sha256) da origem e do destino após a cópia. Não se aplica ao modo arquivo."))
+    nivel_log_arquivos = models.CharField(verbose_name=_("Log por arquivo"), max_length=20, choices=NIVEL_LOG_ARQUIVOS_CHOICES, default='todos', help_text=_("Define como as linhas de cópia/ignorado de cada arquivo são gravadas nos logs da execução. No modo arquivo elas vão para um arquivo comprimido da execução e o banco guarda apenas os resumos e erros."))
+    amostragem_log_arquivos = models.PositiveIntegerField(verbose_name=_("Amostragem do log por arquivo"), default=100, help_text=_("No modo amostragem, registra 1 a cada N arquivos."))
+    limite_banda = models.PositiveIntegerField(verbose_name=_("Limite de banda (KB/s)"), blank=True, null=True, help_text=_("Taxa máxima de leitura/cópia do backup, somando todas as cópias em paralelo. Também é repassado ao rsync (--bwlimit). Vazio = sem limite."))
+    limite_arquivos = models.PositiveIntegerField(verbose_name=_("Limite de arquivos por segundo"), blank=True, null=True, help_text=_("Quantidade máxima de arquivos processados por segundo. Vazio = sem limite."))
+    io_ociosa = models.BooleanField(verbose_name=_("Prioridade de disco ociosa"), default=False, help_text=_("Executa o backup na classe de E/S idle (ionice -c3): o disco só atende o backup quando não há outra leitura/escrita pendente."))
 
     # ignorar_arquivos = models.TextField(verbose_name=_("Arquivos a serem ignorados"), blank=True, null=True, help_text="Um por linha")
 
@@ -100,11 +145,22 @@ class ExecucaoBackup(models.Model):
     status = models.CharField(verbose_name=_("Status da execução"), max_length=20, blank=False, null=False, choices=STATUS_CHOICES)
     mensagem = models.TextField(verbose_name=_("Mensagem / log"), blank=True, null=True)
     duracao = models.DurationField(verbose_name=_("Duração"), blank=True, null=True)
+    arquivos_analisados = models.PositiveIntegerField(verbose_name=_("Arquivos analisados"), default=0)
+    arquivos_copiados = models.PositiveIntegerField(verbose_name=_("Arquivos copiados"), default=0)
+    bytes_copiados = models.BigIntegerField(verbose_name=_("Bytes copiados"), default=0)
+    bytes_sem_alteracao = models.BigIntegerField(verbose_name=_("Bytes sem alteração"), default=0, help_text=_("Tamanho dos arquivos mantidos do backup anterior (não copiados)."))
+    tempos_etapas = models.JSONField(verbose_name=_("Tempo por etapa (s)"), default=dict, blank=True)
+    metodos_copia = models.JSONField(verbose_name=_("Arquivos por mecanismo de cópia"), default=dict, blank=True, help_text=_("reflink, copy_file_range, sendfile ou buffer, conforme o suporte dos filesystems de origem e destino."))
+    progresso = models.JSONField(verbose_name=_("Progresso"), default=dict, blank=True, help_text=_("Etapa atual e arquivos/bytes concluídos x estimativa, atualizados periodicamente durante a execução."))
+    arquivo_log = models.CharField(verbose_name=_("Arquivo de log"), max_length=500, blank=True, null=True, help_text=_("Log detalhado por arquivo (NDJSON comprimido), quando o log por arquivo está no modo arquivo."))
 
     class Meta:
         verbose_name = _("Execução do backup")
         verbose_name_plural = _("Execuções dos backups")
         ordering = ['-data_inicio']
+        indexes = [
+            models.Index(fields=['data_inicio']),
+        ]
 
     def __str__(self):
         return f"{self.configuracao.projeto.nome} - {self.get_status_display()} ({self.data_inicio.strftime('%Y-%m-%d %H:%M')})"
@@ -145,6 +201,13 @@ class AgendamentoBackup(models.Model):
     def __str__(self):
         return f"{self.configuracao.projeto.nome} - {self.horario}"
 
+    def clean(self):
+        from website.utils.agendamentos import interpretar_horario
+        try:
+            interpretar_horario(self.horario)
+        except ValueError as e:
+            raise ValidationError({'horario': str(e)})
+
 
 # Logs técnicos de cada execução
 class LogExecucaoDetalhado(models.Model):
@@ -157,7 +220,8 @@ class LogExecucaoDetalhado(models.Model):
     ]
 
     execucao = models.ForeignKey(ExecucaoBackup, verbose_name=_("Execução do backup"), on_delete=models.CASCADE, blank=False, null=False, related_name='logs_detalhados')
-    timestamp = models.DateTimeField(verbose_name=_("Data e hora"), auto_now_add=True)
+    # Preenchido por quem registra o log (LogExecucaoBuffer grava em lote, bem depois do evento)
+    timestamp = models.DateTimeField(verbose_name=_("Data e hora"), default=timezone.now, editable=False)
     tipo = models.CharField(verbose_name=_("Tipo"), max_length=20, choices=TIPO_CHOICES, blank=False, null=False)
     mensagem = models.TextField(verbose_name=_("Mensagem"), blank=False, null=False)
 
@@ -169,14 +233,128 @@ class LogExecucaoDetalhado(models.Model):
         return f"[{self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}] {self.get_tipo_display()}"
     
 
+# Hash de cada arquivo conferido na verificação de integridade de uma execução
+class VerificacaoArquivo(models.Model):
+    execucao = models.ForeignKey(ExecucaoBackup, verbose_name=_("Execução do backup"), on_delete=models.CASCADE, blank=False, null=False, related_name='verificacoes')
+    caminho = models.CharField(verbose_name=_("Caminho"), max_length=500, blank=False, null=False)
+    hash_origem = models.CharField(verbose_name=_("Hash da origem"), max_length=64, blank=True, null=True)
+    hash_destino = models.CharField(verbose_name=_("Hash do destino"), max_length=64, blank=True, null=True)
+    valido = models.BooleanField(verbose_name=_("Válido"), default=True)
+    erro = models.TextField(verbose_name=_("Erro"), blank=True, null=True)
+
+    class Meta:
+        verbose_name = _("Verificação de arquivo")
+        verbose_name_plural = _("Verificações de arquivos")
+
+    def __str__(self):
+        return self.caminho
+
+
+# Catálogo dos snapshots/arquivos gerados pelos backups, usado na retenção
+class SnapshotBackup(models.Model):
+    TIPO_CHOICES = [
+        ('pasta', _('Pasta')),
+        ('arquivo', _('Arquivo .tar')),
+    ]
+
+    configuracao = models.ForeignKey(ConfiguracaoBackup, verbose_name=_("Configuração do backup"), on_delete=models.CASCADE, blank=False, null=False, related_name='snapshots')
+    execucao = models.ForeignKey(ExecucaoBackup, verbose_name=_("Execução do backup"), on_delete=models.SET_NULL, blank=True, null=True, related_name='snapshots')
+    tipo = models.CharField(verbose_name=_("Tipo"), max_length=20, choices=TIPO_CHOICES, default='pasta')
+    caminho = models.CharField(verbose_name=_("Caminho"), max_length=500, blank=False, null=False)
+    data_criacao = models.DateTimeField(verbose_name=_("Data de criação"), blank=False, null=False)
+    tamanho_bytes = models.BigIntegerField(verbose_name=_("Tamanho (bytes)"), default=0)
+    total_arquivos = models.PositiveIntegerField(verbose_name=_("Total de arquivos"), default=0)
+    concluido = models.BooleanField(verbose_name=_("Concluído"), default=True, help_text=_("Desmarcado enquanto a execução ainda está gravando o snapshot ou se ela parou no meio. Snapshots não concluídos não são usados como base do próximo backup, mas entram na retenção."))
+
+    class Meta:
+        verbose_name = _("Snapshot do backup")
+        verbose_name_plural = _("Snapshots dos backups")
+        ordering = ['-data_criacao']
+        indexes = [
+            models.Index(fields=['configuracao', 'data_criacao']),
+            models.Index(fields=['data_criacao']),
+        ]
+
+    def __str__(self):
+        return self.caminho
+
+
 # Caminhos específicos a serem ignorados (substitui o campo TextField anterior)
 class ArquivoIgnorado(models.Model):
     configuracao = models.ForeignKey(ConfiguracaoBackup, verbose_name=_("Configuração do backup"), on_delete=models.CASCADE, blank=False, null=False, related_name='arquivos_ignorados')
-    caminho = models.CharField(verbose_name=_("Caminho a ser ignorado"), max_length=255, blank=False, null=False, help_text=_("Informe o caminho do arquivo ou pasta a ser ignorado."))
+    caminho = models.CharField(verbose_name=_("Caminho a ser ignorado"), max_length=255, blank=False, null=False, help_text=_("Padrão no estilo .gitignore: \"node_modules\" ignora em qualquer nível, \"/media/cache\" apenas a partir da raiz, \"*.log\" por extensão, \"tmp/\" apenas pastas e \"**\" qualquer quantidade de pastas."))
 
     class Meta:
         verbose_name = _("Arquivo/Pasta ignorado(a)")
         verbose_name_plural = _("Arquivos/Pastas ignorados(as)")
 
     def __str__(self):
-        return self.caminho
\ No newline at end of file
+        return self.caminho
+
+# Limite de backups executando ao mesmo tempo no mesmo destino ou lendo do mesmo host de origem.
+# As tarefas acima do limite voltam para a fila e esperam uma vaga.
+class LimiteConcorrencia(models.Model):
+    TIPO_CHOICES = [
+        ('destino', _('Destino do backup')),
+        ('host', _('Host de origem')),
+    ]
+
+    tipo = models.CharField(verbose_name=_("Tipo"), max_length=20, choices=TIPO_CHOICES, blank=False, null=False)
+    chave = models.CharField(verbose_name=_("Destino / host"), max_length=255, blank=False, null=False, help_text=_("Caminho de destino do backup ou IP SSH da origem."))
+    max_simultaneos = models.PositiveSmallIntegerField(verbose_name=_("Backups simultâneos"), default=1, help_text=_("Quantidade máxima de backups executando ao mesmo tempo."))
+    ativo = models.BooleanField(verbose_name=_("Ativo"), default=True, help_text=_("Quando desativado não há limite."))
+
+    class Meta:
+        verbose_name = _("Limite de concorrência")
+        verbose_name_plural = _("Limites de concorrência")
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'chave'], name='limite_concorrencia_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()}: {self.chave}"
+
+
+# Vaga ocupada por uma tarefa de backup em um limite. Expira se o worker morrer sem liberar.
+class ReservaConcorrencia(models.Model):
+    limite = models.ForeignKey(LimiteConcorrencia, verbose_name=_("Limite"), on_delete=models.CASCADE, blank=False, null=False, related_name='reservas')
+    configuracao = models.ForeignKey(ConfiguracaoBackup, verbose_name=_("Configuração do backup"), on_delete=models.CASCADE, blank=False, null=False, related_name='reservas_concorrencia')
+    tarefa_id = models.CharField(verbose_name=_("ID da tarefa"), max_length=255, blank=True, null=True)
+    data_inicio = models.DateTimeField(verbose_name=_("Data de início"), blank=False, null=False)
+    expira_em = models.DateTimeField(verbose_name=_("Expira em"), blank=False, null=False)
+
+    class Meta:
+        verbose_name = _("Reserva de concorrência")
+        verbose_name_plural = _("Reservas de concorrência")
+        indexes = [
+            models.Index(fields=['limite', 'expira_em']),
+        ]
+
+    def __str__(self):
+        return f"{self.limite} - {self.configuracao}"
+
+
+# Agregados diários por projeto, recalculados periodicamente a partir das execuções
+class ResumoDiarioProjeto(models.Model):
+    projeto = models.ForeignKey(Projeto, verbose_name=_("Projeto"), on_delete=models.CASCADE, blank=False, null=False, related_name='resumos_diarios')
+    data = models.DateField(verbose_name=_("Data"), blank=False, null=False)
+    total_execucoes = models.PositiveIntegerField(verbose_name=_("Execuções"), default=0)
+    total_sucesso = models.PositiveIntegerField(verbose_name=_("Sucessos"), default=0)
+    total_falha = models.PositiveIntegerField(verbose_name=_("Falhas"), default=0)
+    duracao_p50 = models.FloatField(verbose_name=_("Duração p50 (s)"), blank=True, null=True)
+    duracao_p95 = models.FloatField(verbose_name=_("Duração p95 (s)"), blank=True, null=True)
+    mb_por_segundo = models.FloatField(verbose_name=_("MB/s"), blank=True, null=True, help_text=_("Bytes copiados divididos pelo tempo total das execuções do dia."))
+    bytes_copiados = models.BigIntegerField(verbose_name=_("Bytes copiados"), default=0)
+    tamanho_backup = models.BigIntegerField(verbose_name=_("Tamanho do backup (bytes)"), default=0, help_text=_("Tamanho da última execução com sucesso do dia."))
+    crescimento_bytes = models.BigIntegerField(verbose_name=_("Crescimento (bytes)"), blank=True, null=True, help_text=_("Diferença do tamanho do backup em relação ao resumo anterior."))
+
+    class Meta:
+        verbose_name = _("Resumo diário do projeto")
+        verbose_name_plural = _("Resumos diários dos projetos")
+        ordering = ['-data']
+        constraints = [
+            models.UniqueConstraint(fields=['projeto', 'data'], name='resumo_diario_projeto_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.projeto.nome} - {self.data}"
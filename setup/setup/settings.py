@@ -147,4 +147,17 @@ UNFOLD = {
 
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
-CELERY_TASK_SERIALIZER = 'json'
\ No newline at end of file
+CELERY_TASK_SERIALIZER = 'json'
+
+# Limites de concorrência dos backups (valores iniciais; cada limite pode ser alterado no admin)
+BACKUP_LIMITE_DESTINO = 1  # backups simultâneos gravando no mesmo destino
+BACKUP_LIMITE_HOST = 2  # backups simultâneos lendo do mesmo host (ssh_ip)
+BACKUP_ESPERA_VAGA = 30  # segundos até a tarefa sem vaga tentar de novo
+BACKUP_MAX_ESPERAS_VAGA = 120  # tentativas sem vaga antes de desistir da execução (~1h com a espera acima)
+BACKUP_DURACAO_RESERVA = 600  # segundos de validade da vaga, renovada enquanto o backup executa
+BACKUP_WORKERS_VARREDURA = 8  # threads listando as pastas da origem em paralelo
+BACKUP_SQLITE_PAGINAS = 1000  # páginas copiadas por passo no backup online do SQLite
+BACKUP_SQLITE_PAUSA = 0.05  # segundos de pausa entre os passos (a aplicação grava nesse intervalo)
+
+# Pasta dos logs detalhados das execuções gravados em arquivo (log por arquivo no modo arquivo)
+BACKUP_PASTA_LOGS = BASE_DIR / 'logs_execucoes'
@@ -0,0 +1,24 @@
+"""
+Settings usados pelo benchmark do pipeline de backup (python manage.py benchmark_backup).
+
+Mesma configuração do projeto, mas com um banco SQLite local e as tarefas do Celery
+executadas na hora (sem broker), para que os resultados sejam reproduzíveis em
+qualquer máquina:
+
+    python manage.py benchmark_backup --settings=setup.settings_benchmark
+"""
+
+import os
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCHMARK_DB', os.path.join(tempfile.gettempdir(), 'backup_manager_benchmark.sqlite3')),
+    }
+}
+
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_TASK_EAGER_PROPAGATES = False
@@ -1,45 +1,29 @@
+import logging
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django_celery_beat.models import PeriodicTask, CrontabSchedule
-from django.utils.translation import gettext_lazy as _
-from django.utils import timezone
-from setup.models import AgendamentoBackup
-import json
+from setup.models import AgendamentoBackup, ExecucaoBackup
+from website.utils.agendamentos import sincronizar_agendamento, remover_tarefa_agendamento
+from website.utils.arquivo_log import remover_log
 
-@receiver(post_save, sender=AgendamentoBackup)
-def criar_ou_atualizar_periodic_task(sender, instance, **kwargs):
-    config = instance.configuracao
-    projeto = config.projeto
-
-    # Cria ou obtém o agendamento do tipo crontab
-    horario = instance.horario
-    crontab, _ = CrontabSchedule.objects.get_or_create(
-        minute=str(horario.minute),
-        hour=str(horario.hour),
-        day_of_week='*',
-        day_of_month='*',
-        month_of_year='*',
-        timezone=timezone.get_current_timezone_name()
-    )
+logger = logging.getLogger(__name__)
 
-    task_name = f"Backup | {projeto.nome} | {config.id} | {horario.strftime('%H:%M')}"
 
-    PeriodicTask.objects.update_or_create(
-        name=task_name,
-        defaults={
-            "task": "website.tasks.executar_backup_teste",
-            "crontab": crontab,
-            "args": json.dumps([config.id]),
-            "enabled": instance.ativo,
-        }
-    )
+# Mesma reconciliação usada pelo sync_agendamentos: a PeriodicTask de cada agendamento tem um
+# nome fixo (backup-agendamento-<id>) e só é gravada quando o horário/estado efetivo mudou
+@receiver(post_save, sender=AgendamentoBackup)
+def criar_ou_atualizar_periodic_task(sender, instance, **kwargs):
+    try:
+        sincronizar_agendamento(instance)
+    except ValueError as e:
+        logger.warning(f"Agendamento {instance.id} não sincronizado: {e}")
 
 
 @receiver(post_delete, sender=AgendamentoBackup)
 def deletar_periodic_task(sender, instance, **kwargs):
-    config = instance.configuracao
-    projeto = config.projeto
-    horario = instance.horario
+    remover_tarefa_agendamento(instance.id)
+
 
-    task_name = f"Backup | {projeto.nome} | {config.id} | {horario.strftime('%H:%M')}"
-    PeriodicTask.objects.filter(name=task_name).delete()
\ No newline at end of file
+@receiver(post_delete, sender=ExecucaoBackup)
+def remover_arquivo_log(sender, instance, **kwargs):
+    if instance.arquivo_log:
+        remover_log(instance.arquivo_log)
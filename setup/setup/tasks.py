@@ -1,18 +1,48 @@
 import os
 import re
+import random
 import yaml
 import shutil
 import logging
+import tempfile
+import tarfile
 import subprocess
-from celery import shared_task
-from django.utils import timezone
-from django.utils.timezone import now
-from datetime import timedelta, datetime
-from setup.models import ConfiguracaoBackup, ExecucaoBackup, LogExecucaoDetalhado, ArquivoIgnorado, Notificacao
-from website.utils.notificacao import enviar_email, enviar_telegram
+from contextlib import nullcontext
+import requests
+from celery import shared_task, group
+from django.conf import settings
+from django.utils.timezone import now, localdate
+from datetime import timedelta
+from setup.models import ConfiguracaoBackup, ExecucaoBackup, ArquivoIgnorado, Notificacao, SnapshotBackup, VerificacaoArquivo
+from website.utils.notificacao import enviar_email, enviar_telegram, erro_temporario
+from website.utils.copia import MotorCopia, criar_hardlink
+from website.utils.log_execucao import LogExecucaoBuffer
+from website.utils.manifesto import Manifesto, NOME_MANIFESTO
+from website.utils.snapshot import nome_snapshot, localizar_snapshot_anterior, registrar_snapshot
+from website.utils.ignorados import FiltroIgnorados
+from website.utils.compressao import comando_compressor, EXTENSOES
+from website.utils.varredura import varrer_origem
+from website.utils.arquivo_tar import ArquivoTar
+from website.utils.integridade import VerificadorIntegridade
+from website.utils.checkpoint import Checkpoint, caminho_checkpoint
+from website.utils.concorrencia import reservar_vagas
+from website.utils.metricas import TemposEtapas, gerar_resumos_diarios
+from website.utils.ssh import ConexaoSSH
+from website.utils.limitador import criar_limitadores, PrioridadeIOOciosa
+from website.utils.sqlite_backup import copiar_sqlite, comprimir_arquivo
+from website.utils.progresso import ProgressoExecucao
 
 logger = logging.getLogger(__name__)
 
+# Pasta onde o executar_backup grava o dump do banco: dentro do snapshot/espelho ou do .tar
+PASTA_DUMP = 'dump_banco'
+
+# Quantidade de arquivos por chamada do sha256sum no host remoto na verificação de integridade
+LOTE_HASHES_REMOTOS = 1000
+
+# Threads que listam as pastas da origem em paralelo
+WORKERS_VARREDURA = getattr(settings, 'BACKUP_WORKERS_VARREDURA', 8)
+
 @shared_task
 def executar_backup_teste(configuracao_id):
     try:
@@ -21,27 +51,47 @@ def executar_backup_teste(configuracao_id):
         if not config.destino_backup:
             raise ValueError(f"Destino de backup não definido para a configuração {configuracao_id}")
         
-        if not config.origem_arquivos:
-            raise ValueError(f"Origem de arquivos não definida para a configuração {configuracao_id}")
-        
         projeto = config.projeto
-        timestap = now().strftime("%Y%m%d_%H%M%S")
+        if not projeto.caminho_media:
+            raise ValueError(f"Origem de arquivos não definida para a configuração {configuracao_id}")
+
+        data_snapshot = now()
+        pasta_snapshot = nome_snapshot(projeto.nome, data_snapshot)
+
+        # No modo snapshot os arquivos sem alteração viram hardlinks para o snapshot anterior
+        link_dest = None
+        if config.modo_saida == 'snapshot':
+            snapshot_anterior = localizar_snapshot_anterior(config, ignorar=pasta_snapshot)
+            if snapshot_anterior:
+                link_dest = os.path.join(snapshot_anterior, "arquivos")
 
-        destino = os.path.join(config.destino_backup, f"{projeto.nome}_{timestap}")
+        destino = os.path.join(config.destino_backup, pasta_snapshot)
         os.makedirs(destino, exist_ok=True)
+        registrar_snapshot(config, destino, data_snapshot, concluido=False)
 
         logger.info(f"Iniciando o backup do projeto: {projeto.nome}")
-        
-        if config.tipo_backup == 1:
-            logger.info(f"Backup com dump selecionado")
-            # Backup com dump do banco + rsync dos arquivos
-            executar_pg_dump(config, destino)
-            executar_rsync(config, destino)
 
-        elif config.tipo_backup == 2:
-            logger.info(f"Backup via rsync selecionado")
-            # Apenas rsync
-            executar_rsync(config, destino)
+        prioridade_io = PrioridadeIOOciosa()
+        if config.io_ociosa:
+            prioridade_io.aplicar()
+
+        # Origem remota: uma conexão SSH compartilhada entre o dump e o rsync
+        try:
+            with ConexaoSSH.da_configuracao(config) or nullcontext() as conexao:
+                if config.tipo_backup == 1:
+                    logger.info(f"Backup com dump selecionado")
+                    # Backup com dump do banco + rsync dos arquivos
+                    executar_dump_banco(config, destino, conexao=conexao)
+                    total_arquivos, total_bytes = executar_rsync(config, destino, link_dest=link_dest, conexao=conexao)
+
+                elif config.tipo_backup == 2:
+                    logger.info(f"Backup via rsync selecionado")
+                    # Apenas rsync
+                    total_arquivos, total_bytes = executar_rsync(config, destino, link_dest=link_dest, conexao=conexao)
+        finally:
+            prioridade_io.restaurar()
+
+        registrar_snapshot(config, destino, data_snapshot, tamanho_bytes=total_bytes, total_arquivos=total_arquivos)
 
         logger.info(f"Backup finalizado para: {projeto.nome}")
         return f"Backup finalizado com sucesso para: {projeto.nome}"
@@ -84,189 +134,880 @@ def ler_dados_banco_docker_compose(caminho_yaml):
         raise Exception(f"Erro lendo docker-compose.yaml: {str(e)}")
 
 
-def executar_pg_dump(config, destino):
+def executar_dump_banco(config, destino, conexao=None):
+    if config.projeto.tipo_banco == 'sqlite3':
+        return executar_backup_sqlite(config, destino, conexao=conexao)
+    return executar_pg_dump(config, destino, conexao=conexao)
+
+
+def executar_backup_sqlite(config, destino, conexao=None):
+    # SQLite: backup online pela API do SQLite (sem travar a aplicação durante a cópia inteira).
+    # banco_nome é o caminho do arquivo do banco. No modo stream a cópia é comprimida em seguida.
+    projeto = config.projeto
+    if conexao is not None:
+        raise Exception("Backup do banco SQLite não suportado com origem remota (SSH)")
+    if not config.banco_nome:
+        raise ValueError(f"Caminho do banco SQLite não definido para a configuração {config.id}")
+
+    nome_arquivo = os.path.join(destino, f"{projeto.nome}_dump.sqlite3")
+    if config.modo_dump == 'stream':
+        nome_arquivo += EXTENSOES[config.compressao_dump]
+    temporario = f"{nome_arquivo}.tmp"
+    copia = f"{nome_arquivo}.db.tmp"
+    remover_caminho(temporario)
+    remover_caminho(copia)
+
+    logger.info(f"Executando backup online do SQLite para {projeto.nome}")
+    try:
+        paginas, reinicios = copiar_sqlite(
+            config.banco_nome,
+            copia,
+            paginas=getattr(settings, 'BACKUP_SQLITE_PAGINAS', 1000),
+            pausa=getattr(settings, 'BACKUP_SQLITE_PAUSA', 0.05),
+        )
+        if config.modo_dump == 'stream':
+            comprimir_arquivo(copia, temporario, config.compressao_dump)
+        else:
+            os.replace(copia, temporario)
+    finally:
+        remover_caminho(copia)
+    logger.info(f"Backup do SQLite concluído: {paginas} página(s), {reinicios} reinício(s) por gravações durante a cópia")
+
+    remover_caminho(nome_arquivo)
+    os.replace(temporario, nome_arquivo)
+    return nome_arquivo
+
+
+def executar_pg_dump(config, destino, conexao=None):
     projeto = config.projeto
-    nome_arquivo = os.path.join(destino, f"{projeto.nome}_dump.sql")
+    host = config.banco_host
+    porta = config.banco_porta or 5432
+
+    if conexao is not None:
+        # Banco acessível a partir do host remoto: túnel pela conexão SSH já aberta
+        porta = conexao.encaminhar_porta(host or 'localhost', porta)
+        host = '127.0.0.1'
 
     comando = [
         "pg_dump",
-        "-U", config.usuario_banco,
-        "-h", config.host_banco,
-        "-p", str(config.porta_banco),
-        "-d", config.nome_banco,
-        "-F", "c", # formato custom
-        "-f", nome_arquivo
+        "-U", config.banco_usuario,
+        "-h", host,
+        "-p", str(porta),
+        "-d", config.banco_nome,
     ]
 
     env = os.environ.copy()
-    env["PGPASSWORD"] = config.senha_banco
-
-    logger.info(f"Executando pg_dump para {projeto.nome}")
+    env["PGPASSWORD"] = config.banco_senha or ''
+
+    # O dump é gerado com um nome temporário e só substitui o anterior quando termina sem erro
+    if config.modo_dump == 'diretorio':
+        # Formato diretório: única forma do pg_dump exportar as tabelas em paralelo
+        nome_arquivo = os.path.join(destino, f"{projeto.nome}_dump")
+        comando += ["-F", "d", "-j", str(config.jobs_dump or 1), "-f", f"{nome_arquivo}.tmp"]
+    elif config.modo_dump == 'stream':
+        # Formato custom sem compressão interna, comprimido em stream direto para o destino
+        nome_arquivo = os.path.join(destino, f"{projeto.nome}_dump.sql{EXTENSOES[config.compressao_dump]}")
+        comando += ["-F", "c", "-Z", "0"]
+    else:
+        nome_arquivo = os.path.join(destino, f"{projeto.nome}_dump.sql")
+        comando += ["-F", "c", "-f", f"{nome_arquivo}.tmp"]
+
+    temporario = f"{nome_arquivo}.tmp"
+    remover_caminho(temporario)
+
+    logger.info(f"Executando pg_dump ({config.modo_dump}) para {projeto.nome}")
     try:
-        subprocess.run(comando, check=True, env=env)
+        if config.modo_dump == 'stream':
+            executar_em_stream(comando, comando_compressor(config.compressao_dump), temporario, env=env)
+        else:
+            subprocess.run(comando, check=True, env=env, stderr=subprocess.PIPE, text=True)
     except subprocess.CalledProcessError as e:
         logger.error(f"Erro ao executar pg_dump: {e.stderr}")
+        remover_caminho(temporario)
         raise
 
-def executar_rsync(config, destino):
-    caminho_origem = config.origem_arquivos.rstrip("/") + "/"
-    caminho_destino = os.path.join(destino, "arquivos")
+    remover_caminho(nome_arquivo)
+    os.replace(temporario, nome_arquivo)
+    return nome_arquivo
 
+
+def executar_em_stream(comando, compressor, nome_arquivo, env=None):
+    # Encadeia comando | compressor > arquivo, sem gerar uma cópia intermediária sem compressão
+    with open(nome_arquivo, 'wb') as saida, tempfile.TemporaryFile() as erros_comando:
+        processo = subprocess.Popen(comando, stdout=subprocess.PIPE, stderr=erros_comando, env=env)
+        processo_compressor = subprocess.Popen(compressor, stdin=processo.stdout, stdout=saida, stderr=subprocess.PIPE)
+        # Fecha a ponta do pipe no processo atual para o comando receber SIGPIPE se o compressor morrer
+        processo.stdout.close()
+        _, erro_compressor = processo_compressor.communicate()
+        processo.wait()
+
+        if processo.returncode != 0:
+            erros_comando.seek(0)
+            raise subprocess.CalledProcessError(processo.returncode, comando, stderr=erros_comando.read().decode(errors='replace'))
+        if processo_compressor.returncode != 0:
+            raise subprocess.CalledProcessError(processo_compressor.returncode, compressor, stderr=erro_compressor.decode(errors='replace'))
+
+
+def remover_caminho(caminho):
+    if os.path.isdir(caminho) and not os.path.islink(caminho):
+        shutil.rmtree(caminho)
+    elif os.path.lexists(caminho):
+        os.remove(caminho)
+
+
+def executar_rsync(config, destino, link_dest=None, conexao=None):
+    caminho_destino = os.path.join(destino, "arquivos")
     os.makedirs(caminho_destino, exist_ok=True)
 
+    estatisticas, _ = rsync_origem(config, caminho_destino, conexao=conexao, link_dest=link_dest)
+    return estatisticas['total_arquivos'], estatisticas['total_bytes']
+
+
+def rsync_origem(config, caminho_destino, conexao=None, link_dest=None, padroes_ignorados=(), listar_transferidos=False):
+    # Sincroniza o caminho de mídia do projeto (local ou, com conexão, no host SSH) para caminho_destino.
+    # O rsync só transfere as diferenças (delta) dos arquivos alterados.
+    # Retorna (estatísticas do --stats, arquivos transferidos quando listar_transferidos)
+    caminho_origem = config.projeto.caminho_media.rstrip("/") + "/"
+
     comando = [
         "rsync",
-        "-av",
+        "-a" if config.manter_permissoes else "-rlt",
+        "--stats",
+    ]
+
+    if conexao is not None:
+        caminho_origem = f"{conexao.destino_rsync}:{caminho_origem}"
+        comando += ["-e", conexao.shell_rsync(), "--compress", "--partial"]
+
+    # Arquivos removidos da origem também são removidos do backup; o dump e os arquivos de
+    # controle gravados no destino ficam protegidos
+    if config.deletar_arquivos_remotos:
+        comando += ["--delete", f"--filter=P /{PASTA_DUMP}/", "--filter=P /.backup_*"]
+
+    for padrao in padroes_ignorados:
+        comando.append(f"--exclude={padrao}")
+
+    # Mesmo limite de banda (KB/s) do motor de cópia
+    if config.limite_banda:
+        comando.append(f"--bwlimit={config.limite_banda}")
+
+    # Arquivos iguais aos do snapshot anterior viram hardlinks em vez de uma nova cópia
+    if link_dest and os.path.isdir(link_dest):
+        comando.append(f"--link-dest={link_dest}")
+
+    if listar_transferidos:
+        comando.append("--out-format=>%n")
+
+    comando += [
         caminho_origem,
-        caminho_destino,
+        caminho_destino.rstrip("/") + "/",
     ]
 
     logger.info(f"Executando rsync de {caminho_origem} para {caminho_destino}")
 
     try:
-        subprocess.run(comando, check=True)
+        resultado = subprocess.run(comando, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
     except subprocess.CalledProcessError as e:
         logger.error(f"Erro ao executar rsync: {e.stderr}")
         raise
 
+    logger.info(resultado.stdout)
+    total_arquivos, total_bytes = ler_estatisticas_rsync(resultado.stdout)
+    transferidos_arquivos, transferidos_bytes = ler_transferencia_rsync(resultado.stdout)
+    estatisticas = {
+        'total_arquivos': total_arquivos,
+        'total_bytes': total_bytes,
+        'arquivos_transferidos': transferidos_arquivos,
+        'bytes_transferidos': transferidos_bytes,
+    }
+    # Com --out-format cada item transferido sai em uma linha ">caminho" (pastas terminam com /)
+    transferidos = [
+        linha[1:] for linha in resultado.stdout.splitlines()
+        if linha.startswith(">") and not linha.endswith("/")
+    ]
+    return estatisticas, transferidos
+
+
+def ler_estatisticas_rsync(saida):
+    # Extrai do --stats do rsync a quantidade de arquivos e o tamanho total da origem
+    total_arquivos = 0
+    total_bytes = 0
+    match = re.search(r'Number of files: [\d,.]+ \(reg: ([\d,.]+)', saida)
+    if match:
+        total_arquivos = int(re.sub(r'\D', '', match.group(1)))
+    match = re.search(r'Total file size: ([\d,.]+) bytes', saida)
+    if match:
+        total_bytes = int(re.sub(r'\D', '', match.group(1)))
+    return total_arquivos, total_bytes
+
+
+def ler_transferencia_rsync(saida):
+    # Arquivos e bytes efetivamente transferidos, também do --stats
+    arquivos = 0
+    tamanho = 0
+    match = re.search(r'Number of regular files transferred: ([\d,.]+)', saida)
+    if match:
+        arquivos = int(re.sub(r'\D', '', match.group(1)))
+    match = re.search(r'Total transferred file size: ([\d,.]+) bytes', saida)
+    if match:
+        tamanho = int(re.sub(r'\D', '', match.group(1)))
+    return arquivos, tamanho
+
 
 @shared_task(bind=True)
-def executar_backup(self, config_id):
+def executar_backup(self, config_id, execucao_id=None, esperas_vaga=0):
     execucao = None
+    logs = None
+    checkpoint = None
+    reserva = None
+    conexao = None
+    prioridade_io = PrioridadeIOOciosa()
+    progresso = None
+    pasta_dump_temporaria = None
+    tempos = TemposEtapas()
+    metricas = {}
+
+    def concluir(status, mensagem):
+        # Fecha a execução gravando a duração, os contadores e o tempo de cada etapa
+        execucao.status = status
+        execucao.data_fim = now()
+        execucao.duracao = execucao.data_fim - execucao.data_inicio
+        execucao.mensagem = mensagem
+        execucao.tempos_etapas = tempos.tempos
+        for campo, valor in metricas.items():
+            setattr(execucao, campo, valor)
+        execucao.save()
+
     try:
         config = ConfiguracaoBackup.objects.select_related('projeto').get(pk=config_id)
 
-        # Criar registro de execução
-        execucao = ExecucaoBackup.objects.create(
-            configuracao=config,
-            data_inicio=now(),
-            status='executando',
-            mensagem='Backup iniciado'
+        # Limites de concorrência por destino e por host de origem: sem vaga, a tarefa volta para a
+        # fila em vez de disputar o mesmo disco com os outros backups. As esperas têm um limite
+        # próprio (esperas_vaga) e não consomem nem zeram as retentativas por falha (retries).
+        reserva, limite_cheio = reservar_vagas(config, self.request.id)
+        if reserva is None:
+            max_esperas = getattr(settings, 'BACKUP_MAX_ESPERAS_VAGA', 120)
+            if esperas_vaga >= max_esperas:
+                logger.error(f"Backup da configuração {config_id} cancelado: sem vaga em '{limite_cheio}' após {esperas_vaga} espera(s)")
+                return f"Sem vaga em '{limite_cheio}' após {esperas_vaga} espera(s)"
+            espera = getattr(settings, 'BACKUP_ESPERA_VAGA', 30)
+            espera += random.uniform(0, espera / 2)
+            logger.info(f"Backup da configuração {config_id} aguardando vaga em '{limite_cheio}' ({espera:.0f}s, espera {esperas_vaga + 1}/{max_esperas})")
+            self.apply_async(
+                args=[config_id],
+                kwargs={'execucao_id': execucao_id, 'esperas_vaga': esperas_vaga + 1},
+                countdown=espera,
+                retries=self.request.retries,
+            )
+            return f"Aguardando vaga em '{limite_cheio}'"
+
+        # Classe de E/S idle para a tarefa; threads de cópia e processos filhos herdam
+        if config.io_ociosa:
+            prioridade_io.aplicar()
+
+        # Nas retentativas o mesmo registro de execução é reaproveitado
+        if execucao_id:
+            execucao = ExecucaoBackup.objects.filter(pk=execucao_id, configuracao=config).first()
+
+        if execucao:
+            execucao.status = 'executando'
+            execucao.data_fim = None
+            execucao.mensagem = f'Backup retomado (tentativa {self.request.retries + 1})'
+            execucao.save()
+        else:
+            # Criar registro de execução
+            execucao = ExecucaoBackup.objects.create(
+                configuracao=config,
+                data_inicio=now(),
+                status='executando',
+                mensagem='Backup iniciado'
+            )
+
+        # Progresso publicado durante a execução; a estimativa inicial vem da última execução com sucesso
+        progresso = ProgressoExecucao(execucao, tarefa=self)
+        anterior = (
+            ExecucaoBackup.objects
+            .filter(configuracao=config, status='sucesso')
+            .exclude(pk=execucao.pk)
+            .order_by('-data_inicio')
+            .values_list('arquivos_analisados', 'bytes_copiados', 'bytes_sem_alteracao')
+            .first()
         )
+        if anterior:
+            progresso.estimativa = (anterior[0], anterior[1] + anterior[2])
 
         projeto = config.projeto
-        origem = projeto.diretorio_origem
+        origem = projeto.caminho_media
         destino = config.destino_backup
-        ignorados = ArquivoIgnorado.objects.filter(configuracao=config).values_list('caminho', flat=True)
-
-        logs = []
+        padroes_ignorados = list(ArquivoIgnorado.objects.filter(configuracao=config).values_list('caminho', flat=True))
+        ignorados = FiltroIgnorados(padroes_ignorados)
+        limites = criar_limitadores(config)
+
+        logs = LogExecucaoBuffer(
+            execucao,
+            nivel_arquivos=config.nivel_log_arquivos,
+            amostragem=config.amostragem_log_arquivos,
+        )
 
         def log(tipo, msg):
-            LogExecucaoDetalhado.objects.create(execucao=execucao, tipo=tipo, mensagem=msg)
-            logs.append(f"[{tipo}] {msg}")
-
-        log("INFO", f"Iniciando backup do projeto '{projeto.nome}'")
-
-        if not os.path.exists(origem):
+            logs.registrar(tipo, msg)
+
+        log("info", f"Iniciando backup do projeto '{projeto.nome}'")
+
+        # Origem remota (ssh_ip preenchido): uma única conexão SSH mestre é aberta para a execução
+        # inteira e reaproveitada pelo túnel do pg_dump, pelo rsync/tar e pela verificação
+        conexao = ConexaoSSH.da_configuracao(config)
+        if conexao is not None:
+            conexao.abrir()
+            log("info", f"Conexão SSH aberta com {conexao.destino}:{conexao.porta}")
+            if subprocess.run(conexao.comando('test', '-d', origem), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode != 0:
+                raise Exception(f"Diretório de origem não encontrado em {conexao.host}: {origem}")
+        elif not os.path.exists(origem):
             raise Exception(f"Diretório de origem não encontrado: {origem}")
 
         if not os.path.exists(destino):
             os.makedirs(destino)
-            log("INFO", f"Diretório de destino criado: {destino}")
-
-        for root, dirs, files in os.walk(origem):
-            rel_path = os.path.relpath(root, origem)
+            log("info", f"Diretório de destino criado: {destino}")
+
+        # No modo snapshot cada execução grava em uma pasta nova (NOME_PROJETO_YYYYMMDD_HHMMSS_ffffff) e os
+        # arquivos sem alteração viram hardlinks para o snapshot anterior, como o rsync --link-dest.
+        # No modo arquivo cada execução gera um único NOME_PROJETO_YYYYMMDD_HHMMSS_ffffff.tar.(gz|zst).
+        # No modo espelho o backup é sempre atualizado na própria pasta de destino.
+        pasta_snapshot = nome_snapshot(projeto.nome, execucao.data_inicio)
+
+        # Checkpoint: se uma tentativa anterior (retry ou execução manual) parou no meio, continua
+        # no mesmo destino pulando os arquivos que ela já concluiu. Não se aplica ao modo arquivo
+        # nem à origem remota, onde o rsync já retoma sozinho (só transfere o que falta/mudou).
+        retomados = Manifesto()
+        cabecalho = None
+        if config.modo_saida != 'arquivo' and conexao is None:
+            checkpoint = Checkpoint(caminho_checkpoint(config))
+            cabecalho, retomados = checkpoint.carregar()
+            if cabecalho and cabecalho.get('modo') == config.modo_saida and os.path.isdir(cabecalho.get('destino') or ''):
+                if config.modo_saida == 'snapshot':
+                    pasta_snapshot = os.path.basename(cabecalho['destino'])
+                log("info", f"Retomando a execução {cabecalho.get('execucao')}: {len(retomados)} arquivo(s) já concluído(s)")
+            else:
+                cabecalho, retomados = None, Manifesto()
+
+        snapshot_anterior = None
+        if config.modo_saida == 'snapshot':
+            snapshot_anterior = localizar_snapshot_anterior(config, ignorar=pasta_snapshot)
+            base_anterior = snapshot_anterior
+            destino = os.path.join(destino, pasta_snapshot)
+            os.makedirs(destino, exist_ok=True)
+            # Catalogado já na criação: se a execução parar no meio, a pasta ainda entra na retenção
+            registrar_snapshot(config, destino, execucao.data_inicio, execucao=execucao, concluido=False)
+            log("info", f"Snapshot: {destino} (anterior: {snapshot_anterior or 'nenhum'})")
+        else:
+            base_anterior = destino
+
+        if checkpoint is not None:
+            checkpoint.iniciar({'execucao': execucao.id, 'modo': config.modo_saida, 'destino': destino}, retomar=cabecalho is not None)
 
-            if any(rel_path.startswith(ign) for ign in ignorados):
-                log("IGNORADO", f"Pasta ignorada: {rel_path}")
-                continue
-
-            dest_dir = os.path.join(destino, rel_path)
-            os.makedirs(dest_dir, exist_ok=True)
-
-            for file in files:
-                file_rel_path = os.path.join(rel_path, file)
-                if any(file_rel_path.startswith(ign) for ign in ignorados):
-                    log("IGNORADO", f"Arquivo ignorado: {file_rel_path}")
-                    continue
-
-                src_file = os.path.join(root, file)
-                dest_file = os.path.join(dest_dir, file)
+        if config.tipo_backup == 1:
+            # Dump do banco antes da cópia dos arquivos, sempre junto da própria execução: na pasta
+            # do snapshot/espelho ou, no modo arquivo, em uma pasta temporária que entra no .tar
+            if config.modo_saida == 'arquivo':
+                destino_dump = pasta_dump_temporaria = os.path.join(destino, f".backup_dump_{pasta_snapshot}")
+            else:
+                destino_dump = os.path.join(destino, PASTA_DUMP)
+            os.makedirs(destino_dump, exist_ok=True)
+            progresso.etapa('dump', 0, 0)
+            with tempos.etapa('dump'):
+                arquivo_dump = executar_dump_banco(config, destino_dump, conexao=conexao)
+            log("info", f"Dump do banco gerado: {arquivo_dump}")
+
+        def ao_ignorar(rel_path, pasta):
+            logs.registrar_arquivo('ignorado', f"{'Pasta ignorada' if pasta else 'Arquivo ignorado'}: {rel_path}")
+
+        if config.modo_saida == 'arquivo':
+            caminho_arquivo = os.path.join(destino, f"{pasta_snapshot}.tar{EXTENSOES[config.compressao_arquivo]}")
+            registrar_snapshot(config, caminho_arquivo, execucao.data_inicio, tipo='arquivo', execucao=execucao, concluido=False)
+            with tempos.etapa('arquivo'):
+                if conexao is not None:
+                    progresso.etapa('arquivo')
+                    erros, total_arquivos, total_bytes = gerar_arquivo_tar_remoto(config, conexao, origem, caminho_arquivo, padroes_ignorados, logs, limites, pasta_dump_temporaria)
+                else:
+                    erros, total_arquivos, total_bytes = gerar_arquivo_tar(config, origem, caminho_arquivo, ignorados, ao_ignorar, logs, limites, progresso, pasta_dump_temporaria)
+            metricas.update(arquivos_analisados=total_arquivos, arquivos_copiados=total_arquivos, bytes_copiados=total_bytes, bytes_sem_alteracao=0)
+            registrar_snapshot(config, caminho_arquivo, execucao.data_inicio, tipo='arquivo', execucao=execucao, tamanho_bytes=total_bytes, total_arquivos=total_arquivos)
+        else:
+            with tempos.etapa('copia'):
+                if conexao is not None:
+                    # O rsync só informa o resultado no final: apenas a etapa é publicada
+                    progresso.etapa('copia')
+                    erros, manifesto, copiados = copiar_origem_remota(config, conexao, destino, snapshot_anterior, padroes_ignorados, logs, metricas)
+                else:
+                    erros, manifesto, copiados = copiar_origem(config, origem, destino, base_anterior, snapshot_anterior, ignorados, ao_ignorar, logs, checkpoint, retomados, metricas, limites, progresso)
+            if config.modo_saida == 'snapshot':
+                registrar_snapshot(
+                    config, destino, execucao.data_inicio, execucao=execucao,
+                    tamanho_bytes=metricas['bytes_copiados'] + metricas['bytes_sem_alteracao'],
+                    total_arquivos=metricas['arquivos_analisados'],
+                )
+
+            if config.verificar_integridade != 'desligado':
+                with tempos.etapa('verificacao'):
+                    erros += verificar_integridade(config, execucao, origem, destino, manifesto, copiados, logs, conexao=conexao, limites=limites, progresso=progresso)
+
+        # Erros de cópia são registrados por arquivo; o restante do backup segue normalmente
+        for file_rel_path, erro in erros:
+            log("error", f"Erro ao copiar {file_rel_path}: {erro}")
+
+        if erros:
+            concluir('falha', f'Backup concluído com {len(erros)} erro(s) de cópia')
+            logs.fechar()
+            notificar_resultado(config, execucao.status, execucao.mensagem)
+            return execucao.mensagem
 
-                shutil.copy2(src_file, dest_file)
-                log("COPIA", f"Copiado: {file_rel_path}")
-        
         # Sucesso
-        execucao.status = 'sucesso'
-        execucao.data_fim = now()
-        execucao.mensagem = 'Backup concluído com sucesso'
-        execucao.save()
-        notificar_resultado(config, execucao.status, 'Backup concluído com sucesso')
+        concluir('sucesso', 'Backup concluído com sucesso')
 
         # Log detalhado
-        LogExecucaoDetalhado.objects.create(
-            execucao=execucao,
-            tipo='info',
-            mensagem='Backup executado com sucesso',
-            timestamp=now()
-        )
+        log('info', 'Backup executado com sucesso')
+        logs.fechar()
+
+        notificar_resultado(config, execucao.status, 'Backup concluído com sucesso')
 
         return "Backup concluído"
 
     except Exception as e:
+        if checkpoint is not None:
+            # Mantém o diário no disco para a próxima tentativa continuar de onde parou
+            checkpoint.fechar()
+
         if execucao:
-            execucao.status = 'falha'
-            execucao.data_fim = now()
-            execucao.mensagem = str(e)
-            execucao.save()
+            concluir('falha', str(e))
+
+            if logs is None:
+                logs = LogExecucaoBuffer(execucao)
+            logs.registrar('error', str(e))
+            logs.fechar()
+
             notificar_resultado(config, execucao.status, 'Falha ao executar o backup')
 
-            LogExecucaoDetalhado.objects.create(
-                execucao=execucao,
-                tipo='erro',
-                mensagem=str(e),
-                timestamp=now()
-            )
+        raise self.retry(
+            exc=e,
+            countdown=60,
+            max_retries=3,
+            args=[config_id],
+            kwargs={'execucao_id': execucao.id if execucao else None},
+        )
+    finally:
+        if pasta_dump_temporaria is not None:
+            remover_caminho(pasta_dump_temporaria)
+        if conexao is not None:
+            conexao.fechar()
+        prioridade_io.restaurar()
+        if reserva is not None:
+            reserva.liberar()
+
+
+def copiar_origem(config, origem, destino, base_anterior, snapshot_anterior, ignorados, ao_ignorar, logs, checkpoint, retomados, metricas, limites=(None, None), progresso=None):
+    # Cópia dos arquivos nos modos espelho e snapshot. Cada arquivo concluído vai para o checkpoint;
+    # os que já estão nele (retomados) e não mudaram na origem são pulados.
+    # Retorna (erros por arquivo, manifesto do backup, arquivos copiados nesta execução) e
+    # preenche metricas com os contadores da execução
+
+    # Manifesto do backup anterior: só é copiado o que é novo ou mudou desde então
+    caminho_manifesto = os.path.join(destino, NOME_MANIFESTO)
+    manifesto_anterior = Manifesto()
+    if config.backup_incremental and base_anterior:
+        manifesto_anterior = Manifesto.carregar(os.path.join(base_anterior, NOME_MANIFESTO))
+    manifesto = Manifesto()
+    stats_pendentes = {}
+    vistos = set()
+    copiados = []
+    # Arquivos com mais de um hardlink na origem: (st_dev, st_ino) -> primeiro caminho visto.
+    # Os demais caminhos do mesmo inode viram hardlinks no destino depois que o primeiro termina.
+    inodes = {}
+    links_pendentes = []
+
+    # Estimativa do progresso: o manifesto anterior; sem ele, a última execução
+    if progresso is not None:
+        if len(manifesto_anterior):
+            progresso.etapa('copia', len(manifesto_anterior), manifesto_anterior.tamanho_total())
+        else:
+            progresso.etapa('copia')
+
+    def concluir_arquivo(rel_path, st, hash_arquivo):
+        # Todo arquivo concluído (copiado, mantido ou hardlink) passa por aqui
+        manifesto.registrar(rel_path, st, hash_arquivo)
+        if progresso is not None:
+            progresso.avancar(1, st.st_size)
+
+    def ao_copiar(rel_path, tamanho, hash_arquivo):
+        st = stats_pendentes.pop(rel_path)
+        concluir_arquivo(rel_path, st, hash_arquivo)
+        checkpoint.registrar(rel_path, st, hash_arquivo)
+        copiados.append(rel_path)
+        logs.registrar_arquivo('copia', f"Copiado: {rel_path}")
+
+    def ao_manter(rel_path, tamanho, hash_arquivo):
+        st = stats_pendentes.pop(rel_path)
+        concluir_arquivo(rel_path, st, hash_arquivo)
+        checkpoint.registrar(rel_path, st, hash_arquivo)
+
+    def ao_falhar(rel_path, erro):
+        # Fica fora do manifesto para ser copiado novamente na próxima execução
+        stats_pendentes.pop(rel_path, None)
+
+    motor = MotorCopia(
+        workers=config.workers_copia,
+        ao_copiar=ao_copiar,
+        ao_manter=ao_manter,
+        ao_falhar=ao_falhar,
+        limite_bytes=limites[0],
+        limite_arquivos=limites[1],
+    )
+
+    with motor:
+        for tipo, file_rel_path, src_file, st in varrer_origem(origem, ignorados, ao_ignorar, workers=WORKERS_VARREDURA):
+            dest_file = os.path.join(destino, file_rel_path)
+
+            if tipo == 'pasta':
+                motor.criar_diretorio(dest_file)
+                continue
+            if file_rel_path == NOME_MANIFESTO:
+                continue
 
-        raise self.retry(exc=e, countdown=60, max_retries=3)
+            # stat feito pela varredura; sem ele (link quebrado, arquivo removido no meio da varredura)
+            # o stat é refeito aqui e a falha vira um erro do arquivo, como nas falhas de cópia
+            if st is None:
+                try:
+                    st = os.stat(src_file)
+                except OSError as e:
+                    motor.erros.append((file_rel_path, str(e)))
+                    continue
+            vistos.add(file_rel_path)
+
+            if st.st_nlink > 1:
+                primeiro = inodes.setdefault((st.st_dev, st.st_ino), file_rel_path)
+                if primeiro != file_rel_path:
+                    links_pendentes.append((file_rel_path, primeiro, st))
+                    continue
+
+            if not retomados.alterado(file_rel_path, st):
+                # Já concluído por uma tentativa anterior desta execução
+                concluir_arquivo(file_rel_path, st, retomados.hash(file_rel_path))
+                motor.total_mantidos += 1
+                continue
+
+            if not manifesto_anterior.alterado(file_rel_path, st):
+                hash_anterior = manifesto_anterior.hash(file_rel_path)
+                base = os.path.join(snapshot_anterior, file_rel_path) if snapshot_anterior else None
+                if not config.hash_manifesto:
+                    # Mesmo tamanho, mtime e inode: mantém o arquivo do backup anterior
+                    if base:
+                        stats_pendentes[file_rel_path] = st
+                        motor.manter(src_file, dest_file, file_rel_path, base, hash_anterior)
+                    else:
+                        concluir_arquivo(file_rel_path, st, hash_anterior)
+                        motor.total_mantidos += 1
+                    continue
+                if hash_anterior:
+                    # Com hash habilitado, o conteúdo ainda é conferido antes de decidir
+                    stats_pendentes[file_rel_path] = st
+                    motor.copiar(src_file, dest_file, file_rel_path, hash_esperado=hash_anterior, base=base)
+                    continue
+                # Ainda sem hash no manifesto: copia novamente para passar a guardá-lo
+
+            stats_pendentes[file_rel_path] = st
+            motor.copiar(src_file, dest_file, file_rel_path, gerar_hash=config.hash_manifesto)
+
+        motor.aguardar()
+
+        # Hardlinks adiados: o primeiro caminho do inode já está no destino
+        total_links = 0
+        for file_rel_path, primeiro, st in links_pendentes:
+            dest_file = os.path.join(destino, file_rel_path)
+            if primeiro in manifesto:
+                try:
+                    criar_hardlink(os.path.join(destino, primeiro), dest_file)
+                except OSError as e:
+                    logs.registrar_arquivo('copia', f"Hardlink não criado ({e}), copiando: {file_rel_path}")
+                else:
+                    hash_arquivo = manifesto.hash(primeiro)
+                    concluir_arquivo(file_rel_path, st, hash_arquivo)
+                    checkpoint.registrar(file_rel_path, st, hash_arquivo)
+                    total_links += 1
+                    continue
+            # O primeiro caminho falhou ou o link não é possível (ex: limite de links): cópia normal
+            stats_pendentes[file_rel_path] = st
+            motor.copiar(os.path.join(origem, file_rel_path), dest_file, file_rel_path, gerar_hash=config.hash_manifesto)
+
+        erros = motor.aguardar()
+
+    # Registra os arquivos que existiam no backup anterior e não estão mais na origem
+    removidos = manifesto_anterior.removidos(vistos)
+    for file_rel_path in removidos:
+        logs.registrar_arquivo('removido', f"Removido da origem: {file_rel_path}")
+
+    manifesto.salvar(caminho_manifesto)
+    checkpoint.remover()
+    logs.registrar("info", f"{motor.total_copiados} arquivo(s) copiado(s), {motor.total_mantidos} sem alteração, {total_links} hardlink(s), {len(removidos)} removido(s) da origem")
+    if motor.metodos:
+        logs.registrar("info", "Mecanismos de cópia: " + ", ".join(f"{metodo} {total}" for metodo, total in motor.metodos.items()))
+    metricas.update(
+        arquivos_analisados=len(vistos),
+        arquivos_copiados=motor.total_copiados,
+        bytes_copiados=motor.total_bytes,
+        bytes_sem_alteracao=max(manifesto.tamanho_total() - motor.total_bytes, 0),
+        metodos_copia=motor.metodos,
+    )
+    return erros, manifesto, copiados
+
+
+def copiar_origem_remota(config, conexao, destino, snapshot_anterior, padroes_ignorados, logs, metricas):
+    # Cópia nos modos espelho e snapshot quando a origem está em outro host: rsync pela conexão
+    # SSH, transferindo só o delta dos arquivos alterados. No modo snapshot os arquivos sem
+    # alteração viram hardlinks para o snapshot anterior (--link-dest).
+    # Mesmo retorno do copiar_origem; sem manifesto, o rsync compara com o próprio destino.
+    estatisticas, copiados = rsync_origem(
+        config, destino,
+        conexao=conexao,
+        link_dest=snapshot_anterior,
+        padroes_ignorados=padroes_ignorados,
+        listar_transferidos=True,
+    )
+    for rel_path in copiados:
+        logs.registrar_arquivo('copia', f"Copiado: {rel_path}")
+
+    logs.registrar("info", f"{estatisticas['arquivos_transferidos']} arquivo(s) transferido(s) de {estatisticas['total_arquivos']} ({estatisticas['bytes_transferidos']} bytes)")
+    metricas.update(
+        arquivos_analisados=estatisticas['total_arquivos'],
+        arquivos_copiados=estatisticas['arquivos_transferidos'],
+        bytes_copiados=estatisticas['bytes_transferidos'],
+        bytes_sem_alteracao=max(estatisticas['total_bytes'] - estatisticas['bytes_transferidos'], 0),
+        metodos_copia={'rsync': estatisticas['arquivos_transferidos']},
+    )
+    return [], None, copiados
+
+
+def listar_arquivos_backup(destino):
+    # Arquivos do backup (sem o dump e os arquivos de controle), relativos ao destino
+    rel_paths = []
+    for pasta, subpastas, arquivos in os.walk(destino):
+        if pasta == destino:
+            subpastas[:] = [nome for nome in subpastas if nome != PASTA_DUMP]
+            arquivos = [nome for nome in arquivos if not nome.startswith('.backup_')]
+        for nome in arquivos:
+            rel_paths.append(os.path.relpath(os.path.join(pasta, nome), destino))
+    return rel_paths
+
+
+def verificar_integridade(config, execucao, origem, destino, manifesto, copiados, logs, conexao=None, limites=(None, None), progresso=None):
+    # Confere, em paralelo, o hash do destino contra o da origem: só os arquivos copiados nesta
+    # execução ou todos os do backup. Quando o manifesto já tem o hash da origem ele é reaproveitado.
+    # Com origem remota os hashes da origem são calculados no próprio host (sha256sum), em lotes
+    # pela conexão SSH, sem trazer os arquivos de volta.
+    # Os hashes ficam registrados na execução (VerificacaoArquivo). Retorna as divergências.
+    if config.verificar_integridade == 'copiados':
+        rel_paths = copiados
+    elif manifesto is not None:
+        rel_paths = list(manifesto.entradas)
+    else:
+        rel_paths = listar_arquivos_backup(destino)
+    registros = []
+    if progresso is not None:
+        progresso.etapa('verificacao', len(rel_paths), 0)
+
+    def ao_resultado(rel_path, hash_origem, hash_destino, erro):
+        registros.append(VerificacaoArquivo(
+            execucao=execucao,
+            caminho=rel_path,
+            hash_origem=hash_origem,
+            hash_destino=hash_destino,
+            valido=erro is None and hash_origem == hash_destino,
+            erro=str(erro) if erro else None,
+        ))
+        if progresso is not None:
+            progresso.avancar()
+        if len(registros) >= 1000:
+            VerificacaoArquivo.objects.bulk_create(registros)
+            registros.clear()
+
+    with VerificadorIntegridade(workers=config.workers_copia, ao_resultado=ao_resultado, limite_bytes=limites[0], limite_arquivos=limites[1]) as verificador:
+        if conexao is None:
+            for rel_path in rel_paths:
+                verificador.verificar(os.path.join(origem, rel_path), os.path.join(destino, rel_path), rel_path, hash_origem=manifesto.hash(rel_path))
+        else:
+            for i in range(0, len(rel_paths), LOTE_HASHES_REMOTOS):
+                lote = rel_paths[i:i + LOTE_HASHES_REMOTOS]
+                hashes = conexao.hashes_remotos(origem, lote)
+                for rel_path in lote:
+                    if rel_path in hashes:
+                        verificador.verificar(None, os.path.join(destino, rel_path), rel_path, hash_origem=hashes[rel_path])
+                    else:
+                        verificador.divergentes.append((rel_path, "arquivo não encontrado na origem remota"))
+                        ao_resultado(rel_path, None, None, "arquivo não encontrado na origem remota")
+        divergentes = verificador.aguardar()
+
+    VerificacaoArquivo.objects.bulk_create(registros)
+    logs.registrar("info", f"Verificação de integridade: {verificador.total_verificados} arquivo(s) conferido(s), {len(divergentes)} divergência(s)")
+    if config.verificar_integridade == 'copiados' and manifesto is not None and len(manifesto) > len(rel_paths):
+        # Arquivos sem alteração (hardlink/cópia mantida do backup anterior) não são lidos de novo
+        logs.registrar("info", f"{len(manifesto) - len(rel_paths)} arquivo(s) herdado(s) do backup anterior sem verificação nesta execução")
+    return divergentes
+
+
+def gerar_arquivo_tar_remoto(config, conexao, origem, caminho_arquivo, padroes_ignorados, logs, limites=(None, None), pasta_dump=None):
+    # Modo arquivo com origem remota: o tar roda no host e o stream vem pela conexão SSH. As entradas
+    # são lidas em stream e regravadas no ArquivoTar local, que recebe também o dump do banco.
+    comando = conexao.comando('tar', '-C', origem, '-cf', '-', *[f"--exclude={padrao}" for padrao in padroes_ignorados], '.')
+    arquivo_tar = ArquivoTar(caminho_arquivo, config.compressao_arquivo, limite_bytes=limites[0], limite_arquivos=limites[1])
+    with tempfile.TemporaryFile() as erros_comando:
+        processo = subprocess.Popen(comando, stdout=subprocess.PIPE, stderr=erros_comando)
+        try:
+            with tarfile.open(fileobj=processo.stdout, mode='r|') as tar_remoto:
+                for membro in tar_remoto:
+                    arquivo_tar.adicionar_membro(membro, tar_remoto.extractfile(membro) if membro.isreg() else None)
+            processo.stdout.close()
+            if processo.wait() != 0:
+                erros_comando.seek(0)
+                raise Exception(f"Erro ao gerar o tar em {conexao.host}: {erros_comando.read().decode(errors='replace')}")
+            if pasta_dump is not None:
+                arquivar_dump(arquivo_tar, pasta_dump)
+            arquivo_tar.fechar()
+        except BaseException:
+            processo.kill()
+            processo.wait()
+            arquivo_tar.abortar()
+            raise
+
+    logs.registrar("info", f"Arquivo gerado a partir de {conexao.host}: {caminho_arquivo} ({arquivo_tar.total_arquivos} arquivo(s), {arquivo_tar.total_bytes} bytes)")
+    return [], arquivo_tar.total_arquivos, arquivo_tar.total_bytes
+
+
+def gerar_arquivo_tar(config, origem, caminho_arquivo, ignorados, ao_ignorar, logs, limites=(None, None), progresso=None, pasta_dump=None):
+    # Modo arquivo: a origem inteira vai em stream para um único .tar comprimido, seguida do dump do banco.
+    # Retorna (erros por arquivo, total de arquivos no backup, tamanho total em bytes)
+    erros = []
+    arquivo_tar = ArquivoTar(caminho_arquivo, config.compressao_arquivo, limite_bytes=limites[0], limite_arquivos=limites[1])
+    if progresso is not None:
+        progresso.etapa('arquivo')
+    try:
+        for tipo, rel_path, caminho, _ in varrer_origem(origem, ignorados, ao_ignorar, workers=WORKERS_VARREDURA):
+            if not rel_path:
+                continue
+            bytes_antes = arquivo_tar.total_bytes
+            erro = arquivo_tar.adicionar(caminho, rel_path)
+            if erro is not None:
+                erros.append((rel_path, str(erro)))
+            elif tipo == 'arquivo':
+                logs.registrar_arquivo('copia', f"Arquivado: {rel_path}")
+                if progresso is not None:
+                    progresso.avancar(1, arquivo_tar.total_bytes - bytes_antes)
+        if pasta_dump is not None:
+            arquivar_dump(arquivo_tar, pasta_dump)
+        arquivo_tar.fechar()
+    except Exception:
+        arquivo_tar.abortar()
+        raise
+
+    logs.registrar("info", f"Arquivo gerado: {caminho_arquivo} ({arquivo_tar.total_arquivos} arquivo(s), {arquivo_tar.total_bytes} bytes)")
+    return erros, arquivo_tar.total_arquivos, arquivo_tar.total_bytes
+
+
+def arquivar_dump(arquivo_tar, pasta_dump):
+    # O dump entra no .tar em PASTA_DUMP/, como nos modos snapshot e espelho.
+    # Diferente dos arquivos da origem, uma falha aqui derruba o arquivo inteiro.
+    entradas = [(pasta_dump, PASTA_DUMP)]
+    for pasta, subpastas, arquivos in os.walk(pasta_dump):
+        for nome in sorted(subpastas) + sorted(arquivos):
+            caminho = os.path.join(pasta, nome)
+            entradas.append((caminho, os.path.join(PASTA_DUMP, os.path.relpath(caminho, pasta_dump))))
+    for caminho, rel_path in entradas:
+        erro = arquivo_tar.adicionar(caminho, rel_path)
+        if erro is not None:
+            raise Exception(f"Erro ao incluir o dump do banco no arquivo: {erro}")
 
 
 def notificar_resultado(config, status, mensagem_final):
+    # Só enfileira os envios: cada destinatário vira uma tarefa própria, executada em paralelo
+    # pelos workers e com retentativas, liberando a tarefa de backup assim que os dados estão salvos
     notificacoes = Notificacao.objects.filter(configuracao=config, ativo=True)
-    for n in notificacoes:
-        if (status == 'sucesso' and not n.enviar_sucesso) or (status == 'falha' and not n.enviar_falha):
-            continue
+    if status == 'sucesso':
+        notificacoes = notificacoes.filter(enviar_sucesso=True)
+    elif status == 'falha':
+        notificacoes = notificacoes.filter(enviar_falha=True)
+
+    ids = list(notificacoes.values_list('id', flat=True))
+    if ids:
+        group(enviar_notificacao.s(notificacao_id, status, mensagem_final) for notificacao_id in ids).apply_async()
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(requests.RequestException,),
+    retry_backoff=10,
+    retry_backoff_max=600,
+    retry_jitter=True,
+    max_retries=5,
+)
+def enviar_notificacao(self, notificacao_id, status, mensagem_final):
+    try:
+        n = Notificacao.objects.get(pk=notificacao_id)
+    except Notificacao.DoesNotExist:
+        return f"Notificação ID {notificacao_id} não encontrada"
 
+    # Erros temporários sobem para o autoretry do Celery, que tenta novamente com backoff exponencial;
+    # os demais (ex.: 400/401/403/404) só são registrados, pois falhariam igual nas retentativas
+    try:
         if n.meio == 'email' and n.destino_email:
-            enviar_email(n.destino_email, f"[Backup] Resultado: {status.upper()}", mensagem_final)
+            enviar_email(n.destino_email, f"[Backup] Resultado: {status.upper()}", mensagem_final, levantar_erro=True)
         elif n.meio == 'telegram' and n.telegram_chat_id:
-            enviar_telegram(n.telegram_chat_id, mensagem_final)
+            enviar_telegram(n.telegram_chat_id, mensagem_final, levantar_erro=True)
+    except requests.RequestException as e:
+        if erro_temporario(e):
+            raise
+        logger.error(f"Notificação {notificacao_id} descartada sem nova tentativa: {e}")
+        return f"Notificação {notificacao_id} não enviada: {e}"
+    return f"Notificação {notificacao_id} enviada"
 
 
 @shared_task
 def limpar_backups_antigos():
-    configuracoes = ConfiguracaoBackup.objects.exclude(destino_backup__isnull=True).exclude(destino_backup__exact='')
-
-    for config in configuracoes:
-        destino = config.destino_backup
-        dias_a_manter = config.dias_reter_backup or 7 # 7 dias é o padrão definido
-        data_limite = now() - timedelta(days=dias_a_manter)
-
-        if not os.path.exists(destino):
-            continue
-
-        try:
-            for pasta in os.listdir(destino):
-                caminho_completo = os.path.join(destino, pasta)
+    # A retenção usa o catálogo de snapshots: uma consulta indexada por prazo de retenção
+    # e a remoção apenas dos snapshots vencidos, sem listar as pastas de destino.
+    agora = now()
+    prazos = ConfiguracaoBackup.objects.values_list('dias_reter_backup', flat=True).distinct()
+
+    for dias_a_manter in prazos:
+        data_limite = agora - timedelta(days=dias_a_manter or 7) # 7 dias é o padrão definido
+        expirados = SnapshotBackup.objects.filter(
+            configuracao__dias_reter_backup=dias_a_manter,
+            data_criacao__lt=data_limite,
+        ).values_list('id', 'caminho', 'configuracao_id', 'concluido')
+
+        removidos = []
+        for snapshot_id, caminho, config_id, concluido in expirados.iterator():
+            try:
+                remover_caminho(caminho)
+                if not concluido:
+                    # Arquivo .tar de uma execução interrompida: pode ter ficado só o temporário
+                    remover_caminho(f"{caminho}.tmp")
+                removidos.append(snapshot_id)
+                logger.info(f"Backup antigo removido: {caminho}")
+            except Exception as e:
+                logger.exception(f"Erro ao limpar backup {caminho} da config id {config_id}: {str(e)}")
+
+        if removidos:
+            SnapshotBackup.objects.filter(pk__in=removidos).delete()
+
+        # Hashes da verificação de integridade das execuções vencidas (inclusive do modo espelho,
+        # que não tem snapshots): a execução e o log continuam, só as linhas por arquivo saem
+        VerificacaoArquivo.objects.filter(
+            execucao__configuracao__dias_reter_backup=dias_a_manter,
+            execucao__data_inicio__lt=data_limite,
+        ).delete()
 
-                if not os.path.exists(caminho_completo):
-                    continue
-                
-                # Tenta extrair a data do nome da pasta: NOME_PROJETO_YYYYMMDD_HHMMSS
-                match = re.search(r'_(\d{8}_\d{6})$', pasta)
-                if not match:
-                    continue
 
-                data_str = match.group(1)
-                try:
-                    data_backup = datetime.strptime(data_str, "%Y%m%d_%H%M%S")
-                except ValueError:
-                    continue
-
-                # Verifica se é mais antigo do que a data limite
-                if timezone.make_aware(data_backup) < data_limite:
-                    shutil.rmtree(caminho_completo)
-                    logger.info(f"Backup antigo removido: {caminho_completo}")
-
-        except Exception as e:
-            logger.exception(f"Erro ao limpar backups para a config id {config.id}: {str(e)}")
\ No newline at end of file
+@shared_task
+def atualizar_resumos_diarios(dias=2):
+    # Recalcula os resumos diários por projeto dos últimos dias (o de hoje ainda está em andamento)
+    hoje = localdate()
+    total = gerar_resumos_diarios(hoje - timedelta(days=dias - 1), hoje)
+    logger.info(f"Resumos diários atualizados: {total}")
+    return total
@@ -2,22 +2,31 @@ from django.contrib import admin
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.admin import GroupAdmin as BaseGroupAdmin
-from django.http import HttpResponseRedirect
+from django.http import FileResponse, Http404, HttpResponseRedirect
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
 from unfold.forms import AdminPasswordChangeForm
 from unfold.forms import UserChangeForm
 from unfold.forms import UserCreationForm
 from unfold.admin import StackedInline
 from unfold.admin import TabularInline
 from unfold.admin import ModelAdmin
+from unfold.views import ChangeList
 from django.urls import path
 from django.utils.html import format_html
 from setup.tasks import executar_backup_teste, executar_backup
+from website.utils.arquivo_log import ler_log, log_na_pasta_logs
+from website.utils.progresso import calcular_eta
 from django.contrib import messages
+from django.db.models import Count, Q
+from django.utils.timezone import now, localtime
 from django.utils.translation import gettext_lazy as _
 
-from setup.models import AgendamentoBackup, ArquivoIgnorado, ConfiguracaoBackup, ExecucaoBackup, LogExecucaoDetalhado, Notificacao, Projeto
+from setup.models import AgendamentoBackup, ArquivoIgnorado, ConfiguracaoBackup, ExecucaoBackup, LimiteConcorrencia, LogExecucaoDetalhado, Notificacao, Projeto, ReservaConcorrencia, ResumoDiarioProjeto, SnapshotBackup, VerificacaoArquivo
 from django_celery_beat.models import PeriodicTask, CrontabSchedule, IntervalSchedule, ClockedSchedule
+import os
 import json
+from datetime import datetime, timedelta
 
 # Desregistrando User e Group padrões para usar com Unfold
 admin.site.unregister(User)
@@ -75,6 +84,7 @@ class ConfiguracaoBackupAdmin(ModelAdmin):
     list_filter = ['tipo_backup']
     search_fields = ['projeto__nome']
     list_display = ('projeto', 'get_tipo_backup_display', 'destino_backup', 'horario_execucao', 'executar_backup_button', 'testar_notificacao_button')
+    list_select_related = ('projeto',)
     actions = ['executar_backup', 'testar_notificacao']
 
     def get_urls(self):
@@ -123,7 +133,7 @@ class ConfiguracaoBackupAdmin(ModelAdmin):
     testar_notificacao_button.allow_tags = True
 
     def testar_notificacao_view(self, request, config_id):
-        from setup.tasks import testar_notificacoes
+        from website.utils.notificacao import testar_notificacoes
 
         try:
             resultados = testar_notificacoes(config_id)
@@ -135,12 +145,15 @@ class ConfiguracaoBackupAdmin(ModelAdmin):
         return HttpResponseRedirect(request.META.get('HTTP_REFERER', '/admin/'))
     
 
-class LogExecucaoDetalhadoInline(admin.TabularInline):
+class LogExecucaoDetalhadoInline(TabularInline):
     model = LogExecucaoDetalhado
     extra = 0
     readonly_fields = ('timestamp', 'tipo', 'mensagem')
     can_delete = False
     show_change_link = False
+    # Paginado: uma execução grande pode ter milhares de linhas
+    per_page = 100
+    ordering = ('id',)
 
     def has_add_permission(self, request, obj=None):
         return False
@@ -155,13 +168,76 @@ class ExecucaoBackupAdmin(ModelAdmin):
         'data_fim',
         'status_colorido',
         'duracao',
+        'arquivos_copiados',
+        'megabytes_copiados',
+        'progresso_resumo',
     )
+    readonly_fields = ('progresso_atual', 'arquivos_analisados', 'arquivos_copiados', 'bytes_copiados', 'bytes_sem_alteracao', 'tempos_etapas', 'metodos_copia', 'log_arquivo')
+    # arquivo_log é gravado pela tarefa de backup; no formulário permitiria apontar para qualquer arquivo
+    exclude = ('progresso', 'arquivo_log')
     list_filter = ('status', 'data_inicio')
     search_fields = ('configuracao__projeto__nome', 'mensagem')
     date_hierarchy = 'data_inicio'
     ordering = ('-data_inicio',)
     list_select_related = ('configuracao__projeto',)
     inlines = [LogExecucaoDetalhadoInline]
+    linhas_por_pagina_log = 200
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                '<int:execucao_id>/log/',
+                self.admin_site.admin_view(self.log_arquivo_view),
+                name='setup_execucaobackup_log',
+            ),
+        ]
+        return custom_urls + urls
+
+    def log_arquivo(self, obj):
+        if not obj.arquivo_log:
+            return "-"
+        return format_html('<a href="{}">{}</a>', '../log/', _('Ver log detalhado'))
+    log_arquivo.short_description = "Log detalhado (arquivo)"
+
+    def log_arquivo_view(self, request, execucao_id):
+        # Lê do arquivo apenas a página pedida (ou o final), sem carregar o log inteiro
+        execucao = get_object_or_404(ExecucaoBackup, pk=execucao_id)
+        if not self.has_view_permission(request, execucao):
+            raise Http404
+        if not log_na_pasta_logs(execucao.arquivo_log) or not os.path.isfile(execucao.arquivo_log):
+            raise Http404(_("Esta execução não tem log em arquivo."))
+
+        if request.GET.get('baixar'):
+            return FileResponse(open(execucao.arquivo_log, 'rb'), as_attachment=True, filename=os.path.basename(execucao.arquivo_log))
+
+        por_pagina = self.linhas_por_pagina_log
+        total = ler_log(execucao.arquivo_log, 0, 0)[1]
+        total_paginas = max(1, (total + por_pagina - 1) // por_pagina)
+        if request.GET.get('final'):
+            pagina = total_paginas
+        else:
+            try:
+                pagina = min(max(1, int(request.GET.get('pagina', 1))), total_paginas)
+            except ValueError:
+                pagina = 1
+
+        inicio = (pagina - 1) * por_pagina
+        linhas, total = ler_log(execucao.arquivo_log, inicio, por_pagina)
+        for numero, linha in enumerate(linhas, start=inicio + 1):
+            linha['numero'] = numero
+
+        contexto = {
+            **self.admin_site.each_context(request),
+            'title': f"Log detalhado - {execucao}",
+            'opts': self.model._meta,
+            'execucao': execucao,
+            'linhas': linhas,
+            'total': total,
+            'pagina': pagina,
+            'total_paginas': total_paginas,
+        }
+        return TemplateResponse(request, 'admin/setup/execucaobackup/log_arquivo.html', contexto)
 
     def projeto(self, obj):
         return obj.configuracao.projeto.nome
@@ -181,16 +257,86 @@ class ExecucaoBackupAdmin(ModelAdmin):
         )
     status_colorido.short_description = "Status"
 
+    def megabytes_copiados(self, obj):
+        return f"{obj.bytes_copiados / 1024 / 1024:.1f}"
+    megabytes_copiados.short_description = "MB copiados"
+    megabytes_copiados.admin_order_field = 'bytes_copiados'
+
+    def progresso_resumo(self, obj):
+        # Percentual e término estimado, apenas para as execuções em andamento
+        if obj.status != 'executando' or not obj.progresso:
+            return "-"
+        fracao, restante = calcular_eta(obj.progresso)
+        etapa = obj.progresso.get('etapa', '')
+        if fracao is None:
+            return etapa
+        if restante is None:
+            return f"{etapa} {fracao:.0%}"
+        return f"{etapa} {fracao:.0%} (término ~{localtime(now() + timedelta(seconds=restante)):%H:%M})"
+    progresso_resumo.short_description = "Progresso"
+
+    def progresso_atual(self, obj):
+        if obj.status != 'executando' or not obj.progresso:
+            return "-"
+        progresso = obj.progresso
+        fracao, restante = calcular_eta(progresso)
+        partes = [f"Etapa: {progresso.get('etapa', '')}"]
+        arquivos = f"{progresso.get('arquivos', 0)}"
+        if progresso.get('arquivos_total'):
+            arquivos += f" de ~{progresso['arquivos_total']}"
+        partes.append(f"{arquivos} arquivo(s)")
+        if progresso.get('bytes') or progresso.get('bytes_total'):
+            tamanho = f"{progresso.get('bytes', 0) / 1024 / 1024:.1f}"
+            if progresso.get('bytes_total'):
+                tamanho += f" de ~{progresso['bytes_total'] / 1024 / 1024:.1f}"
+            partes.append(f"{tamanho} MB")
+        if fracao is not None:
+            partes.append(f"{fracao:.0%}")
+        if restante is not None:
+            termino = localtime(now() + timedelta(seconds=restante))
+            partes.append(f"término estimado {termino:%d/%m %H:%M} (em {int(restante // 60)} min)")
+        if progresso.get('atualizado_em'):
+            partes.append(f"atualizado às {localtime(datetime.fromisoformat(progresso['atualizado_em'])):%H:%M:%S}")
+        return " | ".join(partes)
+    progresso_atual.short_description = "Progresso"
+
     def has_add_permission(self, request):
         # Impede a adição manual via admin (se só forem criadas por script/tarefa)
         return False
 
 
+@admin.register(ResumoDiarioProjeto)
+class ResumoDiarioProjetoAdmin(ModelAdmin):
+    list_display = ('data', 'projeto', 'total_execucoes', 'total_falha', 'duracao_p50', 'duracao_p95', 'mb_por_segundo', 'tamanho_mb', 'crescimento_mb')
+    list_filter = ('projeto',)
+    search_fields = ('projeto__nome',)
+    date_hierarchy = 'data'
+    list_select_related = ('projeto',)
+    readonly_fields = [field.name for field in ResumoDiarioProjeto._meta.fields]
+
+    def tamanho_mb(self, obj):
+        return f"{obj.tamanho_backup / 1024 / 1024:.1f}"
+    tamanho_mb.short_description = "Tamanho (MB)"
+    tamanho_mb.admin_order_field = 'tamanho_backup'
+
+    def crescimento_mb(self, obj):
+        if obj.crescimento_bytes is None:
+            return "-"
+        return f"{obj.crescimento_bytes / 1024 / 1024:+.1f}"
+    crescimento_mb.short_description = "Crescimento (MB)"
+    crescimento_mb.admin_order_field = 'crescimento_bytes'
+
+    def has_add_permission(self, request):
+        # Gerados pela tarefa atualizar_resumos_diarios
+        return False
+
+
 @admin.register(Notificacao)
 class NotificacaoAdmin(ModelAdmin):
     list_display = ('configuracao', 'meio', 'ativo', 'enviar_sucesso', 'enviar_falha')
     list_filter = ('meio', 'ativo')
     search_fields = ('configuracao__projeto__nome', 'destino_email', 'telegram_chat_id')
+    list_select_related = ('configuracao__projeto',)
 
 
 @admin.register(AgendamentoBackup)
@@ -199,9 +345,11 @@ class AgendamentoBackupAdmin(ModelAdmin):
     list_filter = ('ativo',)
     search_fields = ('configuracao__projeto__nome', 'horario')
     list_editable = ('ativo',)
+    list_select_related = ('configuracao__projeto',)
 
     def horario_formatado(self, obj):
-        return obj.horario.strftime("%d/%m/%Y %H:%M")
+        # horario é texto: horário fixo (03:00) ou expressão crontab
+        return obj.horario
     horario_formatado.short_description = "Horário"
 
 
@@ -211,19 +359,103 @@ class LogExecucaoDetalhadoAdmin(ModelAdmin):
     list_filter = ('tipo', 'timestamp')
     search_fields = ('mensagem',)
     date_hierarchy = 'timestamp'
+    list_select_related = ('execucao__configuracao__projeto',)
 
     def mensagem_curta(self, obj):
         return obj.mensagem[:60] + "..." if len(obj.mensagem) > 60 else obj.mensagem
     mensagem_curta.short_description = "Mensagem"
 
 
+@admin.register(SnapshotBackup)
+class SnapshotBackupAdmin(ModelAdmin):
+    list_display = ('caminho', 'configuracao', 'tipo', 'data_criacao', 'concluido', 'total_arquivos', 'tamanho_bytes')
+    list_filter = ('tipo', 'concluido', 'data_criacao')
+    search_fields = ('caminho', 'configuracao__projeto__nome')
+    date_hierarchy = 'data_criacao'
+    list_select_related = ('configuracao__projeto',)
+    readonly_fields = ('configuracao', 'execucao', 'tipo', 'caminho', 'data_criacao', 'concluido', 'tamanho_bytes', 'total_arquivos')
+
+    def has_add_permission(self, request):
+        # Snapshots são catalogados pelas tarefas de backup
+        return False
+
+
+@admin.register(VerificacaoArquivo)
+class VerificacaoArquivoAdmin(ModelAdmin):
+    list_display = ('caminho', 'execucao', 'valido', 'hash_origem', 'hash_destino')
+    list_filter = ('valido',)
+    search_fields = ('caminho', 'hash_origem', 'hash_destino')
+    list_select_related = ('execucao__configuracao__projeto',)
+    readonly_fields = ('execucao', 'caminho', 'hash_origem', 'hash_destino', 'valido', 'erro')
+
+    def has_add_permission(self, request):
+        return False
+
+
+class ReservaConcorrenciaInline(TabularInline):
+    model = ReservaConcorrencia
+    extra = 0
+    fields = ('configuracao', 'tarefa_id', 'data_inicio', 'expira_em')
+    readonly_fields = fields
+    can_delete = True
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('configuracao__projeto')
+
+    def has_add_permission(self, request, obj=None):
+        # As vagas são ocupadas pelas tarefas de backup
+        return False
+
+
+@admin.register(LimiteConcorrencia)
+class LimiteConcorrenciaAdmin(ModelAdmin):
+    list_display = ('chave', 'tipo', 'max_simultaneos', 'em_uso', 'ativo')
+    list_filter = ('tipo', 'ativo')
+    list_editable = ('max_simultaneos', 'ativo')
+    search_fields = ('chave',)
+    inlines = [ReservaConcorrenciaInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            total_em_uso=Count('reservas', filter=Q(reservas__expira_em__gte=now()))
+        )
+
+    def em_uso(self, obj):
+        return obj.total_em_uso
+    em_uso.short_description = "Em uso"
+    em_uso.admin_order_field = 'total_em_uso'
+
+
+def _configuracao_id_tarefa(tarefa):
+    # As tarefas de backup recebem o id da configuração como primeiro argumento
+    try:
+        args = json.loads(tarefa.args)
+        return int(args[0]) if args else None
+    except (ValueError, TypeError, IndexError, KeyError):
+        return None
+
+
+class PeriodicTaskChangeList(ChangeList):
+    # Carrega as configurações de todas as tarefas da página em uma única consulta
+    def get_results(self, request):
+        super().get_results(request)
+        ids = {_configuracao_id_tarefa(tarefa) for tarefa in self.result_list} - {None}
+        configuracoes = ConfiguracaoBackup.objects.select_related('projeto').in_bulk(ids) if ids else {}
+        for tarefa in self.result_list:
+            tarefa._configuracao_backup = configuracoes.get(_configuracao_id_tarefa(tarefa))
+
+
 admin.site.unregister(PeriodicTask)
 @admin.register(PeriodicTask)
 class PeriodicTaskAdmin(ModelAdmin):
     list_display = ('name', 'task', 'get_projeto', 'get_configuracao', 'get_crontab', 'enabled', 'last_run_at', 'total_run_count', 'date_changed',)
     list_filter = ('enabled', 'task')
-    search_fields = ('name', 'task')
+    search_fields = ('name', 'task', 'description')
     ordering = ('name',)
+    list_select_related = ('crontab',)
+
+    def get_changelist(self, request, **kwargs):
+        return PeriodicTaskChangeList
 
     def get_crontab(self, obj):
         return str(obj.crontab) if obj.crontab else "-"
@@ -240,12 +472,12 @@ class PeriodicTaskAdmin(ModelAdmin):
     get_projeto.short_description = "Projeto"
 
     def _get_configuracao(self, obj):
-        try:
-            args = json.loads(obj.args)
-            configuracao_id = args[0] if args else None
-            return ConfiguracaoBackup.objects.select_related("projeto").filter(pk=configuracao_id).first()
-        except Exception:
+        if hasattr(obj, '_configuracao_backup'):
+            return obj._configuracao_backup
+        configuracao_id = _configuracao_id_tarefa(obj)
+        if configuracao_id is None:
             return None
+        return ConfiguracaoBackup.objects.select_related("projeto").filter(pk=configuracao_id).first()
 
 
 admin.site.unregister(CrontabSchedule)
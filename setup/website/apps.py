@@ -4,6 +4,6 @@ from django.apps import AppConfig
 class WebsiteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'website'
-    
-def ready(self):
-    import setup.signals
\ No newline at end of file
+
+    def ready(self):
+        import setup.signals  # noqa: F401
@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import shutil
+import resource
+import tempfile
+import threading
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from setup.models import ArquivoIgnorado, ConfiguracaoBackup, ExecucaoBackup, Projeto, SnapshotBackup
+from setup.tasks import executar_backup, limpar_backups_antigos
+from website.utils.copia import MotorCopia
+from website.utils.ignorados import FiltroIgnorados
+from website.utils.log_execucao import LogExecucaoBuffer
+from website.utils.varredura import varrer_origem
+
+CENARIOS = ['pequenos', 'grandes', 'profundo', 'ignorados']
+
+# Padrões usados no cenário "ignorados"
+PADROES_IGNORADOS = ['node_modules', '*.log', '/cache/', '**/tmp']
+
+
+def _escrever(caminho, tamanho):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, 'wb') as f:
+        # Conteúdo não repetitivo para não favorecer compressão/deduplicação
+        bloco = os.urandom(min(tamanho, 1024 * 1024))
+        restante = tamanho
+        while restante > 0:
+            f.write(bloco[:restante])
+            restante -= len(bloco)
+
+
+def gerar_arvore(cenario, origem, escala):
+    # Árvores sintéticas, sempre com o mesmo formato para a mesma escala
+    if cenario == 'pequenos':
+        # Muitos arquivos pequenos espalhados em poucas pastas
+        for i in range(int(20000 * escala)):
+            _escrever(os.path.join(origem, f"pasta_{i % 100:03d}", f"arquivo_{i:06d}.txt"), 512)
+    elif cenario == 'grandes':
+        # Poucos arquivos grandes
+        for i in range(4):
+            _escrever(os.path.join(origem, f"grande_{i}.bin"), int(64 * 1024 * 1024 * escala))
+    elif cenario == 'profundo':
+        # Estrutura profunda com poucos arquivos por nível
+        for ramo in range(int(20 * escala) or 1):
+            caminho = os.path.join(origem, f"ramo_{ramo:02d}")
+            for nivel in range(40):
+                caminho = os.path.join(caminho, f"n{nivel:02d}")
+                for i in range(5):
+                    _escrever(os.path.join(caminho, f"arquivo_{i}.dat"), 4096)
+    elif cenario == 'ignorados':
+        # A maior parte da árvore está em pastas/arquivos ignorados
+        for i in range(int(2000 * escala)):
+            _escrever(os.path.join(origem, "app", f"modulo_{i % 50:02d}", f"arquivo_{i:05d}.py"), 1024)
+            _escrever(os.path.join(origem, "app", f"modulo_{i % 50:02d}", f"arquivo_{i:05d}.log"), 1024)
+            _escrever(os.path.join(origem, "node_modules", f"pacote_{i % 200:03d}", "lib", f"arquivo_{i:05d}.js"), 1024)
+            _escrever(os.path.join(origem, "cache", f"c_{i % 20:02d}", f"arquivo_{i:05d}.bin"), 1024)
+    else:
+        raise CommandError(f"Cenário inválido: {cenario}")
+
+
+def tamanho_arvore(origem):
+    total_arquivos = 0
+    total_bytes = 0
+    for root, dirs, files in os.walk(origem):
+        for file in files:
+            total_arquivos += 1
+            total_bytes += os.path.getsize(os.path.join(root, file))
+    return total_arquivos, total_bytes
+
+
+def rss_atual_mb():
+    # RSS atual do processo pelo /proc (Linux). Sem /proc, cai no pico do processo inteiro (ru_maxrss, KB no Linux)
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1024 / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class AmostradorMemoria:
+    # Pico de RSS durante uma etapa, amostrado em uma thread enquanto a etapa roda.
+    # O ru_maxrss só guarda o pico do processo inteiro e não volta a cair entre as etapas.
+    # Processos filhos (compressor, rsync) não entram na conta.
+
+    def __init__(self, intervalo=0.01):
+        self.intervalo = intervalo
+        self.inicial = self.pico = 0
+        self._parar = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.inicial = self.pico = rss_atual_mb()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+        self.pico = max(self.pico, rss_atual_mb())
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico = max(self.pico, rss_atual_mb())
+
+
+class Command(BaseCommand):
+    # Benchmark reproduzível do pipeline de backup em árvores sintéticas (sistema de arquivos
+    # local + SQLite). Mede arquivos/s, MB/s, consultas ao banco e pico de memória de cada etapa:
+    # varredura, cópia, log, backup completo (executar_backup) e retenção. No backup as taxas usam
+    # os arquivos analisados e os bytes realmente gravados pela execução.
+    help = "Executa o benchmark do pipeline de backup. Use --settings=setup.settings_benchmark"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cenarios', nargs='+', choices=CENARIOS, default=CENARIOS)
+        parser.add_argument('--escala', type=float, default=1.0, help="Multiplica a quantidade/tamanho dos arquivos gerados")
+        parser.add_argument('--workers', type=int, default=4, help="Cópias em paralelo usadas no benchmark")
+        parser.add_argument('--diretorio', default=None, help="Pasta de trabalho (padrão: pasta temporária)")
+        parser.add_argument('--json', dest='arquivo_json', default=None, help="Grava os resultados em JSON")
+        parser.add_argument('--manter', action='store_true', help="Não apaga as árvores geradas no final")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("O benchmark deve rodar com SQLite: use --settings=setup.settings_benchmark")
+
+        call_command('migrate', verbosity=0, interactive=False)
+
+        base = options['diretorio'] or tempfile.mkdtemp(prefix='benchmark_backup_')
+        os.makedirs(base, exist_ok=True)
+        resultados = []
+
+        try:
+            for cenario in options['cenarios']:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"Cenário: {cenario}"))
+                resultados += self.executar_cenario(cenario, base, options)
+        finally:
+            if not options['manter']:
+                shutil.rmtree(base, ignore_errors=True)
+
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'cenário':<10} {'etapa':<22} {'tempo (s)':>10} {'arquivos/s':>12} {'MB/s':>9} {'consultas':>10} "
+            f"{'pico RSS (MB)':>14} {'+RSS etapa (MB)':>16}"
+        )
+        for r in resultados:
+            self.stdout.write(
+                f"{r['cenario']:<10} {r['etapa']:<22} {r['segundos']:>10.3f} {r['arquivos_s']:>12.1f} "
+                f"{r['mb_s']:>9.1f} {r['consultas']:>10} {r['pico_rss_mb']:>14.1f} {r['memoria_etapa_mb']:>16.1f}"
+            )
+
+        if options['arquivo_json']:
+            with open(options['arquivo_json'], 'w') as f:
+                json.dump(resultados, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finalizado."))
+
+    def executar_cenario(self, cenario, base, options):
+        origem = os.path.join(base, cenario, 'origem')
+        destino = os.path.join(base, cenario, 'destino')
+        shutil.rmtree(os.path.join(base, cenario), ignore_errors=True)
+
+        gerar_arvore(cenario, origem, options['escala'])
+        total_arquivos, total_bytes = tamanho_arvore(origem)
+        self.stdout.write(f"  {total_arquivos} arquivo(s), {total_bytes / 1024 / 1024:.1f} MB")
+
+        padroes = PADROES_IGNORADOS if cenario == 'ignorados' else []
+        projeto = Projeto.objects.create(nome=f"benchmark_{cenario}", tipo_projeto='sem_dump', caminho_media=origem, tipo_banco='sqlite3')
+        config = ConfiguracaoBackup.objects.create(
+            projeto=projeto,
+            tipo_backup=2,
+            destino_backup=destino,
+            workers_copia=options['workers'],
+            nivel_log_arquivos='todos',
+        )
+        ArquivoIgnorado.objects.bulk_create(ArquivoIgnorado(configuracao=config, caminho=p) for p in padroes)
+
+        resultados = []
+
+        def medir(etapa, funcao, arquivos=total_arquivos, tamanho=total_bytes):
+            with CaptureQueriesContext(connection) as consultas, AmostradorMemoria() as memoria:
+                inicio = time.perf_counter()
+                retorno = funcao()
+                segundos = time.perf_counter() - inicio
+            # Quando a etapa informa quanto processou, as taxas usam esses valores
+            if isinstance(retorno, tuple):
+                arquivos, tamanho = retorno
+            resultado = {
+                'cenario': cenario,
+                'etapa': etapa,
+                'segundos': segundos,
+                'arquivos': arquivos,
+                'bytes': tamanho,
+                'arquivos_s': arquivos / segundos if segundos else 0,
+                'mb_s': tamanho / 1024 / 1024 / segundos if segundos else 0,
+                'consultas': len(consultas),
+                'pico_rss_mb': memoria.pico,
+                'memoria_etapa_mb': memoria.pico - memoria.inicial,
+            }
+            resultados.append(resultado)
+            self.stdout.write(f"  {etapa}: {segundos:.3f}s, {len(consultas)} consulta(s)")
+            return resultado
+
+        filtro = FiltroIgnorados(padroes)
+
+        def varredura():
+            arquivos = sum(1 for tipo, _, _, _ in varrer_origem(origem, filtro) if tipo == 'arquivo')
+            return arquivos, 0
+
+        def copia():
+            destino_copia = os.path.join(base, cenario, 'copia')
+            with MotorCopia(workers=options['workers']) as motor:
+                for tipo, rel_path, caminho, _ in varrer_origem(origem, filtro):
+                    if tipo == 'pasta':
+                        motor.criar_diretorio(os.path.join(destino_copia, rel_path))
+                    else:
+                        motor.copiar(caminho, os.path.join(destino_copia, rel_path), rel_path)
+                motor.aguardar()
+            shutil.rmtree(destino_copia, ignore_errors=True)
+            return motor.total_copiados, motor.total_bytes
+
+        def log():
+            execucao = ExecucaoBackup.objects.create(configuracao=config, data_inicio=now(), status='executando')
+            logs = LogExecucaoBuffer(execucao)
+            for i in range(total_arquivos):
+                logs.registrar_arquivo('copia', f"Copiado: arquivo_{i}")
+            logs.fechar()
+            return total_arquivos, 0
+
+        def backup():
+            # Com CELERY_TASK_EAGER_PROPAGATES=False a exceção fica no resultado; erros por arquivo
+            # não levantam exceção e só aparecem no status da execução
+            resultado = executar_backup.apply(args=[config.id])
+            execucao = ExecucaoBackup.objects.filter(configuracao=config).order_by('-pk').first()
+            if not resultado.successful() or execucao is None or execucao.status != 'sucesso':
+                mensagem = execucao.mensagem if execucao else resultado.result
+                raise CommandError(f"Backup do cenário {cenario} falhou: {mensagem}")
+            # Arquivos analisados e bytes realmente gravados: sem alteração, quase nada é copiado
+            return execucao.arquivos_analisados, execucao.bytes_copiados
+
+        def preparar_retencao():
+            # Snapshots vencidos catalogados, cada um com uma pasta pequena no destino
+            antigos = now() - timedelta(days=config.dias_reter_backup + 1)
+            pasta_snapshots = os.path.join(base, cenario, 'snapshots')
+            snapshots = []
+            for i in range(100):
+                caminho = os.path.join(pasta_snapshots, f"{projeto.nome}_{i:03d}")
+                _escrever(os.path.join(caminho, 'arquivo.txt'), 128)
+                snapshots.append(SnapshotBackup(configuracao=config, caminho=caminho, data_criacao=antigos))
+            SnapshotBackup.objects.bulk_create(snapshots)
+            return len(snapshots)
+
+        def retencao():
+            limpar_backups_antigos()
+            return total_snapshots, 0
+
+        try:
+            medir('varredura', varredura)
+            medir('cópia', copia)
+            medir('log', log)
+            medir('backup (completo)', backup)
+            medir('backup (sem alteração)', backup)
+            total_snapshots = preparar_retencao()
+            medir('retenção', retencao)
+        finally:
+            projeto.delete()
+
+        return resultados
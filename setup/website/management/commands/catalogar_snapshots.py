@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from setup.models import ConfiguracaoBackup
+from website.utils.snapshot import catalogar_snapshots
+
+
+class Command(BaseCommand):
+    # Importa para o catálogo (SnapshotBackup) as pastas e arquivos de backup que já estão nos
+    # destinos e não foram registrados: backups gerados antes do catálogo e os de execuções que
+    # pararam no meio. Sem o registro a retenção (limpar_backups_antigos) nunca os remove.
+    # Deve ser executado uma vez após a atualização; executar novamente não duplica registros.
+    help = "Cataloga os snapshots/arquivos existentes nos destinos dos backups"
+
+    def handle(self, *args, **kwargs):
+        configuracoes = (
+            ConfiguracaoBackup.objects
+            .select_related('projeto')
+            .exclude(destino_backup__isnull=True)
+            .exclude(destino_backup__exact='')
+        )
+
+        total = 0
+        for config in configuracoes:
+            criados = catalogar_snapshots(config)
+            if criados:
+                self.stdout.write(f"{config}: {len(criados)} snapshot(s) catalogado(s) em {config.destino_backup}")
+            total += len(criados)
+
+        self.stdout.write(self.style.SUCCESS(f"{total} snapshot(s) catalogado(s)."))
@@ -0,0 +1,2 @@
+# Testes do app website. Rodam com o banco SQLite e o Celery síncrono do benchmark:
+#   python manage.py test website --settings=setup.settings_benchmark
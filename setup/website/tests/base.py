@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from setup.models import ConfiguracaoBackup, ExecucaoBackup, Projeto
+from setup.tasks import executar_backup
+
+
+def escrever(caminho, conteudo):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, 'w') as f:
+        f.write(conteudo)
+
+
+def ler(caminho):
+    with open(caminho) as f:
+        return f.read()
+
+
+# Projeto com origem e destino em uma pasta temporária, apagada no final de cada teste
+class BackupTestCase(TestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp(prefix='backup_teste_')
+        self.addCleanup(shutil.rmtree, self.base, ignore_errors=True)
+        self.origem = os.path.join(self.base, 'origem')
+        self.destino = os.path.join(self.base, 'destino')
+        os.makedirs(self.origem)
+
+        configuracoes = override_settings(BACKUP_PASTA_LOGS=os.path.join(self.base, 'logs'))
+        configuracoes.enable()
+        self.addCleanup(configuracoes.disable)
+
+    def criar_config(self, nome='projeto', **campos):
+        projeto = Projeto.objects.create(nome=nome, tipo_projeto='sem_dump', caminho_media=self.origem, tipo_banco='sqlite3')
+        campos.setdefault('tipo_backup', 2)
+        campos.setdefault('destino_backup', self.destino)
+        return ConfiguracaoBackup.objects.create(projeto=projeto, **campos)
+
+    def executar(self, config, execucao_id=None):
+        # Executa o backup na hora (CELERY_TASK_ALWAYS_EAGER) e devolve a execução gravada
+        executar_backup.apply(args=[config.id], kwargs={'execucao_id': execucao_id})
+        return ExecucaoBackup.objects.filter(configuracao=config).order_by('-pk').first()
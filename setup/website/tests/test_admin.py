@@ -0,0 +1,84 @@
+import os
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils.timezone import now
+
+from setup.models import ExecucaoBackup
+from website.tests.base import BackupTestCase, escrever
+from website.utils.arquivo_log import ArquivoLogExecucao, caminho_log_execucao, remover_log
+
+
+class LogArquivoAdminTest(BackupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'senha'))
+        self.execucao = ExecucaoBackup.objects.create(configuracao=self.criar_config(), data_inicio=now(), status='sucesso')
+        self.url = reverse('admin:setup_execucaobackup_log', args=[self.execucao.id])
+
+        # Arquivo fora da pasta de logs que não pode ser exposto pelo visualizador
+        self.segredo = os.path.join(self.base, 'segredo.txt')
+        escrever(self.segredo, 'senha')
+
+    def gravar_log(self):
+        caminho = caminho_log_execucao(self.execucao)
+        arquivo = ArquivoLogExecucao(caminho)
+        arquivo.registrar('info', 'Copiado: a.txt')
+        arquivo.fechar()
+        ExecucaoBackup.objects.filter(pk=self.execucao.pk).update(arquivo_log=caminho)
+        return caminho
+
+    def test_log_da_execucao(self):
+        self.gravar_log()
+
+        resposta = self.client.get(self.url)
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertContains(resposta, 'Copiado: a.txt')
+        self.assertEqual(self.client.get(self.url, {'baixar': 1}).status_code, 200)
+
+    def test_arquivo_fora_da_pasta_de_logs(self):
+        caminhos = [
+            self.segredo,
+            os.path.join(self.base, 'logs', '..', 'segredo.txt'),
+            os.path.join(self.base, 'logs_outros', 'segredo.txt'),
+        ]
+        escrever(caminhos[2], 'senha')
+        # Link simbólico dentro da pasta de logs apontando para fora dela
+        link = os.path.join(self.base, 'logs', 'link.ndjson.gz')
+        os.makedirs(os.path.dirname(link), exist_ok=True)
+        os.symlink(self.segredo, link)
+        caminhos.append(link)
+
+        for caminho in caminhos:
+            with self.subTest(caminho=caminho):
+                ExecucaoBackup.objects.filter(pk=self.execucao.pk).update(arquivo_log=caminho)
+                self.assertEqual(self.client.get(self.url).status_code, 404)
+                self.assertEqual(self.client.get(self.url, {'baixar': 1}).status_code, 404)
+
+    def test_arquivo_log_nao_editavel(self):
+        self.gravar_log()
+        url = reverse('admin:setup_execucaobackup_change', args=[self.execucao.id])
+
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotIn('arquivo_log', resposta.context['adminform'].form.fields)
+
+        self.client.post(url, {
+            'configuracao': self.execucao.configuracao_id,
+            'data_inicio_0': now().strftime('%Y-%m-%d'),
+            'data_inicio_1': now().strftime('%H:%M:%S'),
+            'status': 'sucesso',
+            'arquivo_log': self.segredo,
+        })
+        self.execucao.refresh_from_db()
+        self.assertNotEqual(self.execucao.arquivo_log, self.segredo)
+
+    def test_remover_log_fora_da_pasta(self):
+        remover_log(self.segredo)
+        self.assertTrue(os.path.exists(self.segredo))
+
+        caminho = self.gravar_log()
+        remover_log(caminho)
+        self.assertFalse(os.path.exists(caminho))
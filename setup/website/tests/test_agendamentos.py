@@ -0,0 +1,245 @@
+import json
+from io import StringIO
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django_celery_beat.models import CrontabSchedule, PeriodicTask
+
+from setup.models import AgendamentoBackup
+from website.tests.base import BackupTestCase
+from website.utils.agendamentos import TAREFA_BACKUP, interpretar_horario, nome_tarefa
+
+
+def criar_tarefa_antiga(nome, config, task='setup.tasks.executar_backup_teste', minute='0', hour='3'):
+    crontab = CrontabSchedule.objects.create(minute=minute, hour=hour)
+    return PeriodicTask.objects.create(name=nome, task=task, crontab=crontab, args=json.dumps([config.id]))
+
+
+class InterpretarHorarioTest(SimpleTestCase):
+
+    def test_hora_fixa(self):
+        self.assertEqual(
+            interpretar_horario('03:05'),
+            {'minute': '5', 'hour': '3', 'day_of_month': '*', 'month_of_year': '*', 'day_of_week': '*'},
+        )
+
+    def test_crontab(self):
+        self.assertEqual(interpretar_horario('*/15 2 * * 1-5')['day_of_week'], '1-5')
+        self.assertEqual(interpretar_horario('0 3 1,15 jan mon-fri')['month_of_year'], 'jan')
+
+    def test_invalidos(self):
+        for horario in ('', '25:00', '03:60', 'todo dia', '0 3 * *', 'a b c d e', '99 99 * * *', '0 3 32 * *', '0 3 * 13 *', '0 3 * * 7'):
+            with self.subTest(horario=horario):
+                with self.assertRaises(ValueError):
+                    interpretar_horario(horario)
+
+
+class SignalAgendamentoTest(BackupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.config = self.criar_config()
+
+    def tarefa(self, agendamento):
+        return PeriodicTask.objects.select_related('crontab').get(name=nome_tarefa(agendamento.id))
+
+    def test_criar(self):
+        agendamento = AgendamentoBackup.objects.create(configuracao=self.config, horario='03:00')
+
+        tarefa = self.tarefa(agendamento)
+        self.assertEqual(tarefa.task, TAREFA_BACKUP)
+        self.assertEqual(json.loads(tarefa.args), [self.config.id])
+        self.assertEqual((tarefa.crontab.minute, tarefa.crontab.hour), ('0', '3'))
+        self.assertTrue(tarefa.enabled)
+
+    def test_atualizar_horario(self):
+        agendamento = AgendamentoBackup.objects.create(configuracao=self.config, horario='03:00')
+        agendamento.horario = '0 4 * * 1'
+        agendamento.save()
+
+        tarefa = self.tarefa(agendamento)
+        self.assertEqual((tarefa.crontab.hour, tarefa.crontab.day_of_week), ('4', '1'))
+        self.assertEqual(PeriodicTask.objects.filter(name__startswith='backup-agendamento-').count(), 1)
+
+    def test_salvar_sem_alteracao_nao_grava(self):
+        agendamento = AgendamentoBackup.objects.create(configuracao=self.config, horario='03:00')
+        alterada_em = self.tarefa(agendamento).date_changed
+
+        agendamento.save()
+
+        self.assertEqual(self.tarefa(agendamento).date_changed, alterada_em)
+
+    def test_salvar_sem_alteracao_consultas(self):
+        agendamento = AgendamentoBackup.objects.create(configuracao=self.config, horario='03:00')
+        agendamento = AgendamentoBackup.objects.get(pk=agendamento.pk)
+
+        # UPDATE do agendamento, configuração e projeto (descrição), busca de tarefas antigas e a PeriodicTask
+        with self.assertNumQueries(5):
+            agendamento.save()
+
+    def test_horario_crontab_invalido_no_clean(self):
+        agendamento = AgendamentoBackup(configuracao=self.config, horario='99 99 * * *')
+
+        with self.assertRaises(ValidationError) as erro:
+            agendamento.full_clean()
+        self.assertIn('horario', erro.exception.message_dict)
+
+    def test_desativar(self):
+        agendamento = AgendamentoBackup.objects.create(configuracao=self.config, horario='03:00')
+        agendamento.ativo = False
+        agendamento.save()
+
+        self.assertFalse(self.tarefa(agendamento).enabled)
+
+    def test_horario_invalido_desativa_tarefa_existente(self):
+        agendamento = AgendamentoBackup.objects.create(configuracao=self.config, horario='03:00')
+        agendamento.horario = 'todo dia'
+        agendamento.save()
+
+        tarefa = self.tarefa(agendamento)
+        self.assertFalse(tarefa.enabled)
+        self.assertEqual(tarefa.crontab.hour, '3')
+
+    def test_horario_invalido_sem_tarefa_nao_cria(self):
+        with self.assertLogs('setup.signals', 'WARNING'):
+            agendamento = AgendamentoBackup.objects.create(configuracao=self.config, horario='todo dia')
+
+        self.assertFalse(PeriodicTask.objects.filter(name=nome_tarefa(agendamento.id)).exists())
+
+    def test_excluir(self):
+        agendamento = AgendamentoBackup.objects.create(configuracao=self.config, horario='03:00')
+        nome = nome_tarefa(agendamento.id)
+        agendamento.delete()
+
+        self.assertFalse(PeriodicTask.objects.filter(name=nome).exists())
+
+
+class SignalTarefasAntigasTest(BackupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.config = self.criar_config()
+
+    def nomes(self):
+        return set(PeriodicTask.objects.values_list('name', flat=True))
+
+    def test_remove_tarefas_antigas_do_agendamento(self):
+        criar_tarefa_antiga("Backup: projeto (03:00)", self.config, minute='00', hour='03')
+        criar_tarefa_antiga(f"Backup | projeto | {self.config.id} | 03:00", self.config, task='website.tasks.executar_backup_teste')
+
+        agendamento = AgendamentoBackup.objects.create(configuracao=self.config, horario='03:00')
+
+        self.assertEqual(self.nomes(), {nome_tarefa(agendamento.id)})
+
+    def test_remove_tarefa_antiga_com_horario_ja_alterado(self):
+        # Único agendamento da configuração: a tarefa antiga é dele mesmo com outro nome/horário
+        criar_tarefa_antiga("Backup: projeto antigo (02:00)", self.config, hour='2')
+
+        agendamento = AgendamentoBackup.objects.create(configuracao=self.config, horario='03:00')
+
+        self.assertEqual(self.nomes(), {nome_tarefa(agendamento.id)})
+
+    def test_remove_mesmo_sem_alteracao_na_tarefa_nova(self):
+        agendamento = AgendamentoBackup.objects.create(configuracao=self.config, horario='03:00')
+        criar_tarefa_antiga("Backup: projeto (03:00)", self.config)
+
+        agendamento.save()
+
+        self.assertEqual(self.nomes(), {nome_tarefa(agendamento.id)})
+
+    def test_mantem_tarefas_antigas_de_outros_agendamentos(self):
+        AgendamentoBackup.objects.create(configuracao=self.config, horario='05:00')
+        outra_config = self.criar_config('outro')
+        criar_tarefa_antiga("Backup: outro (03:00)", outra_config)
+        criar_tarefa_antiga("Backup: projeto (05:00)", self.config, hour='5')
+        criar_tarefa_antiga("Backup: relatório", self.config, task='relatorios.tasks.gerar')
+        criar_tarefa_antiga("Backup: projeto (03:00)", self.config)
+
+        agendamento = AgendamentoBackup.objects.create(configuracao=self.config, horario='03:00')
+
+        self.assertEqual(self.nomes() - {nome_tarefa(a.id) for a in AgendamentoBackup.objects.all()}, {
+            "Backup: outro (03:00)",
+            "Backup: projeto (05:00)",
+            "Backup: relatório",
+        })
+        self.assertFalse(PeriodicTask.objects.filter(name="Backup: projeto (03:00)").exists())
+        self.assertTrue(PeriodicTask.objects.filter(name=nome_tarefa(agendamento.id)).exists())
+
+
+class SyncAgendamentosTest(BackupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.config = self.criar_config()
+        self.novo = AgendamentoBackup.objects.create(configuracao=self.config, horario='01:00')
+        self.alterado = AgendamentoBackup.objects.create(configuracao=self.config, horario='02:00')
+        self.sem_alteracao = AgendamentoBackup.objects.create(configuracao=self.config, horario='03:00')
+
+        # Estado fora de sincronia: tarefa apagada, horário alterado sem o signal (update),
+        # tarefa de agendamento excluído e tarefas com os nomes antigos
+        PeriodicTask.objects.filter(name=nome_tarefa(self.novo.id)).delete()
+        AgendamentoBackup.objects.filter(pk=self.alterado.pk).update(horario='05:30')
+        self.orfa = PeriodicTask.objects.create(
+            name=nome_tarefa(9999), task=TAREFA_BACKUP, crontab=CrontabSchedule.objects.create(minute='0', hour='6'), args='[9999]',
+        )
+        criar_tarefa_antiga(f"Backup: {self.config.projeto.nome} (03:00)", self.config)
+        criar_tarefa_antiga(f"Backup | {self.config.projeto.nome} | 03:00", self.config, task='website.tasks.executar_backup_teste')
+        # Mesmo prefixo, mas de outra tarefa: não é deste sistema
+        criar_tarefa_antiga("Backup: relatório", self.config, task='relatorios.tasks.gerar')
+
+    def sincronizar(self, *argumentos):
+        saida = StringIO()
+        call_command('sync_agendamentos', *argumentos, stdout=saida)
+        return saida.getvalue()
+
+    def nomes(self):
+        return set(PeriodicTask.objects.values_list('name', flat=True))
+
+    def test_dry_run_nao_grava(self):
+        antes = self.nomes()
+
+        saida = self.sincronizar('--dry-run')
+
+        self.assertIn(f"Criar: {nome_tarefa(self.novo.id)}", saida)
+        self.assertIn(f"Atualizar: {nome_tarefa(self.alterado.id)}", saida)
+        self.assertNotIn(nome_tarefa(self.sem_alteracao.id), saida)
+        self.assertIn(f"Remover: {nome_tarefa(9999)}", saida)
+        self.assertIn("Remover: Backup: projeto (03:00)", saida)
+        self.assertIn("Remover: Backup | projeto | 03:00", saida)
+        self.assertNotIn("Backup: relatório", saida)
+        self.assertIn("Dry-run: 1 criada(s), 1 atualizada(s), 3 removida(s)", saida)
+        self.assertEqual(self.nomes(), antes)
+        self.assertEqual(PeriodicTask.objects.get(name=nome_tarefa(self.alterado.id)).crontab.hour, '2')
+
+    def test_sincronizar(self):
+        saida = self.sincronizar()
+
+        self.assertIn("1 criada(s), 1 atualizada(s), 3 removida(s)", saida)
+        self.assertEqual(self.nomes(), {
+            nome_tarefa(self.novo.id),
+            nome_tarefa(self.alterado.id),
+            nome_tarefa(self.sem_alteracao.id),
+            "Backup: relatório",
+        })
+        alterada = PeriodicTask.objects.get(name=nome_tarefa(self.alterado.id)).crontab
+        self.assertEqual((alterada.minute, alterada.hour), ('30', '5'))
+
+        # Já sincronizado: a segunda execução não tem diferenças
+        self.assertIn("0 criada(s), 0 atualizada(s), 0 removida(s)", self.sincronizar())
+
+    def test_agendamento_desativado(self):
+        AgendamentoBackup.objects.filter(pk=self.sem_alteracao.pk).update(ativo=False)
+
+        saida = self.sincronizar()
+
+        self.assertIn(f"Desativar: {nome_tarefa(self.sem_alteracao.id)}", saida)
+        self.assertFalse(PeriodicTask.objects.get(name=nome_tarefa(self.sem_alteracao.id)).enabled)
+
+    def test_horario_invalido(self):
+        AgendamentoBackup.objects.filter(pk=self.sem_alteracao.pk).update(horario='todo dia')
+
+        saida = self.sincronizar()
+
+        self.assertIn(f"Agendamento {self.sem_alteracao.id}: Formato de agendamento inválido: todo dia", saida)
+        self.assertFalse(PeriodicTask.objects.get(name=nome_tarefa(self.sem_alteracao.id)).enabled)
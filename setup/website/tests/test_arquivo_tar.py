@@ -0,0 +1,59 @@
+import os
+import socket
+import sqlite3
+import tarfile
+
+from setup.models import LogExecucaoDetalhado, SnapshotBackup
+from website.tests.base import BackupTestCase, escrever
+
+
+class ArquivoTarTest(BackupTestCase):
+
+    def test_gera_arquivo_comprimido(self):
+        escrever(os.path.join(self.origem, 'a.txt'), 'a')
+        escrever(os.path.join(self.origem, 'pasta', 'b.txt'), 'bb')
+        config = self.criar_config(modo_saida='arquivo', compressao_arquivo='gzip')
+
+        execucao = self.executar(config)
+
+        self.assertEqual(execucao.status, 'sucesso')
+        snapshot = SnapshotBackup.objects.get(configuracao=config)
+        self.assertEqual(snapshot.tipo, 'arquivo')
+        self.assertTrue(snapshot.caminho.endswith('.tar.gz'))
+        with tarfile.open(snapshot.caminho) as tar:
+            self.assertEqual(set(tar.getnames()), {'a.txt', 'pasta', 'pasta/b.txt'})
+            self.assertEqual(tar.extractfile('pasta/b.txt').read(), b'bb')
+
+    def test_dump_do_banco_dentro_do_arquivo(self):
+        escrever(os.path.join(self.origem, 'a.txt'), 'a')
+        banco = os.path.join(self.base, 'app.sqlite3')
+        with sqlite3.connect(banco) as conexao:
+            conexao.execute('CREATE TABLE t (x)')
+        config = self.criar_config(modo_saida='arquivo', compressao_arquivo='gzip', tipo_backup=1, banco_nome=banco)
+
+        execucao = self.executar(config)
+
+        # O dump vai dentro do .tar da execução; nada fica solto no destino
+        self.assertEqual(execucao.status, 'sucesso')
+        snapshot = SnapshotBackup.objects.get(configuracao=config)
+        self.assertEqual(os.listdir(self.destino), [os.path.basename(snapshot.caminho)])
+        with tarfile.open(snapshot.caminho) as tar:
+            self.assertEqual(set(tar.getnames()), {'a.txt', 'dump_banco', 'dump_banco/projeto_dump.sqlite3'})
+
+    def test_socket_vira_erro_do_arquivo(self):
+        escrever(os.path.join(self.origem, 'a.txt'), 'a')
+        servidor = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(servidor.close)
+        servidor.bind(os.path.join(self.origem, 'app.sock'))
+        config = self.criar_config(modo_saida='arquivo', compressao_arquivo='gzip')
+
+        execucao = self.executar(config)
+
+        # O socket fica de fora e é registrado como erro; o restante é arquivado normalmente
+        self.assertEqual(execucao.status, 'falha')
+        self.assertEqual(execucao.mensagem, 'Backup concluído com 1 erro(s) de cópia')
+        self.assertTrue(LogExecucaoDetalhado.objects.filter(
+            execucao=execucao, tipo='error', mensagem__startswith='Erro ao copiar app.sock:',
+        ).exists())
+        with tarfile.open(SnapshotBackup.objects.get(configuracao=config).caminho) as tar:
+            self.assertEqual(tar.getnames(), ['a.txt'])
@@ -0,0 +1,152 @@
+import os
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from setup.tasks import varrer_origem
+from website.tests.base import BackupTestCase, escrever, ler
+from website.utils.checkpoint import Checkpoint, caminho_checkpoint
+from website.utils.manifesto import Manifesto, NOME_MANIFESTO
+
+TOTAL_ARQUIVOS = 6
+ARQUIVOS_ANTES_DA_FALHA = 3
+
+
+def varredura_interrompida(*args, **kwargs):
+    # A origem "some" depois de alguns arquivos: a exceção interrompe a cópia no meio
+    arquivos = 0
+    for item in varrer_origem(*args, **kwargs):
+        if item[0] == 'arquivo':
+            if arquivos == ARQUIVOS_ANTES_DA_FALHA:
+                raise OSError("Origem indisponível")
+            arquivos += 1
+        yield item
+
+
+class RetomarExecucaoTest(BackupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(TOTAL_ARQUIVOS):
+            escrever(os.path.join(self.origem, f"arquivo_{i}.txt"), f"conteúdo {i}")
+        # Um arquivo por vez: cada cópia vai para o diário assim que termina
+        self.config = self.criar_config(modo_saida='espelho', workers_copia=1)
+        self.diario = caminho_checkpoint(self.config)
+
+    def test_retomar_pula_arquivos_concluidos(self):
+        with mock.patch('setup.tasks.varrer_origem', varredura_interrompida):
+            execucao = self.executar(self.config)
+
+        self.assertEqual(execucao.status, 'falha')
+        self.assertEqual(execucao.mensagem, 'Origem indisponível')
+        self.assertTrue(os.path.exists(self.diario))
+        self.assertFalse(os.path.exists(os.path.join(self.destino, NOME_MANIFESTO)))
+        cabecalho, concluidos = Checkpoint(self.diario).carregar()
+        self.assertEqual(cabecalho, {'execucao': execucao.id, 'modo': 'espelho', 'destino': self.destino})
+        self.assertEqual(len(concluidos), ARQUIVOS_ANTES_DA_FALHA)
+
+        # A cópia troca o arquivo do destino (temporário + rename): o inode muda se for copiado de novo
+        inodes = {rel_path: os.stat(os.path.join(self.destino, rel_path)).st_ino for rel_path in concluidos.entradas}
+
+        retomada = self.executar(self.config, execucao_id=execucao.id)
+
+        self.assertEqual(retomada.pk, execucao.pk)
+        self.assertEqual(retomada.status, 'sucesso')
+        self.assertEqual(retomada.arquivos_analisados, TOTAL_ARQUIVOS)
+        self.assertEqual(retomada.arquivos_copiados, TOTAL_ARQUIVOS - ARQUIVOS_ANTES_DA_FALHA)
+        self.assertTrue(retomada.logs_detalhados.filter(mensagem__startswith=f"Retomando a execução {execucao.id}").exists())
+        for rel_path, inode in inodes.items():
+            self.assertEqual(os.stat(os.path.join(self.destino, rel_path)).st_ino, inode)
+
+        # Manifesto gravado com todos os arquivos e diário removido
+        manifesto = Manifesto.carregar(os.path.join(self.destino, NOME_MANIFESTO))
+        self.assertEqual(len(manifesto), TOTAL_ARQUIVOS)
+        self.assertFalse(os.path.exists(self.diario))
+        for i in range(TOTAL_ARQUIVOS):
+            self.assertEqual(ler(os.path.join(self.destino, f"arquivo_{i}.txt")), f"conteúdo {i}")
+
+    def test_arquivo_alterado_depois_da_falha_e_copiado_de_novo(self):
+        with mock.patch('setup.tasks.varrer_origem', varredura_interrompida):
+            execucao = self.executar(self.config)
+        _, concluidos = Checkpoint(self.diario).carregar()
+        alterado = next(iter(concluidos.entradas))
+        escrever(os.path.join(self.origem, alterado), 'alterado depois da falha')
+
+        retomada = self.executar(self.config, execucao_id=execucao.id)
+
+        self.assertEqual(retomada.arquivos_copiados, TOTAL_ARQUIVOS - ARQUIVOS_ANTES_DA_FALHA + 1)
+        self.assertEqual(ler(os.path.join(self.destino, alterado)), 'alterado depois da falha')
+
+    def test_diario_de_outro_modo_e_ignorado(self):
+        os.makedirs(self.destino)
+        with open(self.diario, 'w') as f:
+            f.write(json.dumps({'execucao': 1, 'modo': 'snapshot', 'destino': self.destino}) + '\n')
+            f.write(json.dumps({'caminho': 'arquivo_0.txt', 'tamanho': 10, 'mtime': 0, 'inode': 0}) + '\n')
+
+        execucao = self.executar(self.config)
+
+        self.assertEqual(execucao.arquivos_copiados, TOTAL_ARQUIVOS)
+        self.assertFalse(os.path.exists(self.diario))
+
+
+class CheckpointTest(SimpleTestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp(prefix='checkpoint_teste_')
+        self.addCleanup(shutil.rmtree, self.base, ignore_errors=True)
+        self.caminho = os.path.join(self.base, 'diario.jsonl')
+        escrever(os.path.join(self.base, 'a.txt'), 'a')
+        self.st = os.stat(os.path.join(self.base, 'a.txt'))
+
+    def test_sem_diario(self):
+        cabecalho, concluidos = Checkpoint(self.caminho).carregar()
+
+        self.assertIsNone(cabecalho)
+        self.assertEqual(len(concluidos), 0)
+
+    def test_gravar_e_carregar(self):
+        checkpoint = Checkpoint(self.caminho)
+        checkpoint.iniciar({'execucao': 1})
+        checkpoint.registrar('a.txt', self.st, 'abc')
+        checkpoint.fechar()
+
+        cabecalho, concluidos = Checkpoint(self.caminho).carregar()
+
+        self.assertEqual(cabecalho, {'execucao': 1})
+        self.assertFalse(concluidos.alterado('a.txt', self.st))
+        self.assertEqual(concluidos.hash('a.txt'), 'abc')
+
+    def test_ultima_linha_pela_metade(self):
+        # Processo morto durante a escrita: a linha incompleta é descartada
+        checkpoint = Checkpoint(self.caminho)
+        checkpoint.iniciar({'execucao': 1})
+        checkpoint.registrar('a.txt', self.st)
+        checkpoint.fechar()
+        with open(self.caminho, 'a') as f:
+            f.write('{"caminho": "b.txt", "taman')
+
+        cabecalho, concluidos = Checkpoint(self.caminho).carregar()
+
+        self.assertEqual(cabecalho, {'execucao': 1})
+        self.assertEqual(set(concluidos.entradas), {'a.txt'})
+
+    def test_retomar_continua_o_diario(self):
+        checkpoint = Checkpoint(self.caminho)
+        checkpoint.iniciar({'execucao': 1})
+        checkpoint.registrar('a.txt', self.st)
+        checkpoint.fechar()
+
+        checkpoint = Checkpoint(self.caminho)
+        checkpoint.iniciar({'execucao': 2}, retomar=True)
+        checkpoint.registrar('b.txt', self.st)
+        checkpoint.fechar()
+
+        cabecalho, concluidos = Checkpoint(self.caminho).carregar()
+        self.assertEqual(cabecalho, {'execucao': 1})
+        self.assertEqual(set(concluidos.entradas), {'a.txt', 'b.txt'})
+
+        checkpoint.remover()
+        self.assertFalse(os.path.exists(self.caminho))
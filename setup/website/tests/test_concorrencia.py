@@ -0,0 +1,40 @@
+import os
+from datetime import timedelta
+from unittest import mock
+
+from django.test import override_settings
+from django.utils.timezone import now
+
+from setup.models import ExecucaoBackup, LimiteConcorrencia, ReservaConcorrencia
+from setup.tasks import executar_backup
+from website.tests.base import BackupTestCase
+
+
+@override_settings(BACKUP_ESPERA_VAGA=0, BACKUP_MAX_ESPERAS_VAGA=3)
+class EsperaVagaTest(BackupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.config = self.criar_config()
+        # Vaga do destino ocupada por outro backup
+        limite = LimiteConcorrencia.objects.create(tipo='destino', chave=os.path.normpath(self.destino), max_simultaneos=1)
+        outra = self.criar_config(nome='outro')
+        ReservaConcorrencia.objects.create(limite=limite, configuracao=outra, data_inicio=now(), expira_em=now() + timedelta(hours=1))
+
+    def test_desiste_depois_do_limite_de_esperas(self):
+        # Em modo eager cada reenfileiramento executa na hora: a última tentativa desiste
+        with mock.patch.object(executar_backup, 'apply_async', wraps=executar_backup.apply_async) as reenfileirar, \
+                self.assertLogs('setup.tasks', 'ERROR') as logs:
+            executar_backup.apply(args=[self.config.id])
+
+        self.assertIn(f"sem vaga em '{LimiteConcorrencia.objects.get()}' após 3 espera(s)", logs.output[0])
+        self.assertEqual([chamada.kwargs['kwargs']['esperas_vaga'] for chamada in reenfileirar.call_args_list], [1, 2, 3])
+        self.assertFalse(ExecucaoBackup.objects.exists())
+
+    def test_espera_mantem_as_retentativas_por_falha(self):
+        with mock.patch.object(executar_backup, 'apply_async') as reenfileirar:
+            executar_backup.apply(args=[self.config.id], kwargs={'execucao_id': 7}, retries=2)
+
+        reenfileirar.assert_called_once()
+        self.assertEqual(reenfileirar.call_args.kwargs['retries'], 2)
+        self.assertEqual(reenfileirar.call_args.kwargs['kwargs'], {'execucao_id': 7, 'esperas_vaga': 1})
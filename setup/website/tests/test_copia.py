@@ -0,0 +1,167 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from website.tests.base import BackupTestCase, escrever
+from website.utils.copia import _indisponiveis, copiar_arquivo
+
+TAMANHO_ESPARSO = 64 * 1024 * 1024
+
+
+def criar_esparso(caminho):
+    # Dados só no início e no meio; o restante são buracos
+    with open(caminho, 'wb') as f:
+        f.write(b'inicio')
+        f.seek(TAMANHO_ESPARSO // 2)
+        f.write(b'meio')
+        f.truncate(TAMANHO_ESPARSO)
+
+
+class CopiarArquivoTest(SimpleTestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp(prefix='copia_teste_')
+        self.addCleanup(shutil.rmtree, self.base, ignore_errors=True)
+
+    def test_arquivo_esparso_continua_esparso(self):
+        origem = os.path.join(self.base, 'disco.img')
+        destino = os.path.join(self.base, 'copia.img')
+        criar_esparso(origem)
+        if os.stat(origem).st_blocks * 512 >= TAMANHO_ESPARSO:
+            self.skipTest("O filesystem da pasta temporária não suporta arquivos esparsos")
+
+        tamanho, metodo = copiar_arquivo(origem, destino)
+
+        st = os.stat(destino)
+        self.assertEqual(tamanho, TAMANHO_ESPARSO)
+        self.assertEqual(st.st_size, TAMANHO_ESPARSO)
+        self.assertIn(metodo, ('reflink', 'esparso'))
+        self.assertLess(st.st_blocks * 512, TAMANHO_ESPARSO // 2)
+        with open(destino, 'rb') as f:
+            self.assertEqual(f.read(6), b'inicio')
+            f.seek(TAMANHO_ESPARSO // 2)
+            self.assertEqual(f.read(4), b'meio')
+            f.seek(1024)
+            self.assertEqual(f.read(1024), bytes(1024))
+
+    def test_copia_conteudo_e_metadados(self):
+        origem = os.path.join(self.base, 'dados.bin')
+        destino = os.path.join(self.base, 'copia.bin')
+        conteudo = os.urandom(3 * 1024 * 1024 + 17)
+        with open(origem, 'wb') as f:
+            f.write(conteudo)
+        os.utime(origem, ns=(1_600_000_000_000_000_000, 1_600_000_000_000_000_000))
+
+        tamanho, metodo = copiar_arquivo(origem, destino)
+
+        self.assertEqual(tamanho, len(conteudo))
+        self.assertIn(metodo, ('reflink', 'copy_file_range', 'sendfile', 'buffer'))
+        with open(destino, 'rb') as f:
+            self.assertEqual(f.read(), conteudo)
+        self.assertEqual(os.stat(destino).st_mtime_ns, os.stat(origem).st_mtime_ns)
+        self.assertEqual([nome for nome in os.listdir(self.base) if nome.endswith('.tmp')], [])
+
+    def test_arquivo_vazio(self):
+        origem = os.path.join(self.base, 'vazio.txt')
+        open(origem, 'w').close()
+
+        self.assertEqual(copiar_arquivo(origem, os.path.join(self.base, 'copia.txt')), (0, None))
+
+    def test_substitui_hardlink_do_destino_sem_alterar_o_alvo(self):
+        # Destino é um hardlink para o snapshot anterior: o conteúdo compartilhado não pode mudar
+        origem = os.path.join(self.base, 'origem.txt')
+        anterior = os.path.join(self.base, 'anterior.txt')
+        destino = os.path.join(self.base, 'destino.txt')
+        escrever(origem, 'novo')
+        escrever(anterior, 'antigo')
+        os.link(anterior, destino)
+
+        copiar_arquivo(origem, destino)
+
+        with open(anterior) as f:
+            self.assertEqual(f.read(), 'antigo')
+        with open(destino) as f:
+            self.assertEqual(f.read(), 'novo')
+
+
+class FallbackMecanismosTest(SimpleTestCase):
+    # Filesystems que aceitam copy_file_range mas não copiam nada (procfs, alguns FUSE/NFS)
+    # ou param no meio: a cópia passa para o próximo mecanismo e o arquivo fica completo
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp(prefix='copia_teste_')
+        self.addCleanup(shutil.rmtree, self.base, ignore_errors=True)
+        self.origem = os.path.join(self.base, 'dados.bin')
+        self.destino = os.path.join(self.base, 'copia.bin')
+        self.conteudo = os.urandom(256 * 1024)
+        with open(self.origem, 'wb') as f:
+            f.write(self.conteudo)
+        # Sem reflink, para o copy_file_range ser o primeiro mecanismo tentado
+        dispositivo = os.stat(self.base).st_dev
+        self.chave = (dispositivo, dispositivo)
+        indisponiveis = mock.patch.dict(_indisponiveis, {self.chave: {'reflink'}, (-1, -1): set()}, clear=True)
+        indisponiveis.start()
+        self.addCleanup(indisponiveis.stop)
+
+    def copiar(self, copy_file_range):
+        with mock.patch('website.utils.copia.os.copy_file_range', side_effect=copy_file_range, create=True):
+            tamanho, metodo = copiar_arquivo(self.origem, self.destino)
+        with open(self.destino, 'rb') as f:
+            self.assertEqual(f.read(), self.conteudo)
+        return tamanho, metodo
+
+    def test_zero_no_inicio(self):
+        self.assertEqual(self.copiar(lambda *args: 0), (len(self.conteudo), 'sendfile'))
+        # Não é tentado de novo para o mesmo par de dispositivos, só para outros
+        self.assertIn('copy_file_range', _indisponiveis[self.chave])
+        self.assertEqual(_indisponiveis[(-1, -1)], set())
+
+    def test_copia_parcial(self):
+        chamadas = []
+
+        def copy_file_range(fd_origem, fd_destino, tamanho, *args):
+            # Primeira chamada copia só o início, depois devolve 0 como se fosse o fim do arquivo
+            chamadas.append(tamanho)
+            if len(chamadas) > 1:
+                return 0
+            return os.write(fd_destino, os.read(fd_origem, 1000))
+
+        self.assertEqual(self.copiar(copy_file_range), (len(self.conteudo), 'sendfile'))
+        self.assertNotIn('copy_file_range', _indisponiveis[self.chave])
+
+
+class HardlinksOrigemTest(BackupTestCase):
+
+    def test_hardlinks_da_origem_sao_preservados(self):
+        primeiro = os.path.join(self.origem, 'a', 'dados.bin')
+        escrever(primeiro, 'x' * 4096)
+        os.makedirs(os.path.join(self.origem, 'b'))
+        os.link(primeiro, os.path.join(self.origem, 'b', 'link.bin'))
+        os.link(primeiro, os.path.join(self.origem, 'z.bin'))
+        config = self.criar_config(modo_saida='espelho')
+
+        execucao = self.executar(config)
+
+        self.assertEqual(execucao.status, 'sucesso')
+        self.assertEqual(execucao.arquivos_analisados, 3)
+        self.assertEqual(execucao.arquivos_copiados, 1)
+        inodes = {os.stat(os.path.join(self.destino, caminho)).st_ino for caminho in ('a/dados.bin', 'b/link.bin', 'z.bin')}
+        self.assertEqual(len(inodes), 1)
+        self.assertEqual(os.stat(os.path.join(self.destino, 'z.bin')).st_nlink, 3)
+
+    def test_arquivo_esparso_no_backup(self):
+        criar_esparso(os.path.join(self.origem, 'disco.img'))
+        if os.stat(os.path.join(self.origem, 'disco.img')).st_blocks * 512 >= TAMANHO_ESPARSO:
+            self.skipTest("O filesystem da pasta temporária não suporta arquivos esparsos")
+        config = self.criar_config(modo_saida='espelho')
+
+        execucao = self.executar(config)
+
+        st = os.stat(os.path.join(self.destino, 'disco.img'))
+        self.assertEqual(execucao.status, 'sucesso')
+        self.assertEqual(st.st_size, TAMANHO_ESPARSO)
+        self.assertLess(st.st_blocks * 512, TAMANHO_ESPARSO // 2)
+        self.assertEqual(sum(execucao.metodos_copia.values()), 1)
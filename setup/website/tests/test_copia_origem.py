@@ -0,0 +1,80 @@
+import os
+
+from setup.models import LogExecucaoDetalhado
+from website.utils.manifesto import Manifesto, NOME_MANIFESTO
+from website.tests.base import BackupTestCase, escrever, ler
+
+
+class ManifestoIncrementalTest(BackupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        escrever(os.path.join(self.origem, 'alterado.txt'), 'versão 1')
+        escrever(os.path.join(self.origem, 'pasta', 'mantido.txt'), 'sem alteração')
+        escrever(os.path.join(self.origem, 'removido.txt'), 'apagado depois')
+        self.config = self.criar_config(modo_saida='espelho')
+
+    def test_primeira_execucao_copia_tudo(self):
+        execucao = self.executar(self.config)
+
+        self.assertEqual(execucao.status, 'sucesso')
+        self.assertEqual(execucao.arquivos_copiados, 3)
+        self.assertEqual(ler(os.path.join(self.destino, 'pasta', 'mantido.txt')), 'sem alteração')
+        manifesto = Manifesto.carregar(os.path.join(self.destino, NOME_MANIFESTO))
+        self.assertEqual(set(manifesto.entradas), {'alterado.txt', 'pasta/mantido.txt', 'removido.txt'})
+
+    def test_segunda_execucao_copia_apenas_novos_e_alterados(self):
+        self.executar(self.config)
+
+        # Tamanho diferente: a alteração é detectada mesmo com o mtime na mesma granularidade
+        escrever(os.path.join(self.origem, 'alterado.txt'), 'versão 2 com mais conteúdo')
+        escrever(os.path.join(self.origem, 'novo.txt'), 'novo')
+        os.remove(os.path.join(self.origem, 'removido.txt'))
+
+        execucao = self.executar(self.config)
+
+        self.assertEqual(execucao.status, 'sucesso')
+        self.assertEqual(execucao.arquivos_analisados, 3)
+        self.assertEqual(execucao.arquivos_copiados, 2)
+        self.assertEqual(execucao.bytes_sem_alteracao, len('sem alteração'.encode()))
+        self.assertEqual(ler(os.path.join(self.destino, 'alterado.txt')), 'versão 2 com mais conteúdo')
+
+        mensagens = list(LogExecucaoDetalhado.objects.filter(execucao=execucao).values_list('mensagem', flat=True))
+        self.assertIn('Copiado: alterado.txt', mensagens)
+        self.assertIn('Copiado: novo.txt', mensagens)
+        self.assertNotIn('Copiado: pasta/mantido.txt', mensagens)
+        self.assertIn('Removido da origem: removido.txt', mensagens)
+
+        manifesto = Manifesto.carregar(os.path.join(self.destino, NOME_MANIFESTO))
+        self.assertEqual(set(manifesto.entradas), {'alterado.txt', 'novo.txt', 'pasta/mantido.txt'})
+
+    def test_sem_incremental_copia_tudo_novamente(self):
+        self.config.backup_incremental = False
+        self.config.save()
+        self.executar(self.config)
+
+        execucao = self.executar(self.config)
+
+        self.assertEqual(execucao.arquivos_copiados, 3)
+        self.assertEqual(execucao.bytes_sem_alteracao, 0)
+
+
+class ErrosPorArquivoTest(BackupTestCase):
+
+    def test_link_quebrado_vira_erro_do_arquivo(self):
+        escrever(os.path.join(self.origem, 'valido.txt'), 'ok')
+        os.symlink(os.path.join(self.origem, 'nao_existe.txt'), os.path.join(self.origem, 'quebrado.txt'))
+        config = self.criar_config(modo_saida='espelho')
+
+        execucao = self.executar(config)
+
+        # O backup não é abortado (nem repetido): só o link quebrado fica de fora
+        self.assertEqual(execucao.status, 'falha')
+        self.assertEqual(execucao.mensagem, 'Backup concluído com 1 erro(s) de cópia')
+        self.assertEqual(ler(os.path.join(self.destino, 'valido.txt')), 'ok')
+        self.assertFalse(os.path.lexists(os.path.join(self.destino, 'quebrado.txt')))
+        self.assertTrue(LogExecucaoDetalhado.objects.filter(
+            execucao=execucao, tipo='error', mensagem__startswith='Erro ao copiar quebrado.txt:',
+        ).exists())
+        manifesto = Manifesto.carregar(os.path.join(self.destino, NOME_MANIFESTO))
+        self.assertEqual(set(manifesto.entradas), {'valido.txt'})
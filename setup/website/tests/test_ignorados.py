@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from website.tests.base import escrever
+from website.utils.ignorados import FiltroIgnorados
+from website.utils.varredura import varrer_origem
+
+# (padrão, caminho relativo, é pasta, deve ser ignorado)
+CASOS = [
+    # Nome simples: vale em qualquer nível, para arquivos e pastas
+    ('node_modules', 'node_modules', True, True),
+    ('node_modules', 'app/frontend/node_modules', True, True),
+    ('node_modules', 'node_modules_backup', True, False),
+    ('node_modules', 'app/meu_node_modules', True, False),
+    ('.env', 'config/.env', False, True),
+    # Ancorados na raiz: "/" no início ou no meio
+    ('/cache', 'cache', True, True),
+    ('/cache', 'app/cache', True, False),
+    ('media/cache', 'media/cache', True, True),
+    ('media/cache', 'app/media/cache', True, False),
+    ('/media/cache', 'media/cache', True, True),
+    # Regressão: o prefixo não pode ignorar pastas com nome parecido
+    ('media/cache', 'media/cache2', True, False),
+    ('media/cache', 'media/cache2/foto.jpg', False, False),
+    ('/media/cache', 'media/cache_antigo', True, False),
+    ('cache', 'media/cache2', True, False),
+    # Terminados em "/": só pastas
+    ('tmp/', 'tmp', True, True),
+    ('tmp/', 'app/tmp', True, True),
+    ('tmp/', 'tmp', False, False),
+    ('tmp/', 'app/tmp', False, False),
+    ('/media/cache/', 'media/cache', True, True),
+    ('/media/cache/', 'media/cache', False, False),
+    # Curingas
+    ('*.log', 'erro.log', False, True),
+    ('*.log', 'logs/2024/erro.log', False, True),
+    ('*.log', 'erro.log.gz', False, False),
+    ('/*.log', 'logs/erro.log', False, False),
+    ('arquivo?.txt', 'arquivo1.txt', False, True),
+    ('arquivo?.txt', 'arquivo10.txt', False, False),
+    ('*.[ch]', 'src/main.c', False, True),
+    ('*.[!ch]', 'src/main.c', False, False),
+    ('media/*.jpg', 'media/foto.jpg', False, True),
+    ('media/*.jpg', 'media/2024/foto.jpg', False, False),
+    # "**": qualquer quantidade de pastas
+    ('**/tmp', 'tmp', True, True),
+    ('**/tmp', 'a/b/c/tmp', True, True),
+    ('**/tmp', 'a/b/tmpx', True, False),
+    ('media/**/thumbs', 'media/thumbs', True, True),
+    ('media/**/thumbs', 'media/2024/01/thumbs', True, True),
+    ('media/**/thumbs', 'app/media/thumbs', True, False),
+    ('logs/**', 'logs/2024/erro.txt', False, True),
+    ('logs/**', 'app/logs/erro.txt', False, False),
+]
+
+
+class FiltroIgnoradosTest(SimpleTestCase):
+
+    def test_padroes(self):
+        for padrao, caminho, diretorio, esperado in CASOS:
+            with self.subTest(padrao=padrao, caminho=caminho, diretorio=diretorio):
+                self.assertEqual(FiltroIgnorados([padrao]).ignorar(caminho, diretorio=diretorio), esperado)
+
+    def test_varios_padroes(self):
+        filtro = FiltroIgnorados(['node_modules', '/media/cache/', '*.log'])
+
+        self.assertTrue(filtro.ignorar('app/node_modules', diretorio=True))
+        self.assertTrue(filtro.ignorar('media/cache', diretorio=True))
+        self.assertTrue(filtro.ignorar('debug.log'))
+        self.assertFalse(filtro.ignorar('media/cache2', diretorio=True))
+        self.assertFalse(filtro.ignorar('app/main.py'))
+
+    def test_linhas_vazias_e_comentarios(self):
+        filtro = FiltroIgnorados(['', '   ', None, '# comentário'])
+
+        self.assertFalse(filtro)
+        self.assertFalse(filtro.ignorar('# comentário'))
+
+    def test_espacos_nas_bordas(self):
+        self.assertTrue(FiltroIgnorados(['  *.log  ']).ignorar('erro.log'))
+
+
+class VarreduraIgnoradosTest(SimpleTestCase):
+
+    def setUp(self):
+        self.origem = tempfile.mkdtemp(prefix='varredura_teste_')
+        self.addCleanup(shutil.rmtree, self.origem, ignore_errors=True)
+        for caminho in ('media/cache/a.jpg', 'media/cache2/b.jpg', 'media/foto.jpg', 'app/node_modules/x/index.js', 'app/main.py', 'app/debug.log'):
+            escrever(os.path.join(self.origem, caminho), caminho)
+
+    def test_pastas_ignoradas_nao_sao_visitadas(self):
+        ignorados = []
+        filtro = FiltroIgnorados(['/media/cache', 'node_modules/', '*.log'])
+
+        arquivos = {
+            rel_path
+            for tipo, rel_path, _, _ in varrer_origem(self.origem, filtro, lambda rel_path, pasta: ignorados.append((rel_path, pasta)))
+            if tipo == 'arquivo'
+        }
+
+        self.assertEqual(arquivos, {'media/cache2/b.jpg', 'media/foto.jpg', 'app/main.py'})
+        self.assertEqual(sorted(ignorados), [('app/debug.log', False), ('app/node_modules', True), ('media/cache', True)])
+
+    def test_link_quebrado_vem_sem_stat(self):
+        os.symlink(os.path.join(self.origem, 'nao_existe'), os.path.join(self.origem, 'quebrado'))
+
+        arquivos = {rel_path: st for tipo, rel_path, _, st in varrer_origem(self.origem, FiltroIgnorados([])) if tipo == 'arquivo'}
+
+        self.assertIsNone(arquivos['quebrado'])
+        self.assertIsNotNone(arquivos['app/main.py'])
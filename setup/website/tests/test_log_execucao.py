@@ -0,0 +1,43 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.utils.timezone import now
+
+from setup.models import ExecucaoBackup, LogExecucaoDetalhado
+from website.tests.base import BackupTestCase
+from website.utils.log_execucao import LogExecucaoBuffer
+
+
+class LogExecucaoBufferTest(BackupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.execucao = ExecucaoBackup.objects.create(configuracao=self.criar_config(), data_inicio=now(), status='executando')
+
+    def test_grava_em_lote(self):
+        logs = LogExecucaoBuffer(self.execucao, tamanho_lote=3, intervalo=3600)
+        logs.registrar('info', 'um')
+        logs.registrar('info', 'dois')
+        self.assertEqual(LogExecucaoDetalhado.objects.count(), 0)
+
+        logs.registrar('info', 'três')
+        self.assertEqual(LogExecucaoDetalhado.objects.count(), 3)
+
+    def test_hora_do_registro_e_nao_da_gravacao(self):
+        inicio = now() - timedelta(minutes=10)
+        horarios = [inicio, inicio + timedelta(minutes=1), inicio + timedelta(minutes=2)]
+        logs = LogExecucaoBuffer(self.execucao, intervalo=3600)
+        with mock.patch('website.utils.log_execucao.now', side_effect=horarios):
+            for i in range(3):
+                logs.registrar('info', f"linha {i}")
+        logs.fechar()
+
+        self.assertEqual(list(LogExecucaoDetalhado.objects.order_by('id').values_list('timestamp', flat=True)), horarios)
+
+    def test_nivel_resumo(self):
+        logs = LogExecucaoBuffer(self.execucao, nivel_arquivos='resumo')
+        for i in range(5):
+            logs.registrar_arquivo('copia', f"Copiado: {i}")
+        logs.fechar()
+
+        self.assertEqual(list(LogExecucaoDetalhado.objects.values_list('mensagem', flat=True)), ["5 arquivo(s) copiado(s)"])
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import threading
+
+from django.test import SimpleTestCase
+
+from website.tests.base import escrever, ler
+from website.utils.copia import MotorCopia
+from website.utils.integridade import calcular_hash
+
+
+class MotorCopiaTest(SimpleTestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp(prefix='motor_teste_')
+        self.addCleanup(shutil.rmtree, self.base, ignore_errors=True)
+        self.origem = os.path.join(self.base, 'origem')
+        self.destino = os.path.join(self.base, 'destino')
+        for i in range(50):
+            escrever(os.path.join(self.origem, f"pasta_{i % 5}", f"arquivo_{i}.txt"), 'x' * i)
+
+    def copiar_tudo(self, workers, **callbacks):
+        with MotorCopia(workers=workers, max_pendentes=8, **callbacks) as motor:
+            for i in range(50):
+                rel_path = os.path.join(f"pasta_{i % 5}", f"arquivo_{i}.txt")
+                motor.criar_diretorio(os.path.dirname(os.path.join(self.destino, rel_path)))
+                motor.copiar(os.path.join(self.origem, rel_path), os.path.join(self.destino, rel_path), rel_path)
+            motor.copiar(os.path.join(self.origem, 'nao_existe.txt'), os.path.join(self.destino, 'nao_existe.txt'), 'nao_existe.txt')
+            erros = motor.aguardar()
+        return motor, erros
+
+    def test_copia_em_paralelo(self):
+        for workers in (1, 4):
+            with self.subTest(workers=workers):
+                shutil.rmtree(self.destino, ignore_errors=True)
+                copiados = []
+                falhas = []
+                threads = set()
+
+                def ao_copiar(rel_path, tamanho, hash_arquivo):
+                    threads.add(threading.get_ident())
+                    copiados.append((rel_path, tamanho))
+
+                def ao_falhar(rel_path, erro):
+                    threads.add(threading.get_ident())
+                    falhas.append(rel_path)
+
+                motor, erros = self.copiar_tudo(workers, ao_copiar=ao_copiar, ao_falhar=ao_falhar)
+
+                # Um erro não interrompe as demais cópias e fica registrado por arquivo
+                self.assertEqual(motor.total_copiados, 50)
+                self.assertEqual(motor.total_bytes, sum(range(50)))
+                self.assertEqual(len(copiados), 50)
+                self.assertEqual([rel_path for rel_path, _ in erros], ['nao_existe.txt'])
+                self.assertEqual(falhas, ['nao_existe.txt'])
+                self.assertEqual(ler(os.path.join(self.destino, 'pasta_2', 'arquivo_7.txt')), 'x' * 7)
+                # Os callbacks rodam na thread de quem chama, nunca nas threads do pool
+                self.assertEqual(threads, {threading.get_ident()})
+
+    def test_conteudo_igual_ao_hash_anterior_nao_copia(self):
+        rel_path = os.path.join('pasta_1', 'arquivo_1.txt')
+        origem = os.path.join(self.origem, rel_path)
+        destino = os.path.join(self.destino, rel_path)
+        os.makedirs(os.path.dirname(destino))
+        mantidos = []
+
+        with MotorCopia(workers=2, ao_manter=lambda rel_path, tamanho, hash_arquivo: mantidos.append(rel_path)) as motor:
+            motor.copiar(origem, destino, rel_path, hash_esperado=calcular_hash(origem))
+            motor.aguardar()
+
+        self.assertEqual((motor.total_copiados, motor.total_mantidos), (0, 1))
+        self.assertEqual(mantidos, [rel_path])
+        self.assertFalse(os.path.exists(destino))
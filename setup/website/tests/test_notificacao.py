@@ -0,0 +1,44 @@
+from unittest import mock
+
+import requests
+
+from setup.models import Notificacao
+from setup.tasks import enviar_notificacao
+from website.tests.base import BackupTestCase
+
+
+def resposta(status_code):
+    resposta = requests.Response()
+    resposta.status_code = status_code
+    resposta.url = 'https://api.telegram.org/'
+    return resposta
+
+
+class EnviarNotificacaoTest(BackupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        config = self.criar_config()
+        self.notificacao = Notificacao.objects.create(configuracao=config, meio='telegram', telegram_chat_id='123')
+
+    def enviar(self, erro):
+        # O retry do Celery é trocado por uma exceção própria para contar as retentativas pedidas
+        with mock.patch('website.utils.notificacao.obter_sessao') as sessao, \
+                mock.patch.object(enviar_notificacao, 'retry', side_effect=RuntimeError('retry')) as retry:
+            sessao.return_value.post.side_effect = [erro]
+            try:
+                resultado = enviar_notificacao.apply(args=[self.notificacao.id, 'falha', 'erro']).get()
+            except RuntimeError:
+                resultado = None
+        return resultado, retry.call_count
+
+    def test_erro_4xx_nao_repete(self):
+        resultado, retentativas = self.enviar(resposta(403))
+
+        self.assertEqual(retentativas, 0)
+        self.assertTrue(resultado.startswith(f'Notificação {self.notificacao.id} não enviada'))
+
+    def test_erros_temporarios_repetem(self):
+        for erro in (resposta(429), resposta(502), requests.ConnectionError('sem rede'), requests.Timeout('lento')):
+            with self.subTest(erro=erro):
+                self.assertEqual(self.enviar(erro), (None, 1))
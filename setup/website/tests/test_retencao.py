@@ -0,0 +1,161 @@
+import os
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.utils.timezone import now
+
+from setup.models import ExecucaoBackup, LogExecucaoDetalhado, SnapshotBackup, VerificacaoArquivo
+from setup.tasks import limpar_backups_antigos
+from website.tests.base import BackupTestCase, escrever
+from website.utils.checkpoint import caminho_checkpoint
+from website.utils.snapshot import catalogar_snapshots, localizar_snapshot_anterior
+
+
+class CatalogoSnapshotsTest(BackupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        escrever(os.path.join(self.origem, 'a.txt'), 'a')
+
+    def test_snapshot_registrado_na_criacao_e_concluido_no_final(self):
+        config = self.criar_config(modo_saida='snapshot')
+
+        execucao = self.executar(config)
+
+        snapshot = SnapshotBackup.objects.get(configuracao=config)
+        self.assertTrue(snapshot.concluido)
+        self.assertEqual(snapshot.execucao, execucao)
+        self.assertEqual(snapshot.total_arquivos, 1)
+        self.assertTrue(os.path.isdir(snapshot.caminho))
+
+    def test_execucao_interrompida_fica_no_catalogo(self):
+        config = self.criar_config(modo_saida='snapshot', dias_reter_backup=7)
+
+        with mock.patch('setup.tasks.copiar_origem', side_effect=OSError("disco cheio")):
+            execucao = self.executar(config)
+
+        # As retentativas reaproveitam a execução e a mesma pasta
+        self.assertEqual(execucao.status, 'falha')
+        snapshot = SnapshotBackup.objects.get(configuracao=config)
+        self.assertFalse(snapshot.concluido)
+        self.assertTrue(os.path.isdir(snapshot.caminho))
+        self.assertIsNone(localizar_snapshot_anterior(config))
+
+        SnapshotBackup.objects.filter(pk=snapshot.pk).update(data_criacao=now() - timedelta(days=8))
+        limpar_backups_antigos()
+
+        self.assertFalse(os.path.exists(snapshot.caminho))
+        self.assertFalse(SnapshotBackup.objects.exists())
+
+    def test_arquivo_interrompido_remove_o_temporario(self):
+        config = self.criar_config(modo_saida='arquivo', dias_reter_backup=7)
+
+        with mock.patch('setup.tasks.gerar_arquivo_tar', side_effect=OSError("disco cheio")):
+            self.executar(config)
+
+        snapshot = SnapshotBackup.objects.get(configuracao=config)
+        self.assertEqual(snapshot.tipo, 'arquivo')
+        self.assertFalse(snapshot.concluido)
+        # Processo morto no meio da escrita: só o temporário ficou no destino
+        escrever(f"{snapshot.caminho}.tmp", 'parcial')
+
+        SnapshotBackup.objects.filter(pk=snapshot.pk).update(data_criacao=now() - timedelta(days=8))
+        limpar_backups_antigos()
+
+        self.assertFalse(os.path.exists(f"{snapshot.caminho}.tmp"))
+        self.assertFalse(SnapshotBackup.objects.exists())
+
+
+class VerificacaoRetencaoTest(BackupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        escrever(os.path.join(self.origem, 'a.txt'), 'a')
+
+    def test_verificacoes_vencidas_removidas(self):
+        config = self.criar_config(modo_saida='espelho', dias_reter_backup=7, verificar_integridade='todos')
+        antiga = self.executar(config)
+        ExecucaoBackup.objects.filter(pk=antiga.pk).update(data_inicio=now() - timedelta(days=8))
+        recente = self.executar(config)
+        self.assertEqual(VerificacaoArquivo.objects.count(), 2)
+
+        limpar_backups_antigos()
+
+        # A execução vencida continua no histórico, só sem as linhas por arquivo
+        self.assertTrue(ExecucaoBackup.objects.filter(pk=antiga.pk).exists())
+        self.assertEqual(list(VerificacaoArquivo.objects.values_list('execucao_id', flat=True)), [recente.pk])
+
+    def test_herdados_informados_como_nao_verificados(self):
+        escrever(os.path.join(self.origem, 'b.txt'), 'b')
+        config = self.criar_config(modo_saida='snapshot', verificar_integridade='copiados')
+        self.executar(config)
+        escrever(os.path.join(self.origem, 'c.txt'), 'c')
+
+        execucao = self.executar(config)
+
+        self.assertEqual(list(execucao.verificacoes.values_list('caminho', flat=True)), ['c.txt'])
+        self.assertTrue(LogExecucaoDetalhado.objects.filter(
+            execucao=execucao, mensagem='2 arquivo(s) herdado(s) do backup anterior sem verificação nesta execução',
+        ).exists())
+
+
+class CatalogarExistentesTest(BackupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.config = self.criar_config(modo_saida='snapshot', dias_reter_backup=7)
+        os.makedirs(self.destino)
+
+    def caminho(self, nome):
+        return os.path.join(self.destino, nome)
+
+    def test_catalogar(self):
+        escrever(self.caminho('projeto_20240101_030000/a.txt'), 'a')
+        escrever(self.caminho('projeto_20240102_030000.tar.gz'), '')
+        escrever(self.caminho('projeto_20240103_030000.tar.zst.tmp'), '')
+        escrever(self.caminho('projeto_20240104_030000/a.txt'), 'a')
+        escrever(self.caminho('projeto_20240105_030000/a.txt'), 'a')
+        # Não são backups deste projeto / não seguem o padrão
+        escrever(self.caminho('outro_20240101_030000/a.txt'), 'a')
+        escrever(self.caminho('projeto_20240101_030000.txt'), '')
+        escrever(self.caminho('projeto_atual/a.txt'), 'a')
+        # Já catalogado
+        SnapshotBackup.objects.create(configuracao=self.config, caminho=self.caminho('projeto_20240104_030000'), data_criacao=now())
+        # Execução interrompida com checkpoint apontando para a pasta
+        with open(caminho_checkpoint(self.config), 'w') as f:
+            f.write(json.dumps({'execucao': 1, 'modo': 'snapshot', 'destino': self.caminho('projeto_20240105_030000')}) + '\n')
+
+        criados = catalogar_snapshots(self.config)
+
+        self.assertEqual(len(criados), 4)
+        snapshots = {
+            os.path.basename(s.caminho): (s.tipo, s.concluido, s.data_criacao.strftime('%Y%m%d_%H%M%S'))
+            for s in SnapshotBackup.objects.exclude(caminho=self.caminho('projeto_20240104_030000'))
+        }
+        self.assertEqual(snapshots, {
+            'projeto_20240101_030000': ('pasta', True, '20240101_030000'),
+            'projeto_20240102_030000.tar.gz': ('arquivo', True, '20240102_030000'),
+            'projeto_20240103_030000.tar.zst': ('arquivo', False, '20240103_030000'),
+            'projeto_20240105_030000': ('pasta', False, '20240105_030000'),
+        })
+
+        # Executar de novo não duplica
+        self.assertEqual(catalogar_snapshots(self.config), [])
+
+    def test_comando_e_retencao(self):
+        escrever(self.caminho('projeto_20240101_030000/a.txt'), 'a')
+        escrever(self.caminho('projeto_20240102_030000.tar.gz.tmp'), '')
+        recente = now().strftime('%Y%m%d_%H%M%S')
+        escrever(self.caminho(f'projeto_{recente}/a.txt'), 'a')
+
+        saida = StringIO()
+        call_command('catalogar_snapshots', stdout=saida)
+        self.assertIn("3 snapshot(s) catalogado(s).", saida.getvalue())
+
+        limpar_backups_antigos()
+
+        self.assertEqual(sorted(os.listdir(self.destino)), [f'projeto_{recente}'])
+        self.assertEqual(SnapshotBackup.objects.get().caminho, self.caminho(f'projeto_{recente}'))
@@ -0,0 +1,48 @@
+import os
+from datetime import datetime
+
+from django.utils import timezone
+
+from setup.models import SnapshotBackup
+from website.tests.base import BackupTestCase, escrever, ler
+from website.utils.snapshot import catalogar_snapshots, data_snapshot, nome_snapshot
+
+
+class NomeSnapshotTest(BackupTestCase):
+
+    def test_nome_com_microssegundos(self):
+        data = timezone.make_aware(datetime(2024, 1, 2, 3, 4, 5, 678))
+
+        self.assertEqual(nome_snapshot('projeto', data), 'projeto_20240102_030405_000678')
+        self.assertEqual(data_snapshot('20240102_030405_000678'), data)
+
+    def test_nome_antigo(self):
+        self.assertEqual(data_snapshot('20240102_030405'), timezone.make_aware(datetime(2024, 1, 2, 3, 4, 5)))
+
+    def test_catalogar_formatos_novo_e_antigo(self):
+        config = self.criar_config(modo_saida='snapshot')
+        escrever(os.path.join(self.destino, 'projeto_20240101_030000', 'a.txt'), 'a')
+        escrever(os.path.join(self.destino, 'projeto_20240102_030000_123456', 'a.txt'), 'a')
+
+        criados = catalogar_snapshots(config)
+
+        self.assertEqual(sorted(os.path.basename(s.caminho) for s in criados), ['projeto_20240101_030000', 'projeto_20240102_030000_123456'])
+
+
+class ModoSnapshotTest(BackupTestCase):
+
+    def test_execucoes_no_mesmo_segundo_nao_compartilham_pasta(self):
+        escrever(os.path.join(self.origem, 'mantido.txt'), 'sem alteração')
+        config = self.criar_config(modo_saida='snapshot')
+
+        primeira = self.executar(config)
+        escrever(os.path.join(self.origem, 'novo.txt'), 'novo')
+        segunda = self.executar(config)
+
+        self.assertEqual((primeira.status, segunda.status), ('sucesso', 'sucesso'))
+        anterior, atual = SnapshotBackup.objects.order_by('data_criacao').values_list('caminho', flat=True)
+        self.assertNotEqual(anterior, atual)
+        self.assertFalse(os.path.exists(os.path.join(anterior, 'novo.txt')))
+        self.assertEqual(ler(os.path.join(atual, 'novo.txt')), 'novo')
+        # Arquivo sem alteração: hardlink para o snapshot anterior
+        self.assertEqual(os.stat(os.path.join(anterior, 'mantido.txt')).st_ino, os.stat(os.path.join(atual, 'mantido.txt')).st_ino)
@@ -0,0 +1,84 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from website.utils import sqlite_backup
+from website.utils.sqlite_backup import copiar_sqlite
+
+
+class CopiarSqliteTest(SimpleTestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp(prefix='sqlite_teste_')
+        self.addCleanup(shutil.rmtree, self.base, ignore_errors=True)
+        self.origem = os.path.join(self.base, 'app.sqlite3')
+        with sqlite3.connect(self.origem) as conexao:
+            conexao.execute('CREATE TABLE t (x)')
+            conexao.executemany('INSERT INTO t VALUES (?)', [(os.urandom(2000),) for _ in range(100)])
+        self.total_paginas = sqlite3.connect(self.origem).execute('PRAGMA page_count').fetchone()[0]
+
+    def test_pausa_entre_os_passos(self):
+        # Os passos (e as pausas entre eles) ficam registrados pelo horário de cada pausa
+        horarios = []
+        dormir = time.sleep
+
+        def pausa(segundos):
+            horarios.append(time.monotonic())
+            dormir(segundos)
+
+        destino = os.path.join(self.base, 'copia.sqlite3')
+        inicio = time.monotonic()
+        with mock.patch.object(sqlite_backup.time, 'sleep', side_effect=pausa) as sleep:
+            paginas, reinicios = copiar_sqlite(self.origem, destino, paginas=10, pausa=0.02)
+        duracao = time.monotonic() - inicio
+
+        passos = -(-self.total_paginas // 10)
+        self.assertEqual((paginas, reinicios), (self.total_paginas, 0))
+        # Uma pausa depois de cada passo, menos o último
+        self.assertEqual(sleep.call_count, passos - 1)
+        self.assertTrue(all(chamada.args == (0.02,) for chamada in sleep.call_args_list))
+        self.assertTrue(all(b - a >= 0.02 for a, b in zip(horarios, horarios[1:])))
+        self.assertGreaterEqual(duracao, 0.02 * (passos - 1))
+        with sqlite3.connect(destino) as conexao:
+            self.assertEqual(conexao.execute('SELECT count(*) FROM t').fetchone()[0], 100)
+
+    def test_gravacao_no_intervalo_entre_os_passos(self):
+        # Com a pausa entre os passos outra conexão consegue gravar no meio da cópia
+        gravacoes = []
+
+        def gravar(segundos):
+            if not gravacoes:
+                with sqlite3.connect(self.origem, timeout=0) as conexao:
+                    conexao.execute('INSERT INTO t VALUES (?)', (b'novo',))
+                gravacoes.append(True)
+
+        destino = os.path.join(self.base, 'copia.sqlite3')
+        with mock.patch.object(sqlite_backup.time, 'sleep', side_effect=gravar):
+            paginas, reinicios = copiar_sqlite(self.origem, destino, paginas=10, pausa=0.01)
+
+        # A gravação faz o SQLite recomeçar a cópia, que termina com a linha nova
+        self.assertEqual(reinicios, 1)
+        with sqlite3.connect(destino) as conexao:
+            self.assertEqual(conexao.execute('SELECT count(*) FROM t').fetchone()[0], 101)
+
+    def test_passo_unico_depois_dos_reinicios_fica_no_log(self):
+        reinicios = iter(range(sqlite_backup.MAX_REINICIOS + 1))
+
+        def gravar(segundos):
+            # Grava a cada pausa enquanto a cópia não cai para o passo único
+            if next(reinicios, None) is not None:
+                with sqlite3.connect(self.origem, timeout=0) as conexao:
+                    conexao.execute('INSERT INTO t VALUES (?)', (b'novo',))
+
+        destino = os.path.join(self.base, 'copia.sqlite3')
+        with mock.patch.object(sqlite_backup.time, 'sleep', side_effect=gravar), \
+                self.assertLogs('website.utils.sqlite_backup', 'WARNING') as logs:
+            _, total_reinicios = copiar_sqlite(self.origem, destino, paginas=10, pausa=0.01)
+
+        self.assertEqual(total_reinicios, sqlite_backup.MAX_REINICIOS)
+        self.assertIn('único passo', logs.output[0])
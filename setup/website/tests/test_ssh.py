@@ -0,0 +1,27 @@
+import subprocess
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from website.utils.ssh import ConexaoSSH
+
+
+class HashesRemotosTest(SimpleTestCase):
+
+    def hashes(self, returncode, stdout=b'', stderr=b''):
+        resultado = subprocess.CompletedProcess([], returncode, stdout=stdout, stderr=stderr)
+        with mock.patch('website.utils.ssh.subprocess.run', return_value=resultado):
+            return ConexaoSSH('10.0.0.1').hashes_remotos('/srv/media', ['a.txt', 'b.txt'])
+
+    def test_arquivo_faltando_na_origem(self):
+        # sha256sum falhou só para b.txt: o hash de a.txt continua valendo
+        self.assertEqual(self.hashes(123, stdout=b'abc  a.txt\0'), {'a.txt': 'abc'})
+
+    def test_falha_da_conexao(self):
+        with self.assertRaises(subprocess.CalledProcessError) as erro:
+            self.hashes(255, stderr=b'Connection refused')
+        self.assertEqual(erro.exception.stderr, 'Connection refused')
+
+    def test_pasta_inexistente(self):
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.hashes(1, stderr=b'cd: /srv/media: No such file or directory')
@@ -0,0 +1,265 @@
+import json
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from celery.schedules import crontab_parser
+from django_celery_beat.models import CrontabSchedule, PeriodicTask, PeriodicTasks
+
+from setup.models import AgendamentoBackup
+
+TAREFA_BACKUP = 'setup.tasks.executar_backup'
+
+# Cada AgendamentoBackup tem uma PeriodicTask com o nome fixo backup-agendamento-<id>;
+# o nome de exibição (projeto e horário) fica na descrição
+PREFIXO_TAREFA = 'backup-agendamento-'
+
+# Nomes usados pelas versões anteriores do sync_agendamentos e do signal
+PREFIXOS_ANTIGOS = ('Backup: ', 'Backup | ')
+TAREFAS_ANTIGAS = ('setup.tasks.executar_backup_teste', 'website.tasks.executar_backup_teste')
+
+CAMPOS_CRONTAB = ('minute', 'hour', 'day_of_month', 'month_of_year', 'day_of_week')
+
+# Nome e faixa (máximo, mínimo) de cada campo, na mesma regra do crontab do Celery usado pelo beat
+FAIXAS_CRONTAB = {
+    'minute': ('minuto', 60, 0),
+    'hour': ('hora', 24, 0),
+    'day_of_month': ('dia do mês', 31, 1),
+    'month_of_year': ('mês', 12, 1),
+    'day_of_week': ('dia da semana', 7, 0),
+}
+
+
+def nome_tarefa(agendamento_id):
+    return f"{PREFIXO_TAREFA}{agendamento_id}"
+
+
+def interpretar_horario(horario):
+    # Converte "03:00" ou "0 3 * * *" nos campos do CrontabSchedule; ValueError se for inválido
+    partes = (horario or '').strip().split()
+    if len(partes) == 5:
+        campos = dict(zip(CAMPOS_CRONTAB, partes))
+        for campo, valor in campos.items():
+            descricao, maximo, minimo = FAIXAS_CRONTAB[campo]
+            try:
+                crontab_parser(maximo, minimo).parse(valor)
+            except ValueError as e:
+                raise ValueError(f"Campo {descricao} inválido no agendamento {horario}: {e}")
+        return campos
+
+    if len(partes) == 1 and ':' in partes[0]:
+        hora, minuto = partes[0].split(':', 1)
+        if not (hora.isdigit() and minuto.isdigit() and int(hora) < 24 and int(minuto) < 60):
+            raise ValueError(f"Formato de hora inválido: {horario}")
+        return {'minute': str(int(minuto)), 'hour': str(int(hora)), 'day_of_month': '*', 'month_of_year': '*', 'day_of_week': '*'}
+
+    raise ValueError(f"Formato de agendamento inválido: {horario}")
+
+
+def chave_crontab(campos, fuso):
+    return tuple(campos[campo] for campo in CAMPOS_CRONTAB) + (str(fuso),)
+
+
+def estado_desejado(agendamento, fuso):
+    # Como a PeriodicTask do agendamento deve ficar. Levanta ValueError se o horário for inválido.
+    campos = interpretar_horario(agendamento.horario)
+    config = agendamento.configuracao
+    return {
+        'crontab': chave_crontab(campos, fuso),
+        'task': TAREFA_BACKUP,
+        'args': json.dumps([config.id]),
+        'enabled': agendamento.ativo,
+        'description': f"Backup: {config.projeto.nome} ({agendamento.horario})",
+    }
+
+
+def estado_atual(tarefa):
+    crontab = tarefa.crontab
+    return {
+        'crontab': chave_crontab({campo: getattr(crontab, campo) for campo in CAMPOS_CRONTAB}, crontab.timezone) if crontab else None,
+        'task': tarefa.task,
+        'args': tarefa.args,
+        'enabled': tarefa.enabled,
+        'description': tarefa.description,
+    }
+
+
+def calcular_diferencas():
+    # Compara os agendamentos com as PeriodicTasks e retorna o que precisa mudar, sem gravar nada:
+    # {'criar': [(nome, desejado)], 'atualizar': [(tarefa, desejado)], 'remover': [tarefa], 'invalidos': [(agendamento, erro)]}
+    fuso = timezone.get_current_timezone_name()
+    agendamentos = AgendamentoBackup.objects.select_related('configuracao__projeto')
+    tarefas = {
+        tarefa.name: tarefa
+        for tarefa in PeriodicTask.objects.filter(name__startswith=PREFIXO_TAREFA).select_related('crontab')
+    }
+
+    diferencas = {'criar': [], 'atualizar': [], 'remover': [], 'invalidos': []}
+    for agendamento in agendamentos:
+        nome = nome_tarefa(agendamento.id)
+        tarefa = tarefas.pop(nome, None)
+        try:
+            desejado = estado_desejado(agendamento, fuso)
+        except ValueError as e:
+            diferencas['invalidos'].append((agendamento, str(e)))
+            # Horário inválido: a tarefa existente não pode continuar com o horário antigo
+            if tarefa is not None and tarefa.enabled:
+                desejado = dict(estado_atual(tarefa), enabled=False)
+                diferencas['atualizar'].append((tarefa, desejado))
+            continue
+
+        if tarefa is None:
+            diferencas['criar'].append((nome, desejado))
+        elif estado_atual(tarefa) != desejado:
+            diferencas['atualizar'].append((tarefa, desejado))
+
+    # Tarefas de agendamentos que não existem mais e as criadas com os nomes antigos
+    diferencas['remover'] = list(tarefas.values())
+    for prefixo in PREFIXOS_ANTIGOS:
+        diferencas['remover'] += PeriodicTask.objects.filter(name__startswith=prefixo, task__in=TAREFAS_ANTIGAS)
+
+    return diferencas
+
+
+def _carregar_crontabs(chaves):
+    crontabs = {}
+    for crontab in CrontabSchedule.objects.filter(minute__in={chave[0] for chave in chaves}, hour__in={chave[1] for chave in chaves}):
+        crontabs.setdefault(chave_crontab({campo: getattr(crontab, campo) for campo in CAMPOS_CRONTAB}, crontab.timezone), crontab)
+    return crontabs
+
+
+def obter_crontabs(chaves):
+    # Busca os CrontabSchedule das chaves informadas, criando de uma vez os que faltam
+    crontabs = _carregar_crontabs(chaves)
+    faltando = {chave for chave in chaves if chave not in crontabs}
+    if faltando:
+        CrontabSchedule.objects.bulk_create(
+            CrontabSchedule(**dict(zip(CAMPOS_CRONTAB, chave[:5])), timezone=chave[5]) for chave in faltando
+        )
+        crontabs = _carregar_crontabs(chaves)
+    return crontabs
+
+
+def aplicar_diferencas(diferencas):
+    # Grava as diferenças em lote e em uma única transação. As operações em lote não disparam os
+    # signals do django-celery-beat, então o beat é avisado uma vez no final.
+    with transaction.atomic():
+        chaves = [desejado['crontab'] for _, desejado in diferencas['criar'] + diferencas['atualizar'] if desejado['crontab']]
+        crontabs = obter_crontabs(chaves) if chaves else {}
+
+        PeriodicTask.objects.bulk_create(
+            PeriodicTask(
+                name=nome,
+                task=desejado['task'],
+                crontab=crontabs[desejado['crontab']],
+                args=desejado['args'],
+                enabled=desejado['enabled'],
+                description=desejado['description'],
+            )
+            for nome, desejado in diferencas['criar']
+        )
+
+        tarefas = []
+        for tarefa, desejado in diferencas['atualizar']:
+            if desejado['crontab']:
+                tarefa.crontab = crontabs[desejado['crontab']]
+            tarefa.task = desejado['task']
+            tarefa.args = desejado['args']
+            tarefa.enabled = desejado['enabled']
+            tarefa.description = desejado['description']
+            if not tarefa.enabled:
+                # Mesmo comportamento do PeriodicTask.save()
+                tarefa.last_run_at = None
+            tarefas.append(tarefa)
+        PeriodicTask.objects.bulk_update(tarefas, ['crontab', 'task', 'args', 'enabled', 'description', 'last_run_at'], batch_size=500)
+
+        if diferencas['remover']:
+            PeriodicTask.objects.filter(pk__in=[tarefa.pk for tarefa in diferencas['remover']]).delete()
+
+        if diferencas['criar'] or diferencas['atualizar'] or diferencas['remover']:
+            PeriodicTasks.update_changed()
+
+
+def _mesmo_horario(crontab, campos):
+    # As versões anteriores gravavam os campos sem normalizar (ex: hour='03')
+    def normalizar(valor):
+        valor = str(valor).strip()
+        return str(int(valor)) if valor.isdigit() else valor
+    return all(normalizar(getattr(crontab, campo)) == normalizar(campos[campo]) for campo in CAMPOS_CRONTAB)
+
+
+def tarefas_antigas(agendamento):
+    # PeriodicTasks criadas com os nomes antigos para este agendamento: mesma configuração (args) e
+    # mesmo nome ou horário. Se a configuração só tem este agendamento, todas as dela.
+    # Uma única consulta quando não há tarefas antigas da configuração (o caso comum)
+    config_id = agendamento.configuracao_id
+    prefixos = Q()
+    for prefixo in PREFIXOS_ANTIGOS:
+        prefixos |= Q(name__startswith=prefixo)
+
+    candidatas = []
+    for tarefa in PeriodicTask.objects.filter(prefixos, task__in=TAREFAS_ANTIGAS).select_related('crontab'):
+        try:
+            args = json.loads(tarefa.args or '[]')
+        except ValueError:
+            continue
+        if args == [config_id]:
+            candidatas.append(tarefa)
+    if not candidatas:
+        return []
+
+    config = agendamento.configuracao
+    try:
+        campos = interpretar_horario(agendamento.horario)
+    except ValueError:
+        campos = None
+
+    nomes = {f"Backup: {config.projeto.nome} ({agendamento.horario})"}
+    if campos and campos['hour'].isdigit() and campos['minute'].isdigit():
+        nomes.add(f"Backup | {config.projeto.nome} | {config.id} | {int(campos['hour']):02d}:{int(campos['minute']):02d}")
+    unico = not AgendamentoBackup.objects.filter(configuracao_id=config_id).exclude(pk=agendamento.pk).exists()
+
+    return [
+        tarefa for tarefa in candidatas
+        if unico or tarefa.name in nomes or (campos and tarefa.crontab and _mesmo_horario(tarefa.crontab, campos))
+    ]
+
+
+def sincronizar_agendamento(agendamento):
+    # Reconcilia a PeriodicTask de um único agendamento (usado pelo signal do AgendamentoBackup).
+    # Só grava quando o agendamento efetivo mudou: cada gravação de PeriodicTask faz o beat
+    # (DatabaseScheduler) recarregar todos os agendamentos.
+    # A tarefa com o nome antigo do agendamento é removida para não executar junto com a nova.
+    antigas = tarefas_antigas(agendamento)
+    if antigas:
+        PeriodicTask.objects.filter(pk__in=[tarefa.pk for tarefa in antigas]).delete()
+
+    nome = nome_tarefa(agendamento.id)
+    tarefa = PeriodicTask.objects.filter(name=nome).select_related('crontab').first()
+    atual = estado_atual(tarefa) if tarefa else None
+
+    try:
+        desejado = estado_desejado(agendamento, timezone.get_current_timezone_name())
+    except ValueError:
+        if tarefa is None or not tarefa.enabled:
+            raise
+        # Horário inválido: a tarefa existente não pode continuar com o horário antigo
+        desejado = dict(atual, enabled=False)
+
+    if desejado == atual:
+        return tarefa
+
+    if tarefa is None:
+        tarefa = PeriodicTask(name=nome)
+    if desejado['crontab'] != (atual or {}).get('crontab'):
+        tarefa.crontab = obter_crontabs([desejado['crontab']])[desejado['crontab']]
+    tarefa.task = desejado['task']
+    tarefa.args = desejado['args']
+    tarefa.enabled = desejado['enabled']
+    tarefa.description = desejado['description']
+    tarefa.save()
+    return tarefa
+
+
+def remover_tarefa_agendamento(agendamento_id):
+    PeriodicTask.objects.filter(name=nome_tarefa(agendamento_id)).delete()
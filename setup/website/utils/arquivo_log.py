@@ -0,0 +1,143 @@
+import os
+import json
+import gzip
+import time
+import zlib
+
+from django.conf import settings
+from django.utils.timezone import now
+
+LINHAS_POR_BLOCO = 1000
+
+
+def pasta_logs():
+    return str(getattr(settings, 'BACKUP_PASTA_LOGS', os.path.join(settings.BASE_DIR, 'logs_execucoes')))
+
+
+def caminho_log_execucao(execucao):
+    return os.path.join(pasta_logs(), f"execucao_{execucao.id}.ndjson.gz")
+
+
+def log_na_pasta_logs(caminho):
+    # O caminho gravado na execução só é lido/removido se estiver dentro de BACKUP_PASTA_LOGS
+    # (links simbólicos resolvidos), para não expor nem apagar outros arquivos do servidor
+    if not caminho:
+        return False
+    pasta = os.path.realpath(pasta_logs())
+    return os.path.commonpath([pasta, os.path.realpath(caminho)]) == pasta
+
+
+def caminho_indice(caminho):
+    return f"{caminho}.idx"
+
+
+def carregar_indice(caminho):
+    # Índice: {'total_linhas': N, 'tamanho': bytes gravados, 'blocos': [[linha inicial, offset], ...]}
+    try:
+        with open(caminho_indice(caminho), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'total_linhas': 0, 'tamanho': 0, 'blocos': []}
+
+
+# Log detalhado de uma execução gravado em arquivo: uma linha JSON por registro, comprimido em
+# blocos de até LINHAS_POR_BLOCO linhas. Cada bloco é um membro gzip independente, então o
+# arquivo inteiro continua legível com zcat e o índice (offset de cada bloco) permite ler
+# qualquer página descomprimindo só o bloco onde ela começa.
+class ArquivoLogExecucao:
+
+    def __init__(self, caminho, linhas_por_bloco=LINHAS_POR_BLOCO, intervalo=5.0):
+        self.caminho = caminho
+        self.linhas_por_bloco = linhas_por_bloco
+        self.intervalo = intervalo
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+
+        # Em uma retentativa da mesma execução o arquivo continua de onde parou. Um bloco que
+        # ficou pela metade (processo morto durante a escrita) e não entrou no índice é descartado.
+        self.indice = carregar_indice(caminho)
+        self._arquivo = open(caminho, 'ab')
+        if self._arquivo.tell() != self.indice['tamanho']:
+            self._arquivo.truncate(self.indice['tamanho'])
+            self._arquivo.seek(self.indice['tamanho'])
+        self._linhas = []
+        self._ultima_gravacao = time.monotonic()
+
+    def registrar(self, tipo, mensagem):
+        linha = {'data': now().isoformat(), 'tipo': tipo, 'mensagem': mensagem}
+        self._linhas.append(json.dumps(linha, ensure_ascii=False).encode('utf-8') + b'\n')
+        if len(self._linhas) >= self.linhas_por_bloco or time.monotonic() - self._ultima_gravacao >= self.intervalo:
+            self.gravar()
+
+    def gravar(self):
+        # Fecha o bloco atual como um membro gzip e atualiza o índice
+        if self._linhas and self._arquivo is not None:
+            offset = self._arquivo.tell()
+            self._arquivo.write(gzip.compress(b''.join(self._linhas), compresslevel=6))
+            self._arquivo.flush()
+            self.indice['blocos'].append([self.indice['total_linhas'], offset])
+            self.indice['total_linhas'] += len(self._linhas)
+            self.indice['tamanho'] = self._arquivo.tell()
+            self._linhas = []
+            self._salvar_indice()
+        self._ultima_gravacao = time.monotonic()
+
+    def _salvar_indice(self):
+        temporario = f"{caminho_indice(self.caminho)}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(self.indice, f)
+        os.replace(temporario, caminho_indice(self.caminho))
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self.gravar()
+            self._arquivo.close()
+            self._arquivo = None
+
+
+def remover_log(caminho):
+    if not log_na_pasta_logs(caminho):
+        return
+    for arquivo in (caminho, caminho_indice(caminho)):
+        if os.path.exists(arquivo):
+            os.remove(arquivo)
+
+
+def _ler_bloco(f, offset):
+    # Descomprime apenas o membro gzip que começa no offset
+    f.seek(offset)
+    descompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+    dados = []
+    while not descompressor.eof:
+        parte = f.read(64 * 1024)
+        if not parte:
+            break
+        dados.append(descompressor.decompress(parte))
+    return b''.join(dados).splitlines()
+
+
+def ler_log(caminho, inicio, quantidade):
+    # Retorna (linhas [dict], total de linhas) a partir da linha inicio (0 = primeira)
+    indice = carregar_indice(caminho)
+    total = indice['total_linhas']
+    blocos = indice['blocos']
+    inicio = max(0, min(inicio, total))
+    linhas = []
+    if not blocos or quantidade <= 0:
+        return linhas, total
+
+    # Último bloco que começa antes ou na linha inicial
+    posicao = 0
+    for i, (linha_inicial, _) in enumerate(blocos):
+        if linha_inicial > inicio:
+            break
+        posicao = i
+
+    with open(caminho, 'rb') as f:
+        while posicao < len(blocos) and len(linhas) < quantidade:
+            linha_inicial, offset = blocos[posicao]
+            conteudo = _ler_bloco(f, offset)
+            pular = max(0, inicio - linha_inicial)
+            for bruta in conteudo[pular:pular + quantidade - len(linhas)]:
+                linhas.append(json.loads(bruta))
+            posicao += 1
+    return linhas, total
@@ -0,0 +1,81 @@
+import os
+import tarfile
+import subprocess
+from contextlib import nullcontext
+
+from website.utils.compressao import comando_compressor
+from website.utils.limitador import LeitorLimitado
+
+TAMANHO_BUFFER_TAR = 1024 * 1024
+
+
+# Arquivo .tar comprimido gerado em stream.
+# O tarfile escreve direto no stdin do compressor (pigz/zstd -T0 quando instalados), que grava
+# o resultado no destino. Nada é montado em disco antes e nada fica inteiro em memória.
+# O arquivo é gerado com nome temporário e só recebe o nome final em fechar().
+class ArquivoTar:
+
+    def __init__(self, caminho, compressao, limite_bytes=None, limite_arquivos=None):
+        self.caminho = caminho
+        self.limite_bytes = limite_bytes
+        self.limite_arquivos = limite_arquivos
+        self.temporario = f"{caminho}.tmp"
+        self.total_arquivos = 0
+        self.total_bytes = 0
+
+        self._saida = open(self.temporario, 'wb')
+        self._compressor = subprocess.Popen(comando_compressor(compressao), stdin=subprocess.PIPE, stdout=self._saida, stderr=subprocess.PIPE)
+        self._tar = tarfile.open(fileobj=self._compressor.stdin, mode='w|', bufsize=TAMANHO_BUFFER_TAR)
+
+    def adicionar(self, origem, rel_path):
+        # Erros ao ler os metadados ou abrir o arquivo acontecem antes de qualquer escrita no tar,
+        # então não corrompem o arquivo: são devolvidos para o chamador registrar e seguir.
+        # Erros durante a escrita são propagados, pois o stream já ficou inconsistente.
+        try:
+            tarinfo = self._tar.gettarinfo(origem, arcname=rel_path)
+            if tarinfo is None:
+                # Sockets e outros tipos que o formato tar não representa
+                return ValueError("Tipo de arquivo não suportado pelo tar")
+            conteudo = open(origem, 'rb') if tarinfo.isreg() else None
+        except OSError as e:
+            return e
+
+        with conteudo or nullcontext():
+            self.adicionar_membro(tarinfo, conteudo)
+        return None
+
+    def adicionar_membro(self, tarinfo, conteudo=None):
+        # Entrada já montada (ex.: lida de outro stream tar); conteudo só para arquivos regulares
+        if self.limite_arquivos:
+            self.limite_arquivos.consumir()
+        self._tar.addfile(tarinfo, LeitorLimitado(conteudo, self.limite_bytes) if conteudo and self.limite_bytes else conteudo)
+
+        if tarinfo.isreg():
+            self.total_arquivos += 1
+            self.total_bytes += tarinfo.size
+
+    def fechar(self):
+        self._tar.close()
+        self._compressor.stdin.close()
+        erro = self._compressor.stderr.read()
+        self._compressor.wait()
+        self._saida.close()
+
+        if self._compressor.returncode != 0:
+            os.remove(self.temporario)
+            raise Exception(f"Erro ao comprimir o arquivo de backup: {erro.decode(errors='replace')}")
+
+        os.replace(self.temporario, self.caminho)
+        return self.caminho
+
+    def abortar(self):
+        # Descarta o arquivo parcial em caso de erro
+        try:
+            self._compressor.stdin.close()
+        except OSError:
+            pass
+        self._compressor.kill()
+        self._compressor.wait()
+        self._saida.close()
+        if os.path.exists(self.temporario):
+            os.remove(self.temporario)
@@ -0,0 +1,83 @@
+import os
+import json
+import time
+
+from website.utils.manifesto import Manifesto
+
+
+def caminho_checkpoint(config):
+    # Um checkpoint por configuração, na raiz do destino configurado
+    return os.path.join(config.destino_backup, f".backup_checkpoint_{config.id}.jsonl")
+
+
+# Diário (journal) dos arquivos já concluídos em uma execução do executar_backup.
+# A primeira linha é um cabeçalho com a execução, o modo e a pasta de destino; as demais são
+# os arquivos concluídos (caminho, tamanho, mtime, inode e hash), no mesmo formato do manifesto.
+# Se a execução falhar, a próxima tentativa (retry do Celery ou execução manual) lê o diário e
+# pula os arquivos que já estão no destino e não mudaram na origem.
+class Checkpoint:
+
+    def __init__(self, caminho, intervalo=5.0, tamanho_lote=1000):
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self.tamanho_lote = tamanho_lote
+        self._arquivo = None
+        self._pendentes = 0
+        self._ultima_gravacao = time.monotonic()
+
+    def carregar(self):
+        # Retorna (cabecalho, Manifesto com os arquivos concluídos) ou (None, Manifesto vazio)
+        if not os.path.exists(self.caminho):
+            return None, Manifesto()
+
+        cabecalho = None
+        entradas = {}
+        with open(self.caminho, 'r', encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    item = json.loads(linha)
+                except ValueError:
+                    # Última linha pode ter ficado pela metade se o processo morreu durante a escrita
+                    continue
+                if cabecalho is None:
+                    cabecalho = item
+                    continue
+                entradas[item['caminho']] = (item['tamanho'], item['mtime'], item['inode'], item.get('hash'))
+        return cabecalho, Manifesto(entradas)
+
+    def iniciar(self, cabecalho, retomar=False):
+        # Ao retomar, continua o diário existente; senão começa um novo com o cabeçalho
+        if retomar:
+            self._arquivo = open(self.caminho, 'a', encoding='utf-8')
+        else:
+            self._arquivo = open(self.caminho, 'w', encoding='utf-8')
+            self._arquivo.write(json.dumps(cabecalho) + '\n')
+            self._arquivo.flush()
+
+    def registrar(self, rel_path, stat, hash_arquivo=None):
+        item = {'caminho': rel_path, 'tamanho': stat.st_size, 'mtime': stat.st_mtime_ns, 'inode': stat.st_ino}
+        if hash_arquivo:
+            item['hash'] = hash_arquivo
+        self._arquivo.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+        # O flush é feito em lotes: perder as últimas linhas só faz esses arquivos serem copiados de novo
+        self._pendentes += 1
+        if self._pendentes >= self.tamanho_lote or time.monotonic() - self._ultima_gravacao >= self.intervalo:
+            self.gravar()
+
+    def gravar(self):
+        if self._arquivo is not None:
+            self._arquivo.flush()
+        self._pendentes = 0
+        self._ultima_gravacao = time.monotonic()
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    def remover(self):
+        # Chamado quando a execução termina: o manifesto passa a ter o estado do backup
+        self.fechar()
+        if os.path.exists(self.caminho):
+            os.remove(self.caminho)
@@ -0,0 +1,23 @@
+import shutil
+
+EXTENSOES = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+def comando_compressor(formato, nivel=None):
+    # Retorna o comando que comprime o stdin para o stdout, dando preferência às versões
+    # multi-thread (pigz e zstd -T0) quando estão instaladas.
+    if formato == 'zstd':
+        if not shutil.which('zstd'):
+            raise Exception("Compressão zstd selecionada, mas o comando 'zstd' não está instalado")
+        comando = ['zstd', '-q', '-c', '-T0']
+    elif formato == 'gzip':
+        comando = ['pigz', '-c'] if shutil.which('pigz') else ['gzip', '-c']
+    else:
+        raise ValueError(f"Formato de compressão inválido: {formato}")
+
+    if nivel:
+        comando.append(f'-{nivel}')
+    return comando
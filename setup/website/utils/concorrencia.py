@@ -0,0 +1,83 @@
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils.timezone import now
+
+from setup.models import LimiteConcorrencia, ReservaConcorrencia
+
+
+def chaves_concorrencia(config):
+    # Limites que se aplicam à configuração: o destino e, quando a origem é remota, o host
+    chaves = []
+    if config.destino_backup:
+        chaves.append(('destino', os.path.normpath(config.destino_backup), getattr(settings, 'BACKUP_LIMITE_DESTINO', 1)))
+    if config.ssh_ip:
+        chaves.append(('host', config.ssh_ip, getattr(settings, 'BACKUP_LIMITE_HOST', 2)))
+    return chaves
+
+
+def reservar_vagas(config, tarefa_id=None):
+    # Tenta ocupar uma vaga em cada limite da configuração, tudo ou nada.
+    # Retorna (ReservaVagas, None) ou (None, limite sem vaga).
+    duracao = timedelta(seconds=getattr(settings, 'BACKUP_DURACAO_RESERVA', 600))
+
+    # Os limites são criados na primeira execução com o valor padrão dos settings
+    ids = []
+    for tipo, chave, padrao in chaves_concorrencia(config):
+        limite, _ = LimiteConcorrencia.objects.get_or_create(tipo=tipo, chave=chave, defaults={'max_simultaneos': padrao})
+        ids.append(limite.pk)
+
+    with transaction.atomic():
+        # Trava as linhas dos limites (sempre na mesma ordem) para que duas tarefas não peguem a última vaga
+        limites = list(LimiteConcorrencia.objects.select_for_update().filter(pk__in=ids, ativo=True).order_by('pk'))
+        agora = now()
+        ReservaConcorrencia.objects.filter(limite__in=limites, expira_em__lt=agora).delete()
+        ocupadas = dict(
+            ReservaConcorrencia.objects.filter(limite__in=limites)
+            .values('limite').annotate(total=Count('id')).values_list('limite', 'total')
+        )
+        for limite in limites:
+            if ocupadas.get(limite.pk, 0) >= limite.max_simultaneos:
+                return None, limite
+
+        reservas = ReservaConcorrencia.objects.bulk_create(
+            ReservaConcorrencia(limite=limite, configuracao=config, tarefa_id=tarefa_id, data_inicio=agora, expira_em=agora + duracao)
+            for limite in limites
+        )
+
+    return ReservaVagas([reserva.pk for reserva in reservas], duracao), None
+
+
+# Vagas ocupadas por uma execução. Enquanto o backup roda, uma thread renova a validade das
+# reservas; se o worker morrer, elas expiram sozinhas e liberam a vaga.
+class ReservaVagas:
+
+    def __init__(self, ids, duracao):
+        self.ids = ids
+        self.duracao = duracao
+        self._parar = threading.Event()
+        self._thread = None
+        if ids:
+            self._thread = threading.Thread(target=self._renovar, name='backup-reserva', daemon=True)
+            self._thread.start()
+
+    def _renovar(self):
+        try:
+            while not self._parar.wait(self.duracao.total_seconds() / 3):
+                ReservaConcorrencia.objects.filter(pk__in=self.ids).update(expira_em=now() + self.duracao)
+        finally:
+            # A thread tem a sua própria conexão com o banco
+            connection.close()
+
+    def liberar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.ids:
+            ReservaConcorrencia.objects.filter(pk__in=self.ids).delete()
+            self.ids = []
@@ -0,0 +1,356 @@
+import os
+import uuid
+import errno
+import fcntl
+import shutil
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+
+from website.utils.integridade import calcular_hash
+
+# Com limite de banda a cópia é feita em blocos menores, para a taxa ficar uniforme
+TAMANHO_BLOCO_LIMITADO = 256 * 1024
+TAMANHO_BLOCO_KERNEL = 64 * 1024 * 1024
+TAMANHO_BLOCO_BUFFER = 1024 * 1024
+
+# ioctl(FICLONE) do Linux (fcntl.FICLONE só existe a partir do Python 3.12)
+FICLONE = getattr(fcntl, 'FICLONE', 0x40049409)
+
+# Erros que indicam que o mecanismo não é suportado para o par de filesystems
+# (e não um erro de leitura/escrita): a cópia segue para o próximo mecanismo
+ERROS_SEM_SUPORTE = {errno.EOPNOTSUPP, errno.ENOTSUP, errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.ENOTTY}
+
+# Mecanismos que já falharam por falta de suporte, por (dispositivo da origem, dispositivo do
+# destino), para não tentar de novo a cada arquivo
+_indisponiveis = {}
+
+
+def copiar_arquivo(origem, destino, limite_bytes=None):
+    # Copia o conteúdo e os metadados (permissões e datas) e devolve (tamanho copiado, mecanismo).
+    # A cópia é feita em um arquivo temporário na mesma pasta e depois renomeada: um arquivo
+    # do destino nunca fica pela metade e, se ele for um hardlink (ex: snapshot anterior),
+    # o link é substituído em vez de o conteúdo compartilhado ser sobrescrito.
+    temporario = _caminho_temporario(destino)
+    try:
+        with open(origem, 'rb', buffering=0) as f_origem, open(temporario, 'wb', buffering=0) as f_destino:
+            st = os.fstat(f_origem.fileno())
+            chave = (st.st_dev, os.fstat(f_destino.fileno()).st_dev)
+            # Menos blocos alocados que o tamanho aparente: o arquivo tem buracos (VM, banco de dados...)
+            esparso = st.st_blocks * 512 < st.st_size
+            metodo = _copiar_conteudo(f_origem.fileno(), f_destino.fileno(), st.st_size, chave, limite_bytes, esparso)
+        shutil.copystat(origem, temporario)
+        os.replace(temporario, destino)
+    except BaseException:
+        if os.path.lexists(temporario):
+            os.remove(temporario)
+        raise
+    return st.st_size, metodo
+
+
+def _copiar_conteudo(fd_origem, fd_destino, tamanho, chave, limite_bytes, esparso=False):
+    # Usa o mecanismo mais rápido disponível, nesta ordem:
+    #   reflink         - FICLONE (btrfs, XFS): o destino compartilha os blocos da origem, sem copiar dados
+    #   esparso         - só para arquivos com buracos: copia apenas os trechos com dados
+    #   copy_file_range - cópia dentro do kernel (e server-side em NFS/CIFS)
+    #   sendfile        - também sem passar os dados pelo Python
+    #   buffer          - leitura/escrita com buffer grande
+    # Cada mecanismo devolve quantos bytes copiou. Alguns filesystems (procfs, FUSE, NFS antigos)
+    # aceitam copy_file_range/sendfile mas devolvem 0 logo no início: o mecanismo vai para
+    # a lista de indisponíveis do par de dispositivos. Uma cópia menor que o tamanho também passa
+    # para o próximo mecanismo, que grava o arquivo do zero.
+    # Retorna o nome do mecanismo usado (None para arquivos vazios)
+    if tamanho == 0:
+        return None
+
+    indisponiveis = _indisponiveis.setdefault(chave, set())
+    for metodo, funcao in _MECANISMOS:
+        if metodo in indisponiveis or (metodo == 'esparso' and not esparso):
+            continue
+        try:
+            copiados = funcao(fd_origem, fd_destino, limite_bytes)
+        except OSError as e:
+            if e.errno not in ERROS_SEM_SUPORTE:
+                raise
+            indisponiveis.add(metodo)
+        else:
+            if copiados >= tamanho:
+                return metodo
+            if copiados == 0:
+                indisponiveis.add(metodo)
+        # Descarta o que o mecanismo tenha gravado antes de falhar
+        os.ftruncate(fd_destino, 0)
+        os.lseek(fd_destino, 0, os.SEEK_SET)
+        os.lseek(fd_origem, 0, os.SEEK_SET)
+
+    _copiar_buffer(fd_origem, fd_destino, limite_bytes)
+    return 'buffer'
+
+
+def _copiar_reflink(fd_origem, fd_destino, limite_bytes):
+    # Não lê nem grava dados, então não passa pelo limite de banda
+    fcntl.ioctl(fd_destino, FICLONE, fd_origem)
+    return os.fstat(fd_destino).st_size
+
+
+def _copiar_esparso(fd_origem, fd_destino, limite_bytes):
+    # Percorre os trechos com dados (SEEK_DATA/SEEK_HOLE) e copia cada um na mesma posição do
+    # destino; os buracos ficam sem blocos alocados. O ftruncate final fixa o tamanho quando o
+    # arquivo termina em um buraco.
+    tamanho = os.fstat(fd_origem).st_size
+    posicao = 0
+    while posicao < tamanho:
+        try:
+            inicio = os.lseek(fd_origem, posicao, os.SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                # Não há mais dados até o fim do arquivo
+                break
+            raise
+        fim = os.lseek(fd_origem, inicio, os.SEEK_HOLE)
+        copiado_ate = _copiar_trecho(fd_origem, fd_destino, inicio, fim, limite_bytes)
+        if copiado_ate < fim:
+            # Arquivo diminuiu durante a cópia
+            return copiado_ate
+        posicao = fim
+    os.ftruncate(fd_destino, tamanho)
+    return tamanho
+
+
+def _copiar_trecho(fd_origem, fd_destino, inicio, fim, limite_bytes):
+    # copy_file_range com offsets explícitos; sem suporte (ou se ele devolver 0 antes do fim),
+    # pread/pwrite na mesma posição. Retorna a posição até onde o trecho foi copiado.
+    bloco = TAMANHO_BLOCO_LIMITADO if limite_bytes else TAMANHO_BLOCO_BUFFER
+    usar_kernel = hasattr(os, 'copy_file_range')
+    posicao = inicio
+    while posicao < fim:
+        tamanho = min(bloco, fim - posicao)
+        if usar_kernel:
+            try:
+                copiados = os.copy_file_range(fd_origem, fd_destino, tamanho, posicao, posicao)
+            except OSError as e:
+                if e.errno not in ERROS_SEM_SUPORTE:
+                    raise
+                usar_kernel = False
+                continue
+            if not copiados:
+                usar_kernel = False
+                continue
+        else:
+            dados = os.pread(fd_origem, tamanho, posicao)
+            copiados = len(dados)
+            gravados = 0
+            while gravados < copiados:
+                gravados += os.pwrite(fd_destino, dados[gravados:], posicao + gravados)
+        if not copiados:
+            break
+        if limite_bytes:
+            limite_bytes.consumir(copiados)
+        posicao += copiados
+    return posicao
+
+
+def _copiar_copy_file_range(fd_origem, fd_destino, limite_bytes):
+    if not hasattr(os, 'copy_file_range'):
+        raise OSError(errno.ENOSYS, 'copy_file_range indisponível')
+    bloco = TAMANHO_BLOCO_LIMITADO if limite_bytes else TAMANHO_BLOCO_KERNEL
+    total = 0
+    while True:
+        copiados = os.copy_file_range(fd_origem, fd_destino, bloco)
+        if not copiados:
+            break
+        total += copiados
+        if limite_bytes:
+            limite_bytes.consumir(copiados)
+    return total
+
+
+def _copiar_sendfile(fd_origem, fd_destino, limite_bytes):
+    bloco = TAMANHO_BLOCO_LIMITADO if limite_bytes else TAMANHO_BLOCO_KERNEL
+    offset = 0
+    while True:
+        copiados = os.sendfile(fd_destino, fd_origem, offset, bloco)
+        if not copiados:
+            break
+        offset += copiados
+        if limite_bytes:
+            limite_bytes.consumir(copiados)
+    return offset
+
+
+def _copiar_buffer(fd_origem, fd_destino, limite_bytes):
+    buffer = bytearray(TAMANHO_BLOCO_LIMITADO if limite_bytes else TAMANHO_BLOCO_BUFFER)
+    visao = memoryview(buffer)
+    total = 0
+    while True:
+        lidos = os.readv(fd_origem, [buffer])
+        if not lidos:
+            break
+        if limite_bytes:
+            limite_bytes.consumir(lidos)
+        gravados = 0
+        while gravados < lidos:
+            gravados += os.write(fd_destino, visao[gravados:lidos])
+        total += lidos
+    return total
+
+
+_MECANISMOS = (
+    ('reflink', _copiar_reflink),
+    ('esparso', _copiar_esparso),
+    ('copy_file_range', _copiar_copy_file_range),
+    ('sendfile', _copiar_sendfile),
+)
+
+
+def _caminho_temporario(destino):
+    pasta, nome = os.path.split(destino)
+    return os.path.join(pasta, f".{nome}.{uuid.uuid4().hex[:8]}.tmp")
+
+
+def _processar_arquivo(origem, destino, hash_esperado, gerar_hash, base, limite_bytes=None):
+    # Quando há um hash anterior, só copia se o conteúdo mudou de fato.
+    # Retorna (copiado, tamanho, hash, mecanismo de cópia)
+    hash_origem = None
+    if gerar_hash or hash_esperado:
+        hash_origem = calcular_hash(origem, limitador=limite_bytes)
+        if hash_esperado and hash_origem == hash_esperado:
+            return _manter_arquivo(origem, destino, base, hash_origem, limite_bytes)
+
+    tamanho, metodo = copiar_arquivo(origem, destino, limite_bytes)
+    return True, tamanho, hash_origem, metodo
+
+
+def _manter_arquivo(origem, destino, base, hash_arquivo, limite_bytes=None):
+    # Arquivo sem alteração. No modo snapshot vira um hardlink para a mesma versão no
+    # snapshot anterior (base); se o link não for possível (outro filesystem, limite de
+    # links, arquivo apagado do snapshot anterior) cai para uma cópia normal.
+    if base is None:
+        return False, os.stat(origem).st_size, hash_arquivo, None
+
+    try:
+        criar_hardlink(base, destino)
+    except OSError:
+        tamanho, metodo = copiar_arquivo(origem, destino, limite_bytes)
+        return True, tamanho, hash_arquivo, metodo
+    return False, os.stat(destino).st_size, hash_arquivo, None
+
+
+def criar_hardlink(alvo, destino):
+    try:
+        os.link(alvo, destino)
+    except FileExistsError:
+        # Retomada de uma execução ou espelho já atualizado: o arquivo já pode estar no destino
+        if not os.path.samefile(alvo, destino):
+            os.remove(destino)
+            os.link(alvo, destino)
+
+
+# Motor de cópia usado pelo executar_backup.
+# A criação de pastas é feita na thread de quem chama, na ordem do walk, então a pasta
+# sempre existe antes de qualquer arquivo dela entrar no pool. Os arquivos são copiados
+# em paralelo e os erros são guardados por arquivo, sem interromper o restante da cópia.
+# limite_bytes / limite_arquivos (BaldeTokens) limitam a taxa somada de todas as threads.
+class MotorCopia:
+
+    def __init__(self, workers=4, max_pendentes=None, ao_copiar=None, ao_manter=None, ao_falhar=None, limite_bytes=None, limite_arquivos=None):
+        self.workers = max(1, int(workers or 1))
+        self.limite_bytes = limite_bytes
+        self.limite_arquivos = limite_arquivos
+        # Limita quantas cópias ficam aguardando no pool para não acumular futures em memória
+        self.max_pendentes = max_pendentes or self.workers * 4
+        self.ao_copiar = ao_copiar
+        self.ao_manter = ao_manter
+        self.ao_falhar = ao_falhar
+
+        self.erros = []
+        self.total_copiados = 0
+        self.total_bytes = 0
+        self.total_mantidos = 0
+        # Arquivos copiados por mecanismo (reflink, copy_file_range, sendfile, buffer)
+        self.metodos = {}
+
+        self._pendentes = {}
+        self._executor = None
+        if self.workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='backup-copia')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def criar_diretorio(self, caminho):
+        os.makedirs(caminho, exist_ok=True)
+
+    def copiar(self, origem, destino, rel_path, hash_esperado=None, gerar_hash=False, base=None):
+        # hash_esperado: hash do backup anterior; se o conteúdo for o mesmo o arquivo não é copiado
+        # gerar_hash: calcula o hash da origem para ser guardado no manifesto
+        # base: versão do arquivo no snapshot anterior, usada para o hardlink quando não mudou
+        self._submeter(rel_path, _processar_arquivo, origem, destino, hash_esperado, gerar_hash, base, self.limite_bytes)
+
+    def manter(self, origem, destino, rel_path, base, hash_arquivo=None):
+        # Arquivo já sabidamente sem alteração: cria o hardlink a partir do snapshot anterior
+        self._submeter(rel_path, _manter_arquivo, origem, destino, base, hash_arquivo, self.limite_bytes)
+
+    def _submeter(self, rel_path, funcao, *args):
+        if self.limite_arquivos:
+            # Espera na thread de quem chama: a varredura da origem também fica mais lenta
+            self.limite_arquivos.consumir()
+        if self._executor is None:
+            # Com apenas 1 worker executa direto, sem passar pelo pool
+            try:
+                resultado = funcao(*args)
+            except Exception as e:
+                self._registrar_erro(rel_path, e)
+            else:
+                self._registrar_resultado(rel_path, resultado)
+            return
+
+        future = self._executor.submit(funcao, *args)
+        self._pendentes[future] = rel_path
+
+        if len(self._pendentes) >= self.max_pendentes:
+            self._coletar(FIRST_COMPLETED)
+
+    def aguardar(self):
+        # Espera todas as cópias pendentes e devolve a lista de erros [(rel_path, mensagem)]
+        if self._pendentes:
+            self._coletar(ALL_COMPLETED)
+        return self.erros
+
+    def fechar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _coletar(self, return_when):
+        concluidos, _ = wait(self._pendentes, return_when=return_when)
+        for future in concluidos:
+            rel_path = self._pendentes.pop(future)
+            erro = future.exception()
+            if erro is not None:
+                self._registrar_erro(rel_path, erro)
+            else:
+                self._registrar_resultado(rel_path, future.result())
+
+    # Os callbacks rodam sempre na thread de quem chama (nunca nas threads do pool),
+    # então podem usar o ORM normalmente.
+    def _registrar_resultado(self, rel_path, resultado):
+        copiado, tamanho, hash_arquivo, metodo = resultado
+        if not copiado:
+            self.total_mantidos += 1
+            if self.ao_manter:
+                self.ao_manter(rel_path, tamanho, hash_arquivo)
+            return
+
+        self.total_copiados += 1
+        self.total_bytes += tamanho
+        if metodo:
+            self.metodos[metodo] = self.metodos.get(metodo, 0) + 1
+        if self.ao_copiar:
+            self.ao_copiar(rel_path, tamanho, hash_arquivo)
+
+    def _registrar_erro(self, rel_path, erro):
+        self.erros.append((rel_path, str(erro)))
+        if self.ao_falhar:
+            self.ao_falhar(rel_path, erro)
@@ -0,0 +1,79 @@
+import re
+
+
+def _traduzir_padrao(padrao):
+    # Converte um padrão no estilo .gitignore em uma expressão regular para o caminho relativo:
+    #   *  -> qualquer coisa dentro de um nível de pasta
+    #   ** -> qualquer quantidade de pastas
+    #   ?  -> um caractere
+    #   [] -> classe de caracteres
+    # Padrões com "/" no início ou no meio são ancorados na raiz da origem; sem "/" valem em
+    # qualquer nível (ex: "node_modules" ignora todas as pastas com esse nome).
+    ancorado = padrao.startswith('/') or '/' in padrao.strip('/')
+    padrao = padrao.strip('/')
+
+    regex = ''
+    i = 0
+    while i < len(padrao):
+        c = padrao[i]
+        if c == '*':
+            if padrao[i:i + 3] == '**/':
+                regex += '(?:.*/)?'
+                i += 3
+                continue
+            if padrao[i:i + 2] == '**':
+                regex += '.*'
+                i += 2
+                continue
+            regex += '[^/]*'
+        elif c == '?':
+            regex += '[^/]'
+        elif c == '[':
+            fim = padrao.find(']', i + 1)
+            if fim == -1:
+                regex += re.escape(c)
+            else:
+                classe = padrao[i + 1:fim]
+                if classe.startswith('!'):
+                    classe = '^' + classe[1:]
+                regex += f'[{classe}]'
+                i = fim
+        else:
+            regex += re.escape(c)
+        i += 1
+
+    if not ancorado:
+        regex = '(?:.*/)?' + regex
+    return regex
+
+
+# Filtro dos caminhos ignorados de uma configuração (ArquivoIgnorado).
+# Os padrões são compilados uma única vez por execução em duas expressões regulares: uma para
+# padrões que valem para arquivos e pastas e outra para os que terminam com "/" (só pastas).
+# Uma pasta ignorada deve ser removida da varredura, então o conteúdo dela nunca é visitado.
+class FiltroIgnorados:
+
+    def __init__(self, padroes):
+        geral = []
+        pastas = []
+        for padrao in padroes:
+            padrao = (padrao or '').strip()
+            if not padrao or padrao.startswith('#'):
+                continue
+            if padrao.endswith('/'):
+                pastas.append(_traduzir_padrao(padrao))
+            else:
+                geral.append(_traduzir_padrao(padrao))
+
+        self._geral = re.compile('|'.join(f'(?:{r})' for r in geral)) if geral else None
+        self._pastas = re.compile('|'.join(f'(?:{r})' for r in pastas)) if pastas else None
+
+    def __bool__(self):
+        return self._geral is not None or self._pastas is not None
+
+    def ignorar(self, rel_path, diretorio=False):
+        if self._geral is not None and self._geral.fullmatch(rel_path):
+            return True
+        if diretorio and self._pastas is not None and self._pastas.fullmatch(rel_path):
+            return True
+        return False
@@ -0,0 +1,84 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+
+TAMANHO_BLOCO_HASH = 1024 * 1024
+
+
+def calcular_hash(caminho, tamanho_bloco=TAMANHO_BLOCO_HASH, limitador=None):
+    # Lê o arquivo em blocos reaproveitando o mesmo buffer: a memória usada não depende do
+    # tamanho do arquivo. O hashlib libera o GIL durante o update, então várias threads
+    # calculando hashes aproveitam mais de um núcleo.
+    # limitador: BaldeTokens de bytes/s, para a leitura não competir com a produção
+    digest = hashlib.sha256()
+    buffer = bytearray(tamanho_bloco)
+    visao = memoryview(buffer)
+    with open(caminho, 'rb', buffering=0) as f:
+        while True:
+            lidos = f.readinto(buffer)
+            if not lidos:
+                break
+            if limitador:
+                limitador.consumir(lidos)
+            digest.update(visao[:lidos])
+    return digest.hexdigest()
+
+
+def _verificar_par(origem, destino, hash_origem, limite_bytes):
+    if not hash_origem:
+        hash_origem = calcular_hash(origem, limitador=limite_bytes)
+    hash_destino = calcular_hash(destino, limitador=limite_bytes)
+    return hash_origem, hash_destino
+
+
+# Verificação pós-cópia: compara o hash da origem com o do destino de cada arquivo usando um
+# pool de threads. O resultado de cada arquivo é entregue (na thread de quem chama) para
+# ao_resultado(rel_path, hash_origem, hash_destino, erro).
+class VerificadorIntegridade:
+
+    def __init__(self, workers=4, ao_resultado=None, limite_bytes=None, limite_arquivos=None):
+        self.workers = max(1, int(workers or 1))
+        self.max_pendentes = self.workers * 4
+        self.ao_resultado = ao_resultado
+        self.limite_bytes = limite_bytes
+        self.limite_arquivos = limite_arquivos
+        self.total_verificados = 0
+        self.divergentes = []
+        self._pendentes = {}
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='backup-verificacao')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def verificar(self, origem, destino, rel_path, hash_origem=None):
+        # hash_origem: hash já conhecido da origem (ex: calculado na cópia), evita ler a origem de novo
+        if self.limite_arquivos:
+            self.limite_arquivos.consumir()
+        future = self._executor.submit(_verificar_par, origem, destino, hash_origem, self.limite_bytes)
+        self._pendentes[future] = rel_path
+        if len(self._pendentes) >= self.max_pendentes:
+            self._coletar(FIRST_COMPLETED)
+
+    def aguardar(self):
+        # Retorna a lista de divergências [(rel_path, mensagem)]
+        if self._pendentes:
+            self._coletar(ALL_COMPLETED)
+        return self.divergentes
+
+    def _coletar(self, return_when):
+        concluidos, _ = wait(self._pendentes, return_when=return_when)
+        for future in concluidos:
+            rel_path = self._pendentes.pop(future)
+            self.total_verificados += 1
+            erro = future.exception()
+            hash_origem = hash_destino = None
+            if erro is None:
+                hash_origem, hash_destino = future.result()
+                if hash_origem != hash_destino:
+                    self.divergentes.append((rel_path, "hash do destino diferente da origem"))
+            else:
+                self.divergentes.append((rel_path, str(erro)))
+            if self.ao_resultado:
+                self.ao_resultado(rel_path, hash_origem, hash_destino, erro)
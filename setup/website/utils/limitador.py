@@ -0,0 +1,96 @@
+import time
+import logging
+import threading
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+
+# Balde de tokens (token bucket) compartilhado pelas threads de uma execução: limita a taxa
+# somada de todas as cópias em paralelo. O balde enche `taxa` tokens por segundo até
+# `capacidade` (rajada de 1s por padrão). Um consumo maior que o saldo deixa o balde negativo
+# e a thread dorme o tempo necessário para pagar a diferença, então blocos grandes também
+# respeitam a taxa média.
+class BaldeTokens:
+
+    def __init__(self, taxa, capacidade=None):
+        self.taxa = float(taxa)
+        self.capacidade = float(capacidade or taxa)
+        self._tokens = self.capacidade
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consumir(self, quantidade=1):
+        with self._lock:
+            agora = time.monotonic()
+            self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+            self._ultimo = agora
+            self._tokens -= quantidade
+            espera = -self._tokens / self.taxa if self._tokens < 0 else 0
+        if espera > 0:
+            time.sleep(espera)
+
+
+def criar_limitadores(config):
+    # Retorna (limite de bytes/s, limite de arquivos/s) da configuração; None quando sem limite
+    limite_bytes = BaldeTokens(config.limite_banda * 1024) if config.limite_banda else None
+    limite_arquivos = BaldeTokens(config.limite_arquivos) if config.limite_arquivos else None
+    return limite_bytes, limite_arquivos
+
+
+# Leitura de um arquivo passando pelo limite de bytes (usado pelo tarfile no modo arquivo)
+class LeitorLimitado:
+
+    def __init__(self, arquivo, limitador):
+        self._arquivo = arquivo
+        self._limitador = limitador
+
+    def read(self, tamanho=-1):
+        dados = self._arquivo.read(tamanho)
+        if dados:
+            self._limitador.consumir(len(dados))
+        return dados
+
+
+def _ionice(*argumentos):
+    return subprocess.run(['ionice', *argumentos], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True).stdout
+
+
+def _argumentos_classe(saida):
+    # Converte a saída do `ionice -p` ("best-effort: prio 4", "idle", "none: prio 0") nos
+    # argumentos para restaurar a mesma classe
+    classe, _, prioridade = saida.strip().partition(': prio ')
+    numero = {'none': '0', 'realtime': '1', 'best-effort': '2', 'idle': '3'}.get(classe, '0')
+    if numero in ('1', '2') and prioridade:
+        return ['-c', numero, '-n', prioridade]
+    return ['-c', numero]
+
+
+# Classe de E/S idle (ionice -c3) para a thread da tarefa. As threads do pool de cópia e os
+# processos filhos (rsync, pg_dump, tar, compressor) criados depois herdam a classe. O worker do
+# Celery é reaproveitado entre tarefas, então a classe anterior é restaurada no final.
+class PrioridadeIOOciosa:
+
+    def __init__(self):
+        self._tid = None
+        self._anterior = None
+
+    def aplicar(self):
+        tid = str(threading.get_native_id())
+        try:
+            anterior = _argumentos_classe(_ionice('-p', tid))
+            _ionice('-c', '3', '-p', tid)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.warning(f"Não foi possível aplicar a prioridade de disco ociosa: {e}")
+            return False
+        self._tid, self._anterior = tid, anterior
+        return True
+
+    def restaurar(self):
+        if self._tid is None:
+            return
+        try:
+            _ionice(*self._anterior, '-p', self._tid)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.warning(f"Não foi possível restaurar a prioridade de disco: {e}")
+        self._tid = None
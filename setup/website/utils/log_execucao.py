@@ -0,0 +1,80 @@
+import time
+
+from django.utils.timezone import now
+
+from setup.models import ExecucaoBackup, LogExecucaoDetalhado
+from website.utils.arquivo_log import ArquivoLogExecucao, caminho_log_execucao
+
+
+# Buffer dos logs detalhados de uma execução.
+# Em vez de um INSERT por linha, acumula os registros e grava com bulk_create quando
+# o lote enche ou quando passa o intervalo máximo desde a última gravação.
+# Os logs por arquivo (cópias, ignorados) seguem o nível configurado no backup:
+#   todos      -> grava uma linha por arquivo
+#   amostragem -> grava 1 a cada N arquivos e um resumo no final
+#   resumo     -> grava apenas o resumo no final
+#   desligado  -> não grava nada
+#   arquivo    -> grava todos os logs em um arquivo comprimido da execução (ArquivoLogExecucao)
+#                 e deixa no banco apenas os logs gerais, os erros e o resumo no final
+class LogExecucaoBuffer:
+
+    RESUMOS = {
+        'copia': "arquivo(s) copiado(s)",
+        'ignorado': "arquivo(s)/pasta(s) ignorado(s)",
+        'removido': "arquivo(s) removido(s) da origem",
+    }
+
+    def __init__(self, execucao, nivel_arquivos='todos', amostragem=100, tamanho_lote=500, intervalo=5.0):
+        self.execucao = execucao
+        self.nivel_arquivos = nivel_arquivos
+        self.amostragem = max(1, amostragem or 1)
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+
+        self.contadores = {}
+        self._registros = []
+        self._ultima_gravacao = time.monotonic()
+
+        self.arquivo = None
+        if nivel_arquivos == 'arquivo':
+            caminho = execucao.arquivo_log or caminho_log_execucao(execucao)
+            self.arquivo = ArquivoLogExecucao(caminho, intervalo=intervalo)
+            if execucao.arquivo_log != caminho:
+                execucao.arquivo_log = caminho
+                ExecucaoBackup.objects.filter(pk=execucao.pk).update(arquivo_log=caminho)
+
+    def registrar(self, tipo, mensagem):
+        if self.arquivo is not None:
+            self.arquivo.registrar(tipo, mensagem)
+        # Hora do evento, não a do bulk_create que grava o lote
+        self._registros.append(LogExecucaoDetalhado(execucao=self.execucao, timestamp=now(), tipo=tipo, mensagem=mensagem))
+        if len(self._registros) >= self.tamanho_lote or time.monotonic() - self._ultima_gravacao >= self.intervalo:
+            self.gravar()
+
+    def registrar_arquivo(self, categoria, mensagem):
+        total = self.contadores.get(categoria, 0) + 1
+        self.contadores[categoria] = total
+
+        if self.nivel_arquivos == 'todos':
+            self.registrar('info', mensagem)
+        elif self.nivel_arquivos == 'arquivo':
+            self.arquivo.registrar('info', mensagem)
+        elif self.nivel_arquivos == 'amostragem' and total % self.amostragem == 1 % self.amostragem:
+            self.registrar('info', f"{mensagem} (amostra {total})")
+
+    def gravar(self):
+        if self._registros:
+            LogExecucaoDetalhado.objects.bulk_create(self._registros, batch_size=self.tamanho_lote)
+            self._registros = []
+        self._ultima_gravacao = time.monotonic()
+
+    def fechar(self):
+        # Grava o resumo dos logs por arquivo (quando não foram todos registrados) e o que restou no buffer
+        if self.nivel_arquivos in ('amostragem', 'resumo', 'arquivo'):
+            for categoria, total in self.contadores.items():
+                descricao = self.RESUMOS.get(categoria, categoria)
+                self._registros.append(LogExecucaoDetalhado(execucao=self.execucao, tipo='info', mensagem=f"{total} {descricao}"))
+            self.contadores = {}
+        self.gravar()
+        if self.arquivo is not None:
+            self.arquivo.fechar()
@@ -0,0 +1,63 @@
+import os
+import json
+import gzip
+
+NOME_MANIFESTO = '.backup_manifesto.json.gz'
+
+
+# Manifesto de um backup: guarda tamanho, mtime, inode e (opcionalmente) o hash de cada
+# arquivo copiado. Fica gravado no próprio destino, em JSON por linha comprimido, para que
+# a próxima execução compare a origem com ele e copie apenas o que é novo ou foi alterado.
+class Manifesto:
+
+    def __init__(self, entradas=None):
+        # rel_path -> (tamanho, mtime_ns, inode, hash)
+        self.entradas = entradas or {}
+
+    def __len__(self):
+        return len(self.entradas)
+
+    def __contains__(self, rel_path):
+        return rel_path in self.entradas
+
+    @classmethod
+    def carregar(cls, caminho):
+        entradas = {}
+        if os.path.exists(caminho):
+            with gzip.open(caminho, 'rt', encoding='utf-8') as f:
+                for linha in f:
+                    item = json.loads(linha)
+                    entradas[item['caminho']] = (item['tamanho'], item['mtime'], item['inode'], item.get('hash'))
+        return cls(entradas)
+
+    def salvar(self, caminho):
+        # Grava em um arquivo temporário e troca no final, para nunca deixar um manifesto pela metade
+        temporario = f"{caminho}.tmp"
+        with gzip.open(temporario, 'wt', encoding='utf-8', compresslevel=6) as f:
+            for rel_path, (tamanho, mtime, inode, hash_arquivo) in self.entradas.items():
+                item = {'caminho': rel_path, 'tamanho': tamanho, 'mtime': mtime, 'inode': inode}
+                if hash_arquivo:
+                    item['hash'] = hash_arquivo
+                f.write(json.dumps(item, ensure_ascii=False) + '\n')
+        os.replace(temporario, caminho)
+
+    def tamanho_total(self):
+        return sum(entrada[0] for entrada in self.entradas.values())
+
+    def alterado(self, rel_path, stat):
+        entrada = self.entradas.get(rel_path)
+        if entrada is None:
+            return True
+        tamanho, mtime, inode, _ = entrada
+        return tamanho != stat.st_size or mtime != stat.st_mtime_ns or inode != stat.st_ino
+
+    def hash(self, rel_path):
+        entrada = self.entradas.get(rel_path)
+        return entrada[3] if entrada else None
+
+    def registrar(self, rel_path, stat, hash_arquivo=None):
+        self.entradas[rel_path] = (stat.st_size, stat.st_mtime_ns, stat.st_ino, hash_arquivo)
+
+    def removidos(self, vistos):
+        # Arquivos que estavam no manifesto anterior mas não apareceram na varredura atual
+        return [rel_path for rel_path in self.entradas if rel_path not in vistos]
@@ -0,0 +1,108 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime, time as horario, timedelta
+
+from django.utils import timezone
+
+from setup.models import ExecucaoBackup, ResumoDiarioProjeto
+
+
+# Tempo gasto em cada etapa de uma execução (dump, cópia, verificação...), em segundos
+class TemposEtapas:
+
+    def __init__(self):
+        self.tempos = {}
+
+    @contextmanager
+    def etapa(self, nome):
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self.tempos[nome] = round(self.tempos.get(nome, 0) + time.monotonic() - inicio, 3)
+
+
+def percentil(valores, p):
+    # Percentil com interpolação linear; valores já ordenados
+    if not valores:
+        return None
+    posicao = (len(valores) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(valores) - 1)
+    return valores[inferior] + (valores[superior] - valores[inferior]) * (posicao - inferior)
+
+
+def gerar_resumos_diarios(data_inicial, data_final):
+    # Recalcula os ResumoDiarioProjeto dos dias entre data_inicial e data_final (inclusive).
+    # Lê só as colunas necessárias das execuções do período e grava os resumos em lote.
+    fuso = timezone.get_current_timezone()
+    inicio = timezone.make_aware(datetime.combine(data_inicial, horario.min), fuso)
+    fim = timezone.make_aware(datetime.combine(data_final + timedelta(days=1), horario.min), fuso)
+
+    execucoes = (
+        ExecucaoBackup.objects
+        .filter(data_inicio__gte=inicio, data_inicio__lt=fim)
+        .exclude(status='executando')
+        .order_by('data_inicio')
+        .values_list('configuracao__projeto_id', 'data_inicio', 'status', 'duracao', 'bytes_copiados', 'bytes_sem_alteracao')
+    )
+
+    grupos = {}
+    for projeto_id, data_inicio, status, duracao, bytes_copiados, bytes_sem_alteracao in execucoes.iterator(chunk_size=2000):
+        grupo = grupos.setdefault((projeto_id, timezone.localtime(data_inicio, fuso).date()), {
+            'total': 0, 'sucesso': 0, 'falha': 0, 'duracoes': [], 'bytes': 0, 'tamanho': 0,
+        })
+        grupo['total'] += 1
+        grupo['sucesso' if status == 'sucesso' else 'falha'] += 1
+        grupo['bytes'] += bytes_copiados
+        if duracao is not None:
+            grupo['duracoes'].append(duracao.total_seconds())
+        if status == 'sucesso':
+            # As execuções estão em ordem: fica o tamanho da última com sucesso do dia
+            grupo['tamanho'] = bytes_copiados + bytes_sem_alteracao
+
+    # Tamanho do resumo anterior ao período de cada projeto, para calcular o crescimento
+    tamanhos_anteriores = {}
+    for projeto_id, tamanho in (
+        ResumoDiarioProjeto.objects
+        .filter(projeto_id__in={projeto_id for projeto_id, _ in grupos}, data__lt=data_inicial, tamanho_backup__gt=0)
+        .order_by('projeto_id', 'data')
+        .values_list('projeto_id', 'tamanho_backup')
+    ):
+        tamanhos_anteriores[projeto_id] = tamanho
+
+    resumos = []
+    for (projeto_id, data), grupo in sorted(grupos.items(), key=lambda item: item[0][1]):
+        duracoes = sorted(grupo['duracoes'])
+        tempo_total = sum(duracoes)
+        tamanho_anterior = tamanhos_anteriores.get(projeto_id)
+        crescimento = None
+        if grupo['tamanho']:
+            if tamanho_anterior is not None:
+                crescimento = grupo['tamanho'] - tamanho_anterior
+            tamanhos_anteriores[projeto_id] = grupo['tamanho']
+
+        resumos.append(ResumoDiarioProjeto(
+            projeto_id=projeto_id,
+            data=data,
+            total_execucoes=grupo['total'],
+            total_sucesso=grupo['sucesso'],
+            total_falha=grupo['falha'],
+            duracao_p50=percentil(duracoes, 50),
+            duracao_p95=percentil(duracoes, 95),
+            mb_por_segundo=grupo['bytes'] / 1024 / 1024 / tempo_total if tempo_total else None,
+            bytes_copiados=grupo['bytes'],
+            tamanho_backup=grupo['tamanho'],
+            crescimento_bytes=crescimento,
+        ))
+
+    ResumoDiarioProjeto.objects.bulk_create(
+        resumos,
+        update_conflicts=True,
+        unique_fields=['projeto', 'data'],
+        update_fields=[
+            'total_execucoes', 'total_sucesso', 'total_falha', 'duracao_p50', 'duracao_p95',
+            'mb_por_segundo', 'bytes_copiados', 'tamanho_backup', 'crescimento_bytes',
+        ],
+    )
+    return len(resumos)
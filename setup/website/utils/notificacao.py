@@ -1,10 +1,37 @@
 import requests
+from requests.adapters import HTTPAdapter
 
 from setup.models import ConfiguracaoBackup, Notificacao
 
-def enviar_email(destinatario, assunto, mensagem):
+# Timeout (conexão, leitura) em segundos para as APIs de notificação
+TIMEOUT_NOTIFICACAO = (5, 30)
+
+_sessao = None
+
+
+def erro_temporario(erro):
+    # Falhas que valem uma nova tentativa: rede, timeout, 429 (limite de envios) e erros 5xx.
+    # Os demais 4xx (token inválido, chat inexistente...) se repetiriam em todas as tentativas.
+    if isinstance(erro, (requests.ConnectionError, requests.Timeout)):
+        return True
+    resposta = getattr(erro, 'response', None)
+    return resposta is not None and (resposta.status_code == 429 or resposta.status_code >= 500)
+
+
+def obter_sessao():
+    # Sessão compartilhada pelo processo, reaproveitando as conexões HTTP (keep-alive)
+    # entre os envios em vez de abrir uma conexão nova a cada notificação
+    global _sessao
+    if _sessao is None:
+        sessao = requests.Session()
+        sessao.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        _sessao = sessao
+    return _sessao
+
+
+def enviar_email(destinatario, assunto, mensagem, levantar_erro=False):
     try:
-        response = requests.post(
+        response = obter_sessao().post(
             'https://email.besoft.com.br/api/v1/email/?sync=true',
             headers={'Authorization': 'Bearer TOKEN_API_EMAIL'},
             json={
@@ -19,30 +46,36 @@ def enviar_email(destinatario, assunto, mensagem):
                 "responderparanome": "BeSoft",
                 "assunto": assunto,
                 "conteudo": mensagem
-            }
+            },
+            timeout=TIMEOUT_NOTIFICACAO,
         )
         response.raise_for_status()
         return True
     except Exception as e:
         print(f"Erro ao enviar email: {e}")
+        if levantar_erro:
+            raise
         return False
 
 
-def enviar_telegram(chat_id, mensagem):
+def enviar_telegram(chat_id, mensagem, levantar_erro=False):
     token_bot = "BOT_TOKEN_TELEGRAM"
     try:
-        response = requests.post(
+        response = obter_sessao().post(
             f"https://api.telegram.org/bot{token_bot}/sendMessage",
             params={
                 "chat_id": chat_id,
                 "message_thread_id": 1,
                 "text": mensagem
-            }
+            },
+            timeout=TIMEOUT_NOTIFICACAO,
         )
         response.raise_for_status()
         return True
     except Exception as e:
         print(f"Erro ao enviar telegram: {e}")
+        if levantar_erro:
+            raise
         return False
     
 def testar_notificacoes(config_id):
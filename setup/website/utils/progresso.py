@@ -0,0 +1,81 @@
+import time
+import logging
+from datetime import datetime
+
+from django.utils.timezone import now
+
+from setup.models import ExecucaoBackup
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_PROGRESSO = 2.0
+
+
+# Progresso de uma execução em andamento (etapa, arquivos e bytes concluídos x estimativa).
+# avancar() só soma contadores e confere o relógio; a gravação no banco (um UPDATE de uma coluna)
+# e o update_state do Celery acontecem no máximo a cada `intervalo` segundos, então o custo
+# não depende da quantidade de arquivos. Deve ser usado na thread da tarefa (usa o ORM).
+class ProgressoExecucao:
+
+    def __init__(self, execucao, tarefa=None, intervalo=INTERVALO_PROGRESSO):
+        self.execucao = execucao
+        self.tarefa = tarefa
+        self.intervalo = intervalo
+        # (arquivos, bytes) usados quando a etapa não informa o total (ex: execução anterior)
+        self.estimativa = (0, 0)
+        self.dados = {}
+        self._ultima_publicacao = 0
+
+    def etapa(self, nome, arquivos_total=None, bytes_total=None):
+        # Início de uma etapa (copia, arquivo, verificacao...): zera os contadores
+        if arquivos_total is None and bytes_total is None:
+            arquivos_total, bytes_total = self.estimativa
+        self.dados = {
+            'etapa': nome,
+            'inicio_etapa': now().isoformat(),
+            'arquivos': 0,
+            'bytes': 0,
+            'arquivos_total': arquivos_total or 0,
+            'bytes_total': bytes_total or 0,
+        }
+        self.publicar()
+
+    def avancar(self, arquivos=1, bytes=0):
+        if not self.dados:
+            return
+        self.dados['arquivos'] += arquivos
+        self.dados['bytes'] += bytes
+        if time.monotonic() - self._ultima_publicacao >= self.intervalo:
+            self.publicar()
+
+    def publicar(self):
+        self._ultima_publicacao = time.monotonic()
+        self.dados['atualizado_em'] = now().isoformat()
+        ExecucaoBackup.objects.filter(pk=self.execucao.pk).update(progresso=self.dados)
+        self.execucao.progresso = self.dados
+        if self.tarefa is not None:
+            try:
+                self.tarefa.update_state(state='PROGRESS', meta=self.dados)
+            except Exception as e:
+                # Sem result backend configurado o progresso fica apenas no banco
+                logger.debug(f"update_state indisponível: {e}")
+
+
+def calcular_eta(progresso):
+    # Retorna (fração concluída 0..1, segundos restantes) ou (None, None) sem estimativa.
+    # Usa os bytes quando há estimativa de tamanho, senão a quantidade de arquivos.
+    if not progresso or not progresso.get('inicio_etapa'):
+        return None, None
+    if progresso.get('bytes_total'):
+        fracao = progresso['bytes'] / progresso['bytes_total']
+    elif progresso.get('arquivos_total'):
+        fracao = progresso['arquivos'] / progresso['arquivos_total']
+    else:
+        return None, None
+
+    # A estimativa vem da execução anterior: a origem pode ter crescido desde então
+    fracao = min(fracao, 0.99)
+    decorrido = (now() - datetime.fromisoformat(progresso['inicio_etapa'])).total_seconds()
+    if fracao <= 0 or decorrido <= 0:
+        return fracao, None
+    return fracao, decorrido * (1 - fracao) / fracao
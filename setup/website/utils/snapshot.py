@@ -0,0 +1,128 @@
+import os
+import re
+from datetime import datetime
+
+from django.utils import timezone
+
+from setup.models import SnapshotBackup
+from website.utils.checkpoint import Checkpoint, caminho_checkpoint
+
+# Com microssegundos: duas execuções da mesma configuração no mesmo segundo não podem gravar
+# na mesma pasta. As pastas antigas (backup via rsync) não têm os microssegundos.
+FORMATO_DATA_SNAPSHOT = "%Y%m%d_%H%M%S_%f"
+FORMATO_DATA_SNAPSHOT_ANTIGO = "%Y%m%d_%H%M%S"
+PADRAO_DATA_SNAPSHOT = r'\d{8}_\d{6}(?:_\d{6})?'
+
+
+def nome_snapshot(nome_projeto, data):
+    # NOME_PROJETO_YYYYMMDD_HHMMSS_ffffff. As retentativas usam a data de início da mesma
+    # execução, então continuam na mesma pasta/arquivo.
+    return f"{nome_projeto}_{data.strftime(FORMATO_DATA_SNAPSHOT)}"
+
+
+def data_snapshot(data_str):
+    # Data do nome do snapshot, nos formatos novo e antigo; ValueError se não for válida
+    formato = FORMATO_DATA_SNAPSHOT if len(data_str) > 15 else FORMATO_DATA_SNAPSHOT_ANTIGO
+    return timezone.make_aware(datetime.strptime(data_str, formato))
+
+
+def localizar_snapshot_anterior(config, ignorar=None):
+    # Retorna o caminho do snapshot (pasta) mais recente da configuração, ou None.
+    # Usa o catálogo (SnapshotBackup); a busca por nome de pasta no destino só é usada
+    # enquanto a configuração ainda não tem nenhum snapshot catalogado.
+    # Snapshots não concluídos (execução interrompida) nunca são usados como base.
+    catalogados = SnapshotBackup.objects.filter(configuracao=config, tipo='pasta').order_by('-data_criacao').values_list('caminho', 'concluido')
+    encontrou_catalogo = False
+    for caminho, concluido in catalogados[:10]:
+        encontrou_catalogo = True
+        if concluido and os.path.basename(caminho) != ignorar and os.path.isdir(caminho):
+            return caminho
+    if encontrou_catalogo:
+        return None
+    return _localizar_snapshot_por_nome(config.destino_backup, config.projeto.nome, ignorar)
+
+
+def _localizar_snapshot_por_nome(destino, nome_projeto, ignorar=None):
+    if not destino or not os.path.isdir(destino):
+        return None
+
+    padrao = re.compile(rf'^{re.escape(nome_projeto)}_({PADRAO_DATA_SNAPSHOT})$')
+    candidatos = []
+    for entrada in os.scandir(destino):
+        if not entrada.is_dir(follow_symlinks=False) or entrada.name == ignorar:
+            continue
+        match = padrao.match(entrada.name)
+        if match:
+            candidatos.append((match.group(1), entrada.path))
+
+    if not candidatos:
+        return None
+    return max(candidatos)[1]
+
+
+def registrar_snapshot(config, caminho, data_criacao, tipo='pasta', execucao=None, tamanho_bytes=0, total_arquivos=0, concluido=True):
+    # Cataloga o snapshot para que a retenção não precise listar o destino. É chamado quando a
+    # pasta/arquivo é criado (concluido=False), para que uma execução interrompida também entre
+    # na retenção, e de novo no final com os totais. Retentativas reaproveitam o mesmo registro.
+    snapshot, _ = SnapshotBackup.objects.update_or_create(
+        configuracao=config,
+        caminho=caminho,
+        defaults={
+            'execucao': execucao,
+            'tipo': tipo,
+            'tamanho_bytes': tamanho_bytes,
+            'total_arquivos': total_arquivos,
+            'concluido': concluido,
+        },
+        create_defaults={
+            'execucao': execucao,
+            'tipo': tipo,
+            'data_criacao': data_criacao,
+            'tamanho_bytes': tamanho_bytes,
+            'total_arquivos': total_arquivos,
+            'concluido': concluido,
+        },
+    )
+    return snapshot
+
+
+def catalogar_snapshots(config):
+    # Cataloga as pastas e arquivos NOME_PROJETO_YYYYMMDD_HHMMSS[_ffffff](.tar.gz|.tar.zst) que já estão no
+    # destino e não têm registro (gerados antes do catálogo ou por execuções que pararam no meio),
+    # para que a retenção também os remova. A pasta do checkpoint pendente e os arquivos .tmp ficam
+    # como não concluídos. Retorna os snapshots criados.
+    destino = config.destino_backup
+    if not destino or not os.path.isdir(destino):
+        return []
+
+    padrao = re.compile(rf'^{re.escape(config.projeto.nome)}_({PADRAO_DATA_SNAPSHOT})(\.tar\.(?:gz|zst))?(\.tmp)?$')
+    catalogados = set(SnapshotBackup.objects.filter(caminho__startswith=destino).values_list('caminho', flat=True))
+    cabecalho, _ = Checkpoint(caminho_checkpoint(config)).carregar()
+    interrompida = (cabecalho or {}).get('destino')
+    novos = {}
+    for entrada in os.scandir(destino):
+        match = padrao.match(entrada.name)
+        if not match:
+            continue
+        data_str, extensao, temporario = match.groups()
+        pasta = entrada.is_dir(follow_symlinks=False)
+        if pasta == bool(extensao):
+            continue
+        try:
+            data_criacao = data_snapshot(data_str)
+        except ValueError:
+            continue
+
+        # O .tmp é removido pela retenção junto com o caminho final
+        caminho = entrada.path[:-len('.tmp')] if temporario else entrada.path
+        if caminho in catalogados or (temporario and caminho in novos):
+            continue
+        novos[caminho] = SnapshotBackup(
+            configuracao=config,
+            tipo='pasta' if pasta else 'arquivo',
+            caminho=caminho,
+            data_criacao=data_criacao,
+            concluido=not temporario and caminho != interrompida,
+        )
+
+    return SnapshotBackup.objects.bulk_create(list(novos.values()))
@@ -0,0 +1,74 @@
+import os
+import time
+import logging
+import sqlite3
+import subprocess
+
+from website.utils.compressao import comando_compressor
+
+logger = logging.getLogger(__name__)
+
+
+# Quantas vezes a cópia em passos pode recomeçar (banco alterado no meio) antes de copiar tudo de uma vez
+MAX_REINICIOS = 3
+
+
+class _CopiaReiniciada(Exception):
+    pass
+
+
+def copiar_sqlite(origem, destino, paginas=1000, pausa=0.05, timeout=30):
+    # Backup online de um banco SQLite em uso (API de backup do SQLite via Connection.backup).
+    # A cópia é feita em passos de `paginas` páginas com uma pausa entre eles: o banco só fica
+    # com o lock de leitura durante cada passo e a aplicação continua gravando no intervalo.
+    # A pausa é feita no callback de progresso, chamado depois de cada passo; o `sleep` do
+    # Connection.backup só vale quando o banco está ocupado (SQLITE_BUSY/LOCKED).
+    # Se o banco for alterado por outra conexão no meio da cópia, o SQLite recomeça a cópia,
+    # então o resultado é sempre um retrato consistente. Com gravações constantes ela poderia
+    # recomeçar indefinidamente: depois de MAX_REINICIOS a cópia é feita em um único passo
+    # (no modo WAL a leitura não bloqueia quem grava; nos demais a aplicação fica sem gravar
+    # até o fim da cópia, o que é registrado no log). Retorna (total de páginas, reinícios).
+    if not os.path.exists(origem):
+        raise Exception(f"Banco SQLite não encontrado: {origem}")
+
+    estado = {'total': 0, 'restantes': None, 'reinicios': 0}
+
+    def progresso(status, restantes, total):
+        # Cada passo copia ao menos uma página: restantes que não diminuiu indica que a cópia recomeçou
+        if estado['restantes'] is not None and restantes >= estado['restantes']:
+            estado['reinicios'] += 1
+            if estado['reinicios'] >= MAX_REINICIOS:
+                raise _CopiaReiniciada()
+        estado['total'] = total
+        estado['restantes'] = restantes
+        if restantes and pausa:
+            time.sleep(pausa)
+
+    conexao_origem = sqlite3.connect(f"file:{origem}?mode=ro", uri=True, timeout=timeout)
+    conexao_destino = sqlite3.connect(destino)
+    try:
+        try:
+            conexao_origem.backup(conexao_destino, pages=paginas, progress=progresso, sleep=pausa)
+        except _CopiaReiniciada:
+            modo = conexao_origem.execute("PRAGMA journal_mode").fetchone()[0]
+            if modo.lower() != 'wal':
+                logger.warning(
+                    f"Backup do SQLite {origem} reiniciado {estado['reinicios']} vez(es): copiando em um único passo "
+                    f"(journal_mode={modo}), as gravações no banco ficam bloqueadas até o fim da cópia"
+                )
+            conexao_origem.backup(conexao_destino, sleep=pausa)
+        resultado = conexao_destino.execute("PRAGMA quick_check").fetchone()[0]
+        if resultado != 'ok':
+            raise Exception(f"Cópia do banco SQLite inconsistente: {resultado}")
+    finally:
+        conexao_destino.close()
+        conexao_origem.close()
+    return estado['total'], estado['reinicios']
+
+
+def comprimir_arquivo(origem, destino, formato):
+    # Comprime o arquivo em stream pelo pigz/gzip/zstd, sem carregar o conteúdo em memória
+    with open(origem, 'rb') as entrada, open(destino, 'wb') as saida:
+        resultado = subprocess.run(comando_compressor(formato), stdin=entrada, stdout=saida, stderr=subprocess.PIPE)
+    if resultado.returncode != 0:
+        raise Exception(f"Erro ao comprimir o backup do banco: {resultado.stderr.decode(errors='replace')}")
@@ -0,0 +1,121 @@
+import os
+import shlex
+import shutil
+import socket
+import tempfile
+import subprocess
+
+TIMEOUT_CONEXAO = 15
+
+# Saída do xargs quando algum sha256sum terminou com erro (ex: arquivo removido da origem).
+# Nesse caso os demais hashes são válidos e os arquivos que faltam aparecem como divergência.
+XARGS_FALHA_PARCIAL = 123
+
+
+# Conexão SSH compartilhada por todas as etapas de uma execução (dump, cópia e verificação).
+# Abre uma conexão mestre (ControlMaster) e os demais comandos ssh/rsync passam pelo mesmo
+# socket (ControlPath): sem um novo handshake/autenticação a cada etapa ou arquivo.
+class ConexaoSSH:
+
+    def __init__(self, host, porta=22, usuario=None, chave=None):
+        self.host = host
+        self.porta = porta or 22
+        self.usuario = usuario
+        self.chave = chave
+        self._pasta = None
+        self.caminho_controle = None
+
+    @classmethod
+    def da_configuracao(cls, config):
+        if not config.ssh_ip:
+            return None
+        return cls(config.ssh_ip, config.ssh_porta, config.ssh_usuario or None, config.ssh_chave or None)
+
+    def __enter__(self):
+        self.abrir()
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    @property
+    def destino(self):
+        return f"{self.usuario}@{self.host}" if self.usuario else self.host
+
+    @property
+    def destino_rsync(self):
+        # Endereços IPv6 precisam de colchetes na sintaxe host:caminho do rsync
+        host = f"[{self.host}]" if ':' in self.host else self.host
+        return f"{self.usuario}@{host}" if self.usuario else host
+
+    def opcoes(self):
+        opcoes = [
+            '-p', str(self.porta),
+            '-o', 'BatchMode=yes',
+            '-o', f'ConnectTimeout={TIMEOUT_CONEXAO}',
+            '-o', 'ServerAliveInterval=30',
+            '-o', 'ControlMaster=auto',
+            '-o', f'ControlPath={self.caminho_controle}',
+            '-o', 'ControlPersist=60',
+        ]
+        if self.chave:
+            opcoes += ['-i', self.chave]
+        return opcoes
+
+    def abrir(self):
+        # O socket fica em uma pasta temporária curta (o ControlPath tem limite de tamanho)
+        self._pasta = tempfile.mkdtemp(prefix='bkssh-')
+        self.caminho_controle = os.path.join(self._pasta, 'mestre')
+        subprocess.run(
+            ['ssh', *self.opcoes(), '-o', 'ControlMaster=yes', '-f', '-N', self.destino],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=TIMEOUT_CONEXAO * 2,
+        )
+
+    def fechar(self):
+        if self._pasta is None:
+            return
+        subprocess.run(
+            ['ssh', '-o', f'ControlPath={self.caminho_controle}', '-O', 'exit', self.destino],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        shutil.rmtree(self._pasta, ignore_errors=True)
+        self._pasta = None
+
+    def comando(self, *remoto):
+        # Comando local que executa `remoto` no host pela conexão mestre
+        return ['ssh', *self.opcoes(), self.destino, shlex.join(remoto)]
+
+    def shell_rsync(self):
+        # Valor do -e do rsync, para ele também usar a conexão mestre
+        return shlex.join(['ssh', *self.opcoes()])
+
+    def encaminhar_porta(self, host_remoto, porta_remota):
+        # Abre um túnel (-L) na conexão mestre e retorna a porta local; usado pelo pg_dump
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            porta_local = s.getsockname()[1]
+        subprocess.run(
+            ['ssh', *self.opcoes(), '-O', 'forward', '-L', f'127.0.0.1:{porta_local}:{host_remoto}:{porta_remota}', self.destino],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        return porta_local
+
+    def hashes_remotos(self, pasta, rel_paths):
+        # sha256 dos arquivos no host, em uma única sessão: {rel_path: hash}
+        if not rel_paths:
+            return {}
+        entrada = b'\0'.join(rel_path.encode() for rel_path in rel_paths) + b'\0'
+        remoto = f"cd {shlex.quote(pasta)} && xargs -0 sha256sum --zero --"
+        resultado = subprocess.run(
+            ['ssh', *self.opcoes(), self.destino, remoto],
+            input=entrada, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+        # Falha da conexão (255), pasta inexistente, sha256sum ausente...: nenhum hash é confiável
+        if resultado.returncode not in (0, XARGS_FALHA_PARCIAL):
+            raise subprocess.CalledProcessError(resultado.returncode, remoto, stderr=resultado.stderr.decode(errors='replace'))
+        hashes = {}
+        for linha in resultado.stdout.split(b'\0'):
+            if b'  ' in linha:
+                hash_arquivo, rel_path = linha.split(b'  ', 1)
+                hashes[rel_path.decode(errors='surrogateescape')] = hash_arquivo.decode()
+        return hashes
@@ -0,0 +1,118 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Entradas por mensagem enviada de uma thread de listagem para o gerador
+ENTRADAS_POR_LOTE = 1000
+
+
+def varrer_origem(origem, ignorados, ao_ignorar=None, workers=4):
+    # Percorre a origem e devolve ('pasta', rel_path, caminho, None) e ('arquivo', rel_path, caminho, stat).
+    # O stat é None quando não pôde ser feito (link quebrado, arquivo removido no meio da varredura).
+    # Cada pasta é devolvida antes dos arquivos dela. Pastas ignoradas não são visitadas.
+    #
+    # As pastas são listadas em paralelo (os.scandir) por `workers` threads, que também fazem o
+    # stat de cada arquivo (DirEntry.stat); quem consome usa esse stat em vez de repetir a chamada.
+    # Em filesystems de rede a latência de metadados das várias pastas se sobrepõe e a cópia começa
+    # enquanto a varredura continua. A memória fica limitada: no máximo `workers` pastas sendo
+    # listadas e uma fila de tamanho fixo de lotes de entradas; as pastas ainda não visitadas ficam
+    # em uma pilha (só o caminho), como no os.walk.
+    # ao_ignorar é chamado na thread de quem consome o gerador.
+    workers = max(1, int(workers or 1))
+    resultados = queue.Queue(maxsize=workers * 4)
+    cancelado = threading.Event()
+    pendentes = [('', origem)]
+    em_andamento = 0
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backup-varredura')
+    try:
+        while pendentes or em_andamento:
+            while pendentes and em_andamento < workers:
+                rel_path, caminho = pendentes.pop()
+                executor.submit(_listar_pasta, rel_path, caminho, ignorados, resultados, cancelado)
+                em_andamento += 1
+
+            tipo, rel_path, dados = resultados.get()
+            if tipo == 'inicio':
+                yield 'pasta', rel_path, dados, None
+            elif tipo == 'fim':
+                em_andamento -= 1
+            elif tipo == 'erro':
+                raise dados
+            else:
+                for tipo_entrada, entrada_rel_path, caminho, st in dados:
+                    if tipo_entrada == 'arquivo':
+                        yield 'arquivo', entrada_rel_path, caminho, st
+                    elif tipo_entrada == 'pasta':
+                        pendentes.append((entrada_rel_path, caminho))
+                    elif ao_ignorar:
+                        ao_ignorar(entrada_rel_path, tipo_entrada == 'pasta_ignorada')
+    finally:
+        # Gerador fechado antes do fim (erro na cópia): libera as threads presas na fila cheia
+        cancelado.set()
+        while True:
+            try:
+                resultados.get_nowait()
+            except queue.Empty:
+                break
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _enviar(resultados, cancelado, mensagem):
+    while not cancelado.is_set():
+        try:
+            resultados.put(mensagem, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _listar_pasta(rel_path, caminho, ignorados, resultados, cancelado):
+    # Roda em uma thread do pool: envia 'inicio', os lotes de entradas e 'fim' da pasta.
+    # Erros de leitura da pasta são ignorados, como no os.walk; os demais vão para o gerador.
+    try:
+        if not _enviar(resultados, cancelado, ('inicio', rel_path, caminho)):
+            return
+        lote = []
+        try:
+            with os.scandir(caminho) as entradas:
+                for entrada in entradas:
+                    entrada_rel_path = os.path.join(rel_path, entrada.name)
+                    try:
+                        pasta = entrada.is_dir()
+                    except OSError:
+                        pasta = False
+
+                    if pasta:
+                        # Links simbólicos para pastas não são seguidos (os.walk com followlinks=False)
+                        if entrada.is_symlink():
+                            continue
+                        if ignorados and ignorados.ignorar(entrada_rel_path, diretorio=True):
+                            lote.append(('pasta_ignorada', entrada_rel_path, None, None))
+                        else:
+                            lote.append(('pasta', entrada_rel_path, entrada.path, None))
+                    elif ignorados and ignorados.ignorar(entrada_rel_path):
+                        lote.append(('arquivo_ignorado', entrada_rel_path, None, None))
+                    else:
+                        try:
+                            st = entrada.stat()
+                        except OSError:
+                            # Link quebrado ou arquivo removido durante a varredura: vai sem stat e
+                            # quem consome refaz o stat, registrando o erro do arquivo se falhar
+                            st = None
+                        lote.append(('arquivo', entrada_rel_path, entrada.path, st))
+
+                    if len(lote) >= ENTRADAS_POR_LOTE:
+                        if not _enviar(resultados, cancelado, ('entradas', rel_path, lote)):
+                            return
+                        lote = []
+        except OSError:
+            pass
+        if lote:
+            _enviar(resultados, cancelado, ('entradas', rel_path, lote))
+    except Exception as e:
+        _enviar(resultados, cancelado, ('erro', rel_path, e))
+    finally:
+        _enviar(resultados, cancelado, ('fim', rel_path, None))